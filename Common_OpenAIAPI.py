@@ -1,11 +1,19 @@
-import openai
 import os
 import base64
-import requests
-from typing import List, Dict, Any
-from pydantic import BaseModel
+import threading
+import asyncio
+import concurrent.futures
+import random
+import queue
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, List, Dict, Any
 import time
-import json
+
+from config_store import get_config
+
+# openai・httpx・pydanticは読み込みに時間がかかるため、使うときに読み込む（起動時間の短縮）
+if TYPE_CHECKING:
+    from pydantic import BaseModel
 
 DEFAULT_CHAT_MODEL = "gpt-4o"
 DEFAULT_VISION_MODEL = "gpt-4o"
@@ -23,93 +31,450 @@ api_key = os.getenv("OPENAI_API_KEY")
 
 def get_transcriber_model():
     """
-    設定ファイルからtranscriber_modelを読み込む
-    設定ファイルがない場合やモデル設定がnullの場合はデフォルト値を使用
+    設定からtranscriber_modelを取得する（config.jsonは共有の設定から読み、毎回は開かない）
+    モデル設定がない場合やnullの場合はデフォルト値を使用
+    """
+    return get_config().section('audio').get('transcriber_model') or DEFAULT_AUDIO_MODEL
+
+# プロセス全体で使い回すクライアントの設定（configure_clientで変更する）
+CLIENT_SETTINGS = {
+    "timeout": 60.0,
+    "connect_timeout": 5.0,
+    "max_connections": 10,
+    "keepalive_expiry": 300.0,
+    # base_urlを指定しない呼び出しの接続先（Noneなら公式API。OpenAI互換のプロキシやスタブサーバーに向けられる）
+    "base_url": None,
+}
+
+# リトライとレイテンシ予算の設定（configure_clientで変更する）
+RETRY_SETTINGS = {
+    "max_attempts": 3,          # 1回の呼び出しあたりの最大試行回数
+    "backoff_base": 0.5,        # 指数バックオフの初期値(秒)
+    "backoff_max": 8.0,         # バックオフの上限(秒)
+    "budget_seconds": 90.0,     # 1回の処理（文字起こし・後処理）全体の持ち時間(秒)
+    "min_attempt_seconds": 2.0, # 残り時間がこれより短ければ新たな試行を始めない
+}
+
+# base_urlごとに作成済みのクライアントとその接続プール（使い回す）
+_clients = {}
+_http_clients = {}
+_async_clients = {}
+_async_http_clients = {}
+_clients_lock = threading.Lock()
+
+# 非同期クライアント用のイベントループ（専用スレッドで動かし続ける）
+_loop = None
+_loop_lock = threading.Lock()
+
+class RequestCancelled(Exception):
+    """CancelTokenによって中断されたAPIリクエストを表す例外"""
+    pass
+
+class DeadlineExceeded(Exception):
+    """レイテンシ予算内に応答が得られなかったことを表す例外"""
+    pass
+
+class CancelToken:
+    """
+    1回の処理（文字起こしや後処理）に属するAPIリクエストをまとめて中断するためのトークン
+    cancel()を呼ぶと実行中のリクエストは接続ごと中断され、RequestCancelledが送出される
+    start_budget()で処理全体の締め切りを設定すると、リトライはその時刻までに収まる範囲で行われる
+    """
+    def __init__(self, budget_seconds=None):
+        self._event = threading.Event()
+        self._futures = set()
+        self._children = set()
+        self._parent = None
+        self._lock = threading.Lock()
+        self.deadline = None
+        if budget_seconds is not None:
+            self.start_budget(budget_seconds)
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def start_budget(self, budget_seconds=None):
+        """今から budget_seconds 秒後（省略時はRETRY_SETTINGSの値）を締め切りにする"""
+        if budget_seconds is None:
+            budget_seconds = RETRY_SETTINGS["budget_seconds"]
+        self.deadline = time.monotonic() + budget_seconds
+
+    def remaining(self):
+        """締め切りまでの残り秒数。締め切りがない場合はNone"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def cancel(self):
+        self._event.set()
+        with self._lock:
+            futures = list(self._futures)
+            children = list(self._children)
+        for future in futures:
+            future.cancel()
+        for child in children:
+            child.cancel()
+
+    def child(self):
+        """
+        締め切りを引き継ぎ、このトークンのキャンセルに連動する子トークンを作る
+        子だけをキャンセルしても親には影響しない（並行して送った片方の要求だけを止める場合に使う）
+        """
+        token = CancelToken()
+        token.deadline = self.deadline
+        token._parent = self
+        with self._lock:
+            self._children.add(token)
+        if self.cancelled:
+            token.cancel()
+        return token
+
+    def detach(self):
+        """使い終わった子トークンを親から切り離す"""
+        if self._parent is not None:
+            with self._parent._lock:
+                self._parent._children.discard(self)
+
+    def wait(self, seconds):
+        """最大seconds秒待機する。キャンセルされた場合はRequestCancelledを送出する"""
+        if self._event.wait(seconds):
+            raise RequestCancelled("処理はキャンセルされました")
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise RequestCancelled("処理はキャンセルされました")
+
+    def _register(self, future):
+        with self._lock:
+            self._futures.add(future)
+        # 登録前にキャンセルされていた場合も確実に中断する
+        if self.cancelled:
+            future.cancel()
+
+    def _unregister(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="openai-loop", daemon=True).start()
+    return _loop
+
+def run_cancellable(coro, cancel_token=None, timeout=None):
+    """
+    コルーチンを専用のイベントループで実行し、結果を待って返す
+    cancel_tokenがキャンセルされると、実行中のHTTPリクエストを中断してRequestCancelledを送出する
+    timeout秒以内に終わらない場合もリクエストを中断し、TimeoutErrorを送出する
     """
-    config_path = 'config.json'
-    print(f"[LOG] 設定ファイルの読み込みを試行: {config_path}")
+    if cancel_token is not None and cancel_token.cancelled:
+        coro.close()
+        raise RequestCancelled("処理はキャンセルされました")
+    if timeout is not None:
+        coro = asyncio.wait_for(coro, timeout)
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    if cancel_token is not None:
+        cancel_token._register(future)
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-            print(f"[LOG] 設定ファイル読み込み成功: {config}")
-            if 'audio' in config and 'transcriber_model' in config['audio'] and config['audio']['transcriber_model']:
-                model = config['audio']['transcriber_model']
-                print(f"[LOG] 設定ファイルからモデルを取得: {model}")
-                return model
-            else:
-                print(f"[LOG] 設定ファイルにモデル設定がないかnullのため、デフォルト値を使用: {DEFAULT_AUDIO_MODEL}")
-    except FileNotFoundError:
-        print(f"[LOG] 設定ファイルが見つかりません: {config_path}")
-    except json.JSONDecodeError:
-        print(f"[LOG] 設定ファイルのJSONが不正です: {config_path}")
-    except KeyError as e:
-        print(f"[LOG] 設定ファイルに必要なキーがありません: {e}")
-    except Exception as e:
-        print(f"[LOG] 予期せぬエラーが発生しました: {e}")
-    print(f"[LOG] デフォルトモデルを使用: {DEFAULT_AUDIO_MODEL}")
-    return DEFAULT_AUDIO_MODEL
+        return future.result()
+    except concurrent.futures.CancelledError:
+        raise RequestCancelled("処理はキャンセルされました")
+    finally:
+        if cancel_token is not None:
+            cancel_token._unregister(future)
 
-def get_client():    
+def configure_client(**settings):
+    """
+    共有クライアントのタイムアウトや接続プール、リトライの設定を変更する
+    既に作成済みのクライアントは破棄され、次回のget_client()で作り直される
+    """
+    unknown = set(settings) - set(CLIENT_SETTINGS) - set(RETRY_SETTINGS)
+    if unknown:
+        print(f"[LOG] 未知のクライアント設定を無視します: {unknown}")
+    RETRY_SETTINGS.update({k: v for k, v in settings.items() if k in RETRY_SETTINGS and v is not None})
+    with _clients_lock:
+        CLIENT_SETTINGS.update({k: v for k, v in settings.items() if k in CLIENT_SETTINGS and v is not None})
+        for client in _clients.values():
+            client.close()
+        for client in _async_clients.values():
+            asyncio.run_coroutine_threadsafe(client.close(), _get_loop())
+        _clients.clear()
+        _http_clients.clear()
+        _async_clients.clear()
+        _async_http_clients.clear()
+
+def _create_client(base_url, asynchronous=False):
     if 'SSL_CERT_FILE' in os.environ:
         del os.environ['SSL_CERT_FILE']
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OpenAI API key is not set in environment variables.")
+    import openai
+    import httpx
     openai.api_key = api_key
-    return openai.OpenAI()
+    limits = httpx.Limits(
+        max_connections=CLIENT_SETTINGS["max_connections"],
+        max_keepalive_connections=CLIENT_SETTINGS["max_connections"],
+        keepalive_expiry=CLIENT_SETTINGS["keepalive_expiry"],
+    )
+    params = {
+        "api_key": api_key,
+        # base_urlを指定するとローカルのスタブサーバー等に向けられる
+        "base_url": base_url or None,
+        "timeout": httpx.Timeout(CLIENT_SETTINGS["timeout"], connect=CLIENT_SETTINGS["connect_timeout"]),
+        # リトライはcall_with_retry()で締め切りを見ながら行うため、SDK側のリトライは無効にする
+        "max_retries": 0,
+    }
+    if asynchronous:
+        http_client = openai.DefaultAsyncHttpxClient(limits=limits)
+        client = openai.AsyncOpenAI(http_client=http_client, **params)
+    else:
+        http_client = openai.DefaultHttpxClient(limits=limits)
+        client = openai.OpenAI(http_client=http_client, **params)
+    return client, http_client
 
-def generate_chat_response(system_prompt, user_message_content, max_tokens=DEFAULT_MAX_TOKENS, temperature=DEFAULT_TEMPERATURE, model_name=DEFAULT_CHAT_MODEL, retries=3):
-    client = get_client()
-    for attempt in range(retries):
-        try:
-            params = {
-                "model": model_name,
-                "temperature": temperature,
-                "messages": []
-            }
+def _get_cached_client(base_url, asynchronous):
+    clients, http_clients = (_async_clients, _async_http_clients) if asynchronous else (_clients, _http_clients)
+    base_url = base_url or CLIENT_SETTINGS["base_url"]
+    key = base_url or ""
+    client = clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = clients.get(key)
+        if client is None:
+            client, http_client = _create_client(base_url, asynchronous)
+            clients[key] = client
+            http_clients[key] = http_client
+    return client
+
+def get_client(base_url=None):
+    """
+    base_urlごとに1つのクライアントを作成して使い回す
+    接続はkeep-aliveで保持されるため、2回目以降の呼び出しではTLSハンドシェイクが不要になる
+    """
+    return _get_cached_client(base_url, asynchronous=False)
 
-            if system_prompt:
-                params["messages"].append({"role": "system", "content": system_prompt})
+def get_async_client(base_url=None):
+    """
+    get_client()の非同期版。run_cancellable()と組み合わせて中断可能なリクエストに使う
+    """
+    return _get_cached_client(base_url, asynchronous=True)
+
+def _retry_after_seconds(error):
+    """エラー応答のRetry-After(retry-after-ms)ヘッダーから待機秒数を取得する"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            # HTTP日付形式
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
-            params["messages"].append({"role": "user", "content": user_message_content})
+def _is_retryable(error):
+    """一時的な失敗（接続エラー、タイムアウト、429、5xx）かどうか"""
+    import openai
+    import httpx
+    if isinstance(error, (TimeoutError, openai.APIConnectionError, httpx.TransportError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None and isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+    return status in (408, 409, 429) or (status is not None and status >= 500)
 
-            if isinstance(max_tokens, int) and max_tokens > 0:
-                params["max_tokens"] = max_tokens
+def call_with_retry(make_request, cancel_token=None, description="APIリクエスト", max_attempts=None):
+    """
+    make_request()が返すコルーチンを、締め切りを守りながらリトライ付きで実行する
 
-            response = client.chat.completions.create(**params)
-            print(response)
-            return response.choices[0].message.content
+    一時的な失敗は指数バックオフ（フルジッター）で再試行し、Retry-Afterがあればそれに従う。
+    各試行のタイムアウトは締め切りまでの残り時間に合わせて短くし、待機後に
+    min_attempt_seconds秒も残らない場合は再試行せず最後のエラーを送出する。
+    締め切りはcancel_tokenのstart_budget()で設定し、なければ呼び出しごとにbudget_secondsを使う。
+    """
+    if cancel_token is not None and cancel_token.deadline is not None:
+        deadline = cancel_token.deadline
+    else:
+        deadline = time.monotonic() + RETRY_SETTINGS["budget_seconds"]
+    max_attempts = max(1, int(max_attempts or RETRY_SETTINGS["max_attempts"]))
+    min_attempt = RETRY_SETTINGS["min_attempt_seconds"]
 
+    for attempt in range(max_attempts):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{description}: 締め切りを過ぎたため送信しませんでした")
+        try:
+            return run_cancellable(make_request(), cancel_token, timeout=min(remaining, CLIENT_SETTINGS["timeout"]))
+        except RequestCancelled:
+            raise
         except Exception as e:
-            print(f"Attempt {attempt + 1} failed: {e}")
-            if attempt < retries - 1:
-                print("Retrying...")
-                time.sleep(10)
+            if not _is_retryable(e) or attempt == max_attempts - 1:
+                raise
+            delay = _retry_after_seconds(e)
+            if delay is None:
+                delay = random.uniform(0, min(RETRY_SETTINGS["backoff_max"], RETRY_SETTINGS["backoff_base"] * 2 ** attempt))
+            remaining = deadline - time.monotonic()
+            if remaining - delay < min_attempt:
+                print(f"[LOG] {description}: 締め切りまでに再試行が終わらないため中止します (残り{remaining:.1f}秒): {e!r}")
+                raise
+            print(f"[LOG] {description}: 試行{attempt + 1}回目が失敗しました。{delay:.2f}秒後に再試行します: {e!r}")
+            if cancel_token is not None:
+                cancel_token.wait(delay)
             else:
-                print("All attempts failed.")
-                return None
+                time.sleep(delay)
+
+def _get_async_http_client(base_url=None):
+    """get_async_client()のクライアントが使っている接続プール（httpxのクライアント）を返す"""
+    get_async_client(base_url)
+    return _async_http_clients[base_url or CLIENT_SETTINGS["base_url"] or ""]
+
+def warm(base_url=None):
+    """
+    録音開始時などに呼び出し、APIサーバーへの接続を事前に確立しておく
+    応答の内容は使わない（接続が接続プールに残ることだけが目的）
+    """
+    try:
+        client = get_async_client(base_url)
+        start = time.perf_counter()
+        # 事前接続はリトライせず、接続タイムアウトで打ち切る
+        run_cancellable(_get_async_http_client(base_url).head(str(client.base_url)), timeout=CLIENT_SETTINGS["connect_timeout"])
+        print(f"[LOG] APIへの接続を事前に確立しました ({(time.perf_counter() - start) * 1000:.0f}ms)")
+    except Exception as e:
+        print(f"[LOG] APIへの事前接続に失敗しました: {e}")
+
+def _chat_params(system_prompt, user_message_content, max_tokens, temperature, model_name):
+    params = {
+        "model": model_name,
+        "temperature": temperature,
+        "messages": []
+    }
+
+    if system_prompt:
+        params["messages"].append({"role": "system", "content": system_prompt})
+
+    params["messages"].append({"role": "user", "content": user_message_content})
+
+    if isinstance(max_tokens, int) and max_tokens > 0:
+        params["max_tokens"] = max_tokens
+    return params
+
+def generate_chat_response(system_prompt, user_message_content, max_tokens=DEFAULT_MAX_TOKENS, temperature=DEFAULT_TEMPERATURE, model_name=DEFAULT_CHAT_MODEL, retries=None, cancel_token=None):
+    client = get_async_client()
+    params = _chat_params(system_prompt, user_message_content, max_tokens, temperature, model_name)
+
+    try:
+        response = call_with_retry(
+            lambda: client.chat.completions.create(**params),
+            cancel_token, description="チャット応答", max_attempts=retries
+        )
+        print(response)
+        return response.choices[0].message.content
+
+    except RequestCancelled:
+        raise
+    except Exception as e:
+        print(f"All attempts failed: {e}")
+        return None
+
+def stream_chat_response(system_prompt, user_message_content, max_tokens=DEFAULT_MAX_TOKENS, temperature=DEFAULT_TEMPERATURE, model_name=DEFAULT_CHAT_MODEL, cancel_token=None):
+    """
+    generate_chat_responseのストリーミング版。応答のテキストを届いた順に少しずつyieldする
+    接続して最初の応答が返るまではcall_with_retry()でリトライし、それ以降の失敗は例外として送出する
+    cancel_tokenがキャンセルされると受信を中断してRequestCancelledを送出する
+    """
+    client = get_async_client()
+    params = _chat_params(system_prompt, user_message_content, max_tokens, temperature, model_name)
+    stream = call_with_retry(
+        lambda: client.chat.completions.create(stream=True, **params),
+        cancel_token, description="チャット応答(ストリーミング)"
+    )
+
+    deltas = queue.Queue()
+    finished = object()
+
+    async def receive():
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    deltas.put(chunk.choices[0].delta.content)
+        finally:
+            await stream.close()
+
+    remaining = cancel_token.remaining() if cancel_token is not None else None
+    coro = receive() if remaining is None else asyncio.wait_for(receive(), max(remaining, 0))
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    future.add_done_callback(lambda _: deltas.put(finished))
+    if cancel_token is not None:
+        cancel_token._register(future)
+    try:
+        while True:
+            delta = deltas.get()
+            if delta is finished:
+                break
+            yield delta
+        future.result()
+    except concurrent.futures.CancelledError:
+        raise RequestCancelled("処理はキャンセルされました")
+    finally:
+        # 呼び出し側が途中でやめた場合も受信を止める
+        future.cancel()
+        if cancel_token is not None:
+            cancel_token._unregister(future)
+
+def __getattr__(name):
+    # ResponseStepはpydanticが必要なため、参照されたときに定義する
+    if name == "ResponseStep":
+        from pydantic import BaseModel
+
+        class ResponseStep(BaseModel):
+            steps: List[str]
+            answers: List[str]
+
+        globals()["ResponseStep"] = ResponseStep
+        return ResponseStep
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-class ResponseStep(BaseModel):
-    steps: List[str]
-    answers: List[str]
+def preload(base_url=None):
+    """
+    openai・httpx・pydanticを読み込み、共有クライアントを作成しておく
+    起動直後にバックグラウンドで呼び出し、最初の文字起こしや後処理で読み込みを待たないようにする
+    """
+    import openai
+    import httpx
+    import pydantic
+    try:
+        get_async_client(base_url)
+    except ValueError as e:
+        print(f"[LOG] APIクライアントを事前に作成できませんでした: {e}")
 
-def generate_chat_responseStruct(messages: List[Dict[str, Any]], response_format: BaseModel, model: str = DEFAULT_CHAT_MODEL, temperature: float = DEFAULT_TEMPERATURE):
-    client = get_client()
-    response = client.beta.chat.completions.parse(
+def generate_chat_responseStruct(messages: List[Dict[str, Any]], response_format: "BaseModel", model: str = DEFAULT_CHAT_MODEL, temperature: float = DEFAULT_TEMPERATURE, cancel_token=None):
+    client = get_async_client()
+    response = call_with_retry(lambda: client.beta.chat.completions.parse(
         model=model,
         temperature=temperature,
         messages=messages,
         response_format=response_format,
-    )
+    ), cancel_token, description="構造化応答")
     return response
 
 def encode_image(image_path):
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode('utf-8')
 
-def generate_vision_ai_api(image_path, prompt_text, model=DEFAULT_VISION_MODEL):
-    import certifi
-    client = get_client()
+def generate_vision_ai_api(image_path, prompt_text, model=DEFAULT_VISION_MODEL, cancel_token=None):
+    http_client = _get_async_http_client()
     base64_image = encode_image(image_path)
     headers = {
         "Content-Type": "application/json",
@@ -135,29 +500,43 @@ def generate_vision_ai_api(image_path, prompt_text, model=DEFAULT_VISION_MODEL):
             }
         ],
     }
-    response = requests.post(
-        "https://api.openai.com/v1/chat/completions",
-        headers=headers,
-        json=payload,
-        verify=certifi.where()
-    )
+
+    async def post():
+        response = await http_client.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers=headers,
+            json=payload
+        )
+        response.raise_for_status()
+        return response
+
+    response = call_with_retry(post, cancel_token, description="画像認識")
     return response.json()
 
-def generate_transcribe_from_audio(audio_file, model=None, language="ja", prompt=""):
-    client = get_client()
+def generate_transcribe_from_audio(audio_file, model=None, language="ja", prompt="", base_url=None, cancel_token=None):
+    client = get_async_client(base_url)
     try:
         # モデルが指定されていない場合は設定から読み込む
         if model is None:
             model = get_transcriber_model()
         
-        transcript = client.audio.transcriptions.create(
-            file=audio_file,
-            model=model,
-            response_format="json",
-            language=language,
-            prompt=prompt,
-        )
+
+        def request():
+            # 再試行時はファイルを先頭から読み直す
+            if hasattr(audio_file, "seek"):
+                audio_file.seek(0)
+            return client.audio.transcriptions.create(
+                file=audio_file,
+                model=model,
+                response_format="json",
+                language=language,
+                prompt=prompt,
+            )
+
+        transcript = call_with_retry(request, cancel_token, description="文字起こし")
         return transcript.text
+    except RequestCancelled:
+        raise
     except Exception as e:
         print(f"Error during transcription: {e}")
         return None
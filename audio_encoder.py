@@ -0,0 +1,129 @@
+import io
+import logging
+import time
+import wave
+from collections import namedtuple
+
+import numpy as np
+
+# アップロード用にエンコードした音声 (ファイル名, データ, MIMEタイプ)
+EncodedAudio = namedtuple('EncodedAudio', ['filename', 'data', 'mime'])
+
+FORMATS = {
+    # 形式名: (拡張子, MIMEタイプ)
+    'wav': ('wav', 'audio/wav'),
+    'flac': ('flac', 'audio/flac'),
+    'opus': ('ogg', 'audio/ogg'),
+}
+
+# libsndfileがOpusの圧縮レベルから換算するビットレートの範囲（1チャンネルあたり、bps）
+# 圧縮レベル0.0が上限、1.0が下限で、その間は線形に対応する
+OPUS_MAX_BITRATE = 256000
+OPUS_MIN_BITRATE = 6000
+# Opusは可変ビットレートのため、目標ビットレートから見積もるサイズに余裕を持たせる
+OPUS_SIZE_MARGIN = 1.25
+
+
+def opus_compression_level(bitrate, channels=1):
+    """Opusの目標ビットレート(bps、全チャンネルの合計)を圧縮レベル(0.0〜1.0)に換算する"""
+    per_channel = bitrate / max(1, channels)
+    level = (OPUS_MAX_BITRATE - per_channel) / (OPUS_MAX_BITRATE - OPUS_MIN_BITRATE)
+    return min(1.0, max(0.0, level))
+
+
+def encode_wav(pcm, samplerate, channels=1):
+    """int16のPCM配列をメモリ上でWAVに変換してbytesを返す"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(samplerate)
+        wf.writeframes(np.ascontiguousarray(pcm, dtype=np.int16).tobytes())
+    return buffer.getvalue()
+
+
+class AudioEncoder:
+    """録音したPCMをアップロード用の形式に変換するエンコーダー
+
+    formatには wav / flac / opus を指定する。flacとopusはsoundfile
+    (libsndfile)で配列を一括エンコードし、soundfileが使えない場合は
+    wavにフォールバックする。エンコード前後のバイト数はリクエストごとにログに出す。
+    soundfileにはビットレートを直接指定する方法がないため、opus_bitrate(bps)を
+    指定した場合はopus_compression_level()で圧縮レベルに換算して渡す。
+    """
+
+    def __init__(self, format='wav', compression_level=None, opus_bitrate=None):
+        self.logger = logging.getLogger(__name__)
+        if format not in FORMATS:
+            self.logger.warning(f"未対応のエンコード形式です: {format}。wavを使用します")
+            format = 'wav'
+        self.format = format
+        # 0.0(低圧縮・高速)〜1.0(高圧縮)。Noneならライブラリの既定値
+        self.compression_level = compression_level
+        # Opusの目標ビットレート(bps)。指定するとopusではcompression_levelより優先する
+        self.opus_bitrate = opus_bitrate
+        self.total_raw_bytes = 0
+        self.total_encoded_bytes = 0
+
+    def max_bytes_per_second(self, samplerate, channels=1):
+        """エンコード後の1秒あたりのバイト数の見積もり（上限側）
+
+        wavとflacは無圧縮のPCMと同じ大きさとみなす（flacはPCMより大きくならない）。
+        opusは目標ビットレート（指定がなければ圧縮レベルから換算した値）から見積もる。
+        エンコードに失敗してwavで送る場合は見積もりを超えるため、送信前に実際の大きさも確認する。
+        """
+        if self.format == 'opus':
+            if self.opus_bitrate:
+                bitrate = self.opus_bitrate
+            else:
+                level = 0.0 if self.compression_level is None else self.compression_level
+                per_channel = OPUS_MAX_BITRATE - level * (OPUS_MAX_BITRATE - OPUS_MIN_BITRATE)
+                bitrate = per_channel * channels
+            return bitrate / 8 * OPUS_SIZE_MARGIN
+        return samplerate * channels * 2
+
+    def encode(self, pcm, samplerate, channels=1, name="audio"):
+        """PCM配列をエンコードしてEncodedAudioを返す"""
+        start = time.perf_counter()
+        pcm = np.asarray(pcm, dtype=np.int16)
+        raw_bytes = pcm.nbytes
+        audio_format = self.format
+        data = None
+        if audio_format != 'wav':
+            try:
+                data = self._encode_soundfile(pcm, samplerate, audio_format)
+            except ImportError:
+                self.logger.warning("soundfileがインストールされていないため、wavで送信します")
+            except Exception as e:
+                self.logger.error(f"{audio_format}へのエンコード中にエラー: {e}。wavで送信します")
+            if data is None:
+                audio_format = 'wav'
+        if data is None:
+            data = encode_wav(pcm, samplerate, channels)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.total_raw_bytes += raw_bytes
+        self.total_encoded_bytes += len(data)
+        ratio = len(data) / raw_bytes * 100 if raw_bytes else 0
+        self.logger.info(
+            f"音声エンコード: PCM {raw_bytes}バイト -> {audio_format} {len(data)}バイト "
+            f"({ratio:.1f}%, {elapsed_ms:.1f}ms)"
+        )
+        extension, mime = FORMATS[audio_format]
+        return EncodedAudio(f"{name}.{extension}", data, mime)
+
+    def _encode_soundfile(self, pcm, samplerate, audio_format):
+        import soundfile as sf
+
+        buffer = io.BytesIO()
+        kwargs = {}
+        if self.compression_level is not None:
+            kwargs['compression_level'] = self.compression_level
+        if audio_format == 'opus' and self.opus_bitrate:
+            channels = pcm.shape[1] if pcm.ndim > 1 else 1
+            kwargs['compression_level'] = opus_compression_level(self.opus_bitrate, channels)
+        if audio_format == 'flac':
+            sf.write(buffer, pcm, samplerate, format='FLAC', subtype='PCM_16', **kwargs)
+        else:
+            sf.write(buffer, pcm, samplerate, format='OGG', subtype='OPUS', **kwargs)
+        return buffer.getvalue()
@@ -0,0 +1,97 @@
+import logging
+
+import numpy as np
+
+from vad import VoiceActivityDetector
+
+
+class SilenceTrimmer:
+    """アップロード前に無音を取り除く前処理
+
+    先頭と末尾の無音を削除し、途中のmax_gap_seconds秒を超える無音は
+    keep_gap_seconds秒に短縮する。発話/無音の判定はVoiceActivityDetectorの
+    フレーム単位の判定を使い、発話の前後はpadding_seconds秒だけ残す。
+    処理はすべて配列演算で行う。
+    """
+
+    def __init__(self, vad=None, max_gap_seconds=0.8, keep_gap_seconds=0.3, padding_seconds=0.2):
+        self.logger = logging.getLogger(__name__)
+        self.vad = vad or VoiceActivityDetector()
+        self.max_gap_seconds = max_gap_seconds
+        self.keep_gap_seconds = keep_gap_seconds
+        self.padding_seconds = padding_seconds
+
+    def keep_mask(self, voiced, samplerate, frame):
+        """残すフレームのマスクを返す"""
+        pad = int(round(self.padding_seconds * samplerate / frame))
+        if pad > 0:
+            voiced = np.convolve(voiced, np.ones(2 * pad + 1, dtype=np.int32), mode='same') > 0
+
+        silent = ~voiced
+        edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        if starts.size == 0:
+            return voiced
+        ends = np.flatnonzero(edges == -1)
+        lengths = ends - starts
+        # 先頭・末尾に接する無音は丸ごと削除し、途中の無音だけを対象にする
+        internal = (starts > 0) & (ends < len(silent))
+
+        max_gap = int(self.max_gap_seconds * samplerate / frame)
+        keep_gap = int(self.keep_gap_seconds * samplerate / frame)
+        run_id = np.cumsum(edges[:-1] == 1) - 1
+        position = np.arange(len(silent)) - starts[run_id]
+        keep_silent = silent & internal[run_id] & (
+            (lengths[run_id] <= max_gap) | (position < keep_gap)
+        )
+        return voiced | keep_silent
+
+    def process(self, pcm, samplerate):
+        """無音を除去したPCM配列と削除した秒数を返す
+
+        発話が見つからない場合は元の配列をそのまま返す。
+        """
+        if pcm is None or len(pcm) == 0:
+            return pcm, 0.0
+        frame = self.vad.frame_length(samplerate)
+        voiced = self.vad.speech_mask(pcm, samplerate)
+        if not voiced.any():
+            self.logger.info("発話が検出されなかったため無音除去をスキップします")
+            return pcm, 0.0
+
+        mask = np.repeat(self.keep_mask(voiced, samplerate, frame), frame)[:len(pcm)]
+        trimmed = pcm[mask]
+        removed_seconds = (len(pcm) - len(trimmed)) / samplerate
+        self.logger.info(
+            f"無音除去: {removed_seconds:.2f}秒削除 "
+            f"({len(pcm) / samplerate:.2f}秒 -> {len(trimmed) / samplerate:.2f}秒)"
+        )
+        return trimmed, removed_seconds
+
+
+def split_at_silence(total_frames, read, samplerate, vad, max_seconds, search_seconds=30):
+    """長い音声をmax_seconds秒以下の区間に分割し、(開始, 終了)フレームのリストを返す
+
+    各区間の末尾search_seconds秒の範囲だけをread(start, end)で読み出し、
+    その中で最後の無音の中央で区切る。無音がなければmax_seconds秒で区切る。
+    読み出す範囲が限られるため、ディスク上の長時間録音でもメモリ使用量は一定。
+    """
+    max_frames = int(max_seconds * samplerate)
+    search_frames = min(int(search_seconds * samplerate), max_frames // 2)
+    frame = vad.frame_length(samplerate)
+    bounds = []
+    start = 0
+    while total_frames - start > max_frames:
+        window_start = start + max_frames - search_frames
+        silent = ~vad.speech_mask(read(window_start, start + max_frames), samplerate)
+        cut = start + max_frames
+        if silent.any():
+            # 最後の無音区間の中央で区切る
+            last = np.flatnonzero(silent)[-1]
+            first = np.flatnonzero(silent & ~np.concatenate(([False], silent[:-1])))[-1]
+            cut = int(window_start + (first + last + 1) // 2 * frame)
+        bounds.append((start, cut))
+        start = cut
+    if start < total_frames:
+        bounds.append((start, total_frames))
+    return bounds
@@ -0,0 +1,112 @@
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+
+class DiskAudioStore:
+    """長時間録音用に、PCMをチャンクファイルへ逐次書き出すストア
+
+    メモリ上にはchunk_seconds秒分の書き込み用バッファだけを持ち、
+    満杯になるたびに一時フォルダへ生のint16ファイルとして書き出す。
+    録音時間に関わらずメモリ使用量は一定で、read()で任意の範囲を読み出せる。
+    recorder.AudioBufferと異なり、write()の戻り値は書き込んだブロックのコピーになる。
+    """
+
+    def __init__(self, samplerate, channels=1, chunk_seconds=60, directory=None):
+        self.logger = logging.getLogger(__name__)
+        self.samplerate = samplerate
+        self.channels = channels
+        self.chunk_frames = int(samplerate * chunk_seconds)
+        self.directory = directory
+        self._dir = None
+        self._staging = None
+        self._staged = 0
+        self._chunks = []
+        self._frames = 0
+
+    def __len__(self):
+        return self._frames
+
+    @property
+    def nbytes(self):
+        return self._frames * self.channels * 2
+
+    def reset(self):
+        self.release()
+        self._dir = tempfile.mkdtemp(prefix="voice_input_", dir=self.directory)
+        self._staging = np.empty((self.chunk_frames, self.channels), dtype=np.int16)
+
+    def write(self, block):
+        if self._dir is None:
+            self.reset()
+        written = block.copy()
+        offset = 0
+        while offset < len(block):
+            frames = min(len(block) - offset, self.chunk_frames - self._staged)
+            self._staging[self._staged:self._staged + frames] = block[offset:offset + frames]
+            self._staged += frames
+            offset += frames
+            if self._staged == self.chunk_frames:
+                self._flush()
+        self._frames += len(block)
+        return written
+
+    def _flush(self):
+        if self._staged == 0:
+            return
+        path = os.path.join(self._dir, f"chunk_{len(self._chunks):05d}.pcm")
+        self._staging[:self._staged].tofile(path)
+        self._chunks.append((path, self._staged))
+        self._staged = 0
+
+    def finalize(self):
+        """書き込み用バッファの残りを書き出し、メモリを解放する"""
+        if self._staging is not None:
+            self._flush()
+            self._staging = None
+        self.logger.debug(f"録音を{len(self._chunks)}個のチャンクに保存しました ({self._frames / self.samplerate:.1f}秒)")
+
+    def read(self, start, end):
+        """start〜endフレームの範囲をint16の配列として読み出す"""
+        start = max(0, start)
+        end = min(end, self._frames)
+        parts = []
+        chunk_start = 0
+        for path, frames in self._chunks:
+            chunk_end = chunk_start + frames
+            if chunk_end > start and chunk_start < end:
+                first = max(start, chunk_start) - chunk_start
+                last = min(end, chunk_end) - chunk_start
+                data = np.fromfile(
+                    path,
+                    dtype=np.int16,
+                    count=(last - first) * self.channels,
+                    offset=first * self.channels * 2
+                )
+                parts.append(data.reshape(-1, self.channels))
+            chunk_start = chunk_end
+        if self._staging is not None and end > chunk_start:
+            parts.append(self._staging[max(start, chunk_start) - chunk_start:end - chunk_start])
+        if not parts:
+            return np.empty((0, self.channels), dtype=np.int16)
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+    def iter_chunks(self):
+        """保存済みのチャンクを順番に読み出す"""
+        start = 0
+        for _, frames in self._chunks:
+            yield self.read(start, start + frames)
+            start += frames
+
+    def release(self):
+        """一時フォルダとチャンクファイルを削除する"""
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+        self._dir = None
+        self._staging = None
+        self._staged = 0
+        self._chunks = []
+        self._frames = 0
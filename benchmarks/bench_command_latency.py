@@ -0,0 +1,54 @@
+"""
+常駐インスタンスへのコマンド送信の所要時間の計測
+
+CommandServerを起動し、send_commandの往復時間と、別プロセスからコマンドを
+送って終了するまでの時間（2回目の起動に相当）を計測する。
+
+    python benchmarks/bench_command_latency.py --requests 200 --launches 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_DIR)
+
+from command_server import CommandServer, send_command
+
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="コマンド送信の所要時間の計測")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--launches", type=int, default=10)
+    args = parser.parse_args()
+
+    server = CommandServer(port=0)
+    server.bind()
+    server.serve(lambda command: "pong" if command == "ping" else "ok")
+
+    round_trips = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        assert send_command("ping", port=server.port) == "pong"
+        round_trips.append((time.perf_counter() - start) * 1000)
+
+    launches = []
+    code = f"from command_server import send_command; send_command('toggle', port={server.port})"
+    for _ in range(args.launches):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, check=True)
+        launches.append((time.perf_counter() - start) * 1000)
+    server.close()
+
+    print(f"コマンドの往復 ({args.requests}回): p50 {statistics.median(round_trips):.2f}ms, "
+          f"p95 {percentile(round_trips, 0.95):.2f}ms")
+    print(f"別プロセスからの送信 ({args.launches}回, Pythonの起動を含む): "
+          f"p50 {statistics.median(launches):.1f}ms, p95 {percentile(launches, 0.95):.1f}ms")
@@ -0,0 +1,81 @@
+"""
+設定の読み取り・保存の計測
+
+config.jsonのコピーに対して、(1) 呼び出しのたびにファイルを開いてJSONを解析する
+従来の読み取りとConfigStore.getの所要時間、(2) ウィンドウのドラッグを想定した
+連続する位置の保存を、毎回書き込む場合とConfigStore.setでまとめる場合で比較する。
+
+    python benchmarks/bench_config_store.py --reads 2000 --moves 300
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_DIR)
+
+from config_store import ConfigStore
+
+
+class CountingStore(ConfigStore):
+    """書き込み回数を数えるConfigStore"""
+    writes = 0
+
+    def _write(self):
+        self.writes += 1
+        super()._write()
+
+
+def read_from_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    return config.get('audio', {}).get('transcriber_model')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="設定の読み取り・保存の計測")
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--moves", type=int, default=300)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    path = os.path.join(work_dir, 'config.json')
+    shutil.copy(os.path.join(REPO_DIR, 'config.json'), path)
+    try:
+        start = time.perf_counter()
+        for _ in range(args.reads):
+            read_from_file(path)
+        file_us = (time.perf_counter() - start) / args.reads * 1e6
+
+        store = CountingStore(path, save_delay=0.2)
+        start = time.perf_counter()
+        for _ in range(args.reads):
+            store.section('audio').get('transcriber_model')
+        store_us = (time.perf_counter() - start) / args.reads * 1e6
+
+        config = store.data
+        start = time.perf_counter()
+        for i in range(args.moves):
+            config = dict(config, window_position={'x': i, 'y': i})
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(config, f, ensure_ascii=False, indent=4)
+        direct_ms = (time.perf_counter() - start) * 1000
+
+        store.reload(force=True)
+        start = time.perf_counter()
+        for i in range(args.moves):
+            store.set('window_position', {'x': i, 'y': i})
+        set_ms = (time.perf_counter() - start) * 1000
+        time.sleep(0.4)
+        with open(path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)['window_position']
+    finally:
+        shutil.rmtree(work_dir)
+
+    print(f"読み取り ({args.reads}回): 毎回ファイルを解析 {file_us:.1f}us/回, ConfigStore {store_us:.2f}us/回")
+    print(f"ウィンドウ移動 ({args.moves}回): 毎回書き込み {direct_ms:.1f}ms ({args.moves}回書き込み), "
+          f"ConfigStore {set_ms:.1f}ms ({store.writes}回書き込み, 保存された位置 {saved})")
@@ -0,0 +1,70 @@
+"""
+投機的送信(hedging)による応答時間の裾野の改善の計測
+
+応答時間に裾野がある主系のスタブサーバーと、安定した予備系のスタブサーバーを起動し、
+短い音声を繰り返し文字起こししてp50/p95/最大の応答時間を比較する。
+
+    python benchmarks/bench_hedging.py --requests 40 --tail-ratio 0.1 --tail-latency 4
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BENCH_DIR)
+
+# スタブサーバーはAPIキーを検証しないが、クライアント生成に必要なため設定する
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from bench_vad import synthesize
+from stub_openai_server import start_stub_server
+from transcriber import Transcriber
+
+
+def run(config, pcm, samplerate, requests):
+    transcriber = Transcriber(dict(config, samplerate=samplerate, upload_format='wav'))
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        transcriber.transcribe(pcm, samplerate, 1)
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies)
+
+
+def summary(latencies):
+    return (f"p50 {np.percentile(latencies, 50):.2f}秒, p95 {np.percentile(latencies, 95):.2f}秒, "
+            f"最大 {latencies.max():.2f}秒")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="投機的送信の計測")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--tail-ratio", type=float, default=0.1)
+    parser.add_argument("--tail-latency", type=float, default=4.0)
+    parser.add_argument("--backup-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    samplerate = 24000
+    primary, primary_url = start_stub_server(0, args.latency, tail_ratio=args.tail_ratio,
+                                             tail_latency=args.tail_latency)
+    backup, backup_url = start_stub_server(0, args.backup_latency)
+    pcm = synthesize(3, samplerate)
+
+    base = run({'api_base_url': primary_url}, pcm, samplerate, args.requests)
+    hedged = run({
+        'api_base_url': primary_url,
+        'hedge_base_url': backup_url,
+        'hedge_min_delay_seconds': 0.2,
+        'hedge_default_delay_seconds': 1.0,
+    }, pcm, samplerate, args.requests)
+    primary.shutdown()
+    backup.shutdown()
+
+    print(f"主系: {args.latency}秒 (うち{args.tail_ratio:.0%}は+{args.tail_latency}秒), 予備系: {args.backup_latency}秒")
+    print(f"主系のみ: {summary(base)}")
+    print(f"投機的送信あり: {summary(hedged)}")
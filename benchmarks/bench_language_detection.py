@@ -0,0 +1,51 @@
+"""
+Translator.detect_languageの1回あたりの判定時間の計測
+
+短い入力と長い入力のそれぞれについて、文字種の割合による高速な判定と、
+比較用にlangdetectだけで判定した場合の時間をマイクロ秒で表示する。
+langdetectの初回呼び出し（言語プロファイルの読み込み）は別に表示する。
+
+    python benchmarks/bench_language_detection.py --repeat 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import translator
+from translator import Translator
+
+SAMPLES = {
+    "短い日本語": "設定を保存しました。",
+    "短い英語": "Settings saved.",
+    "長い日本語": "プログラミング用語や技術用語を含む長い文章です。LLMのAPIを呼び出します。" * 200,
+    "長い英語": "This is a long English paragraph about transcription latency. " * 200,
+    "判定が難しい入力": "Deploy the build to 本番 tonight, then check the logs.",
+}
+
+
+def per_call(function, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(text)
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="言語判定の計測")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    detector = Translator()
+    start = time.perf_counter()
+    translator._statistical_detect("warm up")
+    print(f"langdetectの初回読み込み: {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    print(f"{'入力':<12} {'文字数':>7} {'結果':>4} {'detect_language':>16} {'langdetectのみ':>16}")
+    for name, text in SAMPLES.items():
+        fast = per_call(detector.detect_language, text, args.repeat)
+        statistical = per_call(translator._statistical_detect, text, max(1, args.repeat // 20))
+        print(f"{name:<12} {len(text):>7} {detector.detect_language(text):>4} "
+              f"{fast * 1e6:>13.1f} us {statistical * 1e6:>13.1f} us")
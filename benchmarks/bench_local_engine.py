@@ -0,0 +1,85 @@
+"""
+ローカル(CPU)の文字起こしエンジンとリモートAPIの応答時間・スループットの比較
+
+同じ合成音声をローカルエンジン(faster-whisper)とリモートの送信経路
+(既定ではstub_openai_server.py、--base-urlで実際のAPIなど)で文字起こしし、
+音声の長さごとの応答時間と実時間比(処理時間 / 音声長)を表示する。
+ローカル側はGPUを使わず、モデルの読み込み時間も別に表示する。
+faster-whisperが必要 (pip install faster-whisper)。
+
+    python benchmarks/bench_local_engine.py --model small --compute-type int8 --seconds 3 10 30
+"""
+import argparse
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BENCH_DIR)
+
+# スタブサーバーはAPIキーを検証しないが、クライアント生成に必要なため設定する
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from bench_vad import synthesize
+from stub_openai_server import start_stub_server
+from transcriber import Transcriber
+
+
+def measure(transcriber, pcm, samplerate, repeat):
+    """repeat回文字起こしし、最短の所要時間を返す"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        transcriber.transcribe(pcm, samplerate, 1)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ローカルエンジンとリモートAPIの比較")
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--cpu-threads", type=int, default=0)
+    parser.add_argument("--seconds", type=float, nargs="+", default=[3, 10, 30])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--base-url", default=None, help="リモート側の接続先（省略時はスタブサーバー）")
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--latency-per-second", type=float, default=0.03)
+    args = parser.parse_args()
+
+    samplerate = 24000
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server, base_url = start_stub_server(0, args.latency, args.latency_per_second)
+
+    common = {'samplerate': samplerate, 'upload_format': 'wav', 'trim_silence': False}
+    remote = Transcriber(dict(common, api_base_url=base_url))
+
+    start = time.perf_counter()
+    local = Transcriber(dict(
+        common,
+        transcription_engine='local',
+        local_model=args.model,
+        local_compute_type=args.compute_type,
+        local_cpu_threads=args.cpu_threads
+    ))
+    loaded = local.engine.wait_loaded()
+    load_time = time.perf_counter() - start
+    if not loaded:
+        sys.exit("ローカルモデルを読み込めませんでした（faster-whisperがインストールされているか確認してください）")
+
+    print(f"ローカルモデル: {args.model} ({args.compute_type}), 読み込み {load_time:.1f}秒")
+    print(f"リモート: {base_url}")
+    print(f"{'音声長':>6} | {'ローカル':>14} | {'リモート':>14}")
+    for seconds in args.seconds:
+        pcm = synthesize(seconds, samplerate)
+        local_time = measure(local, pcm, samplerate, args.repeat)
+        remote_time = measure(remote, pcm, samplerate, args.repeat)
+        print(f"{seconds:5.0f}秒 | {local_time:6.2f}秒 (x{local_time / seconds:.2f}) | "
+              f"{remote_time:6.2f}秒 (x{remote_time / seconds:.2f})")
+
+    if server is not None:
+        server.shutdown()
@@ -0,0 +1,62 @@
+"""
+長時間録音の並列チャンク文字起こしの計測
+
+ローカルのスタブサーバー(stub_openai_server.py)を起動し、合成した長時間音声を
+同時実行数1(逐次)と指定した同時実行数で文字起こしして所要時間を比較する。
+スタブは「固定遅延 + 音声1秒あたりの遅延」で応答するため、実際のAPIと同様に
+長いリクエストほど時間がかかる。
+
+    python benchmarks/bench_parallel_chunks.py --minutes 10 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BENCH_DIR)
+
+# スタブサーバーはAPIキーを検証しないが、クライアント生成に必要なため設定する
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from bench_vad import synthesize
+from stub_openai_server import start_stub_server
+from transcriber import Transcriber
+
+
+def run(base_url, pcm, samplerate, workers, chunk_seconds):
+    transcriber = Transcriber({
+        'api_base_url': base_url,
+        'samplerate': samplerate,
+        'upload_format': 'wav',
+        'max_upload_seconds': chunk_seconds,
+        'chunk_workers': workers,
+    })
+    start = time.perf_counter()
+    text = transcriber.transcribe(pcm, samplerate, 1)
+    return time.perf_counter() - start, text
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="並列チャンク文字起こしの計測")
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-seconds", type=float, default=60)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--latency-per-second", type=float, default=0.02)
+    args = parser.parse_args()
+
+    samplerate = 24000
+    server, base_url = start_stub_server(0, args.latency, args.latency_per_second)
+    pcm = synthesize(args.minutes * 60, samplerate)
+
+    sequential, _ = run(base_url, pcm, samplerate, 1, args.chunk_seconds)
+    parallel, text = run(base_url, pcm, samplerate, args.workers, args.chunk_seconds)
+    server.shutdown()
+
+    print(f"音声長: {args.minutes:.1f}分, チャンク上限: {args.chunk_seconds:.0f}秒")
+    print(f"逐次 (同時実行数 1): {sequential:.2f}秒")
+    print(f"並列 (同時実行数 {args.workers}): {parallel:.2f}秒")
+    print(f"高速化: {sequential / parallel:.2f}倍")
+    print(f"連結結果: {text[:120]}...")
@@ -0,0 +1,53 @@
+"""
+バッチ翻訳(translate_batch)のスループット計測
+
+スタブサーバーに対して、同じセグメントのリストを1件ずつのtranslate()と
+まとめて送るtranslate_batch()で翻訳し、1秒あたりの翻訳件数を比較する。
+キャッシュの影響を除くため、計測ごとに新しいTranslatorを使う。
+
+    python benchmarks/bench_translate_batch.py --segments 60 --batch-tokens 400
+"""
+import argparse
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BENCH_DIR)
+
+# スタブサーバーはAPIキーを検証しないが、クライアント生成に必要なため設定する
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from stub_openai_server import start_stub_server
+from Common_OpenAIAPI import configure_client
+from translator import Translator
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="バッチ翻訳の計測")
+    parser.add_argument("--segments", type=int, default=60)
+    parser.add_argument("--batch-tokens", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(0, args.latency)
+    configure_client(base_url=base_url)
+    texts = [f"設定画面の{i}番目の項目を保存しました。" for i in range(args.segments)]
+
+    start = time.perf_counter()
+    translator = Translator()
+    for text in texts:
+        translator.translate(text)
+    sequential = time.perf_counter() - start
+
+    translator = Translator()
+    translator.translate_batch(texts, max_batch_tokens=args.batch_tokens, workers=args.workers)
+    stats = translator.last_batch_stats
+    server.shutdown()
+
+    print(f"セグメント数: {args.segments}")
+    print(f"1件ずつ: {sequential:.2f}秒 ({args.segments / sequential:.1f}件/秒)")
+    print(f"バッチ ({stats['batches']}バッチ, 同時実行数 {args.workers}): "
+          f"{stats['seconds']:.2f}秒 ({stats['segments_per_second']:.1f}件/秒)")
@@ -0,0 +1,50 @@
+"""
+翻訳キャッシュのヒット時の応答時間の計測
+
+TranslationCacheに翻訳結果を登録し、メモリ(LRU)とディスク(SQLite)の
+それぞれからヒットした場合の1件あたりの取得時間をマイクロ秒で表示する。
+
+    python benchmarks/bench_translation_cache.py --entries 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from translation_cache import TranslationCache
+
+
+def bench_get(cache, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            cache.get(text, 'ja-en', 'gpt-4o')
+    return (time.perf_counter() - start) / (repeat * len(texts))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="翻訳キャッシュの計測")
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    texts = [f"設定画面の{i}番目の項目を保存しました。" for i in range(args.entries)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "translations.sqlite3")
+        cache = TranslationCache(max_entries=args.entries, path=path)
+        for text in texts:
+            cache.put(text, 'ja-en', 'gpt-4o', f"Saved item {text}")
+        memory = bench_get(cache, texts, args.repeat)
+        cache.close()
+
+        # メモリが空の状態で開き直し、ディスクからの取得を計測する（1回目だけがディスクヒット）
+        cache = TranslationCache(max_entries=args.entries, path=path)
+        disk = bench_get(cache, texts, 1)
+        print(f"登録件数: {args.entries}")
+        print(f"メモリヒット: {memory * 1e6:.1f} us / 件")
+        print(f"ディスクヒット: {disk * 1e6:.1f} us / 件")
+        print(f"統計: {cache.stats()}")
+        cache.close()
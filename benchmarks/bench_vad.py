@@ -0,0 +1,65 @@
+"""
+音声区間検出(VAD)のCPUコスト計測
+
+合成音声(雑音 + 発話相当の区間)に対して、録音中の逐次判定(process_block)と
+録音済み配列の一括判定(speech_mask)にかかる時間を、音声1秒あたりで表示する。
+
+    python benchmarks/bench_vad.py --seconds 60
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from vad import VoiceActivityDetector
+
+
+def synthesize(seconds, samplerate, seed=0):
+    """1秒ごとに発話と無音を交互に並べたint16の合成音声を作る"""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * samplerate)
+    t = np.arange(n) / samplerate
+    noise = rng.normal(0, 0.002, n)
+    speech = 0.2 * np.sin(2 * np.pi * 220 * t) * (np.floor(t) % 2 == 0)
+    return ((noise + speech) * 32767).astype(np.int16).reshape(-1, 1)
+
+
+def bench_stream(vad, pcm, samplerate, blocksize):
+    vad.reset()
+    start = time.perf_counter()
+    for i in range(0, len(pcm), blocksize):
+        vad.process_block(pcm[i:i + blocksize], samplerate)
+    return time.perf_counter() - start
+
+
+def bench_batch(vad, pcm, samplerate, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        vad.speech_mask(pcm, samplerate)
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VADのCPUコスト計測")
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--samplerate", type=int, default=24000)
+    parser.add_argument("--blocksize", type=int, default=480)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pcm = synthesize(args.seconds, args.samplerate)
+    vad = VoiceActivityDetector()
+
+    stream_time = bench_stream(vad, pcm, args.samplerate, args.blocksize)
+    batch_time = bench_batch(vad, pcm, args.samplerate, args.repeat)
+    speech_ratio = vad.speech_mask(pcm, args.samplerate).mean()
+
+    print(f"音声長: {args.seconds:.0f}秒 ({args.samplerate}Hz, ブロック{args.blocksize}サンプル)")
+    print(f"逐次判定: {stream_time / args.seconds * 1000:.3f} ms / 音声1秒 "
+          f"(1ブロックあたり {stream_time / (len(pcm) / args.blocksize) * 1e6:.1f} us)")
+    print(f"一括判定: {batch_time / args.seconds * 1000:.3f} ms / 音声1秒")
+    print(f"発話と判定されたフレームの割合: {speech_ratio:.2f}")
@@ -0,0 +1,78 @@
+"""
+起動時のモジュール読み込み時間のレポート
+
+python -X importtime で voice_input_app を読み込み、読み込みにかかった合計時間と、
+時間のかかったトップレベルのモジュールを表示する。起動時には読み込まない
+はずのモジュール(LAZY_MODULES)が読み込まれていた場合と、合計時間が予算
+(--budget-ms)を超えた場合は終了コード1を返すため、回帰テストとして使える。
+
+    python benchmarks/startup_report.py --budget-ms 400 --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# 起動時の読み込み時間の目標(ms)。Tk・keyboard・sounddevice(numpy)だけを読み込んだ場合の目安
+STARTUP_BUDGET_MS = 400
+
+# 起動時には読み込まず、使うとき（またはウィンドウ表示後のバックグラウンド）に読み込むモジュール
+LAZY_MODULES = (
+    "openai", "httpx", "pydantic", "pyautogui", "pyperclip", "langdetect",
+    "psutil", "pystray", "PIL", "requests", "sqlite3", "faster_whisper", "soundfile",
+)
+
+
+def measure(module="voice_input_app"):
+    """-X importtimeの出力を (モジュール名, ネストの深さ, 自身の時間us, 累計時間us) のリストで返す"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR, capture_output=True, text=True, encoding="utf-8", errors="replace"
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{module}の読み込みに失敗しました:\n{result.stderr[-2000:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def report(entries, top):
+    total_ms = sum(self_us for _, _, self_us, _ in entries) / 1000
+    # 深さ0〜1の行（voice_input_appとそれが直接読み込むモジュール）を累計時間の順に表示する
+    top_level = sorted((e for e in entries if e[1] <= 1), key=lambda e: e[3], reverse=True)
+    print(f"読み込んだモジュール数: {len(entries)}, 合計 {total_ms:.1f}ms")
+    print(f"{'累計(ms)':>9} {'自身(ms)':>9}  モジュール")
+    for name, _, self_us, cumulative_us in top_level[:top]:
+        print(f"{cumulative_us / 1000:9.1f} {self_us / 1000:9.1f}  {name}")
+    loaded = {name.split(".")[0] for name, _, _, _ in entries}
+    return total_ms, sorted(loaded & set(LAZY_MODULES))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="起動時のモジュール読み込み時間のレポート")
+    parser.add_argument("--module", default="voice_input_app")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    # 1回目はバイトコードのコンパイルを含むため、2回目を計測する
+    measure(args.module)
+    total_ms, eager = report(measure(args.module), args.top)
+
+    failed = False
+    if eager:
+        print(f"NG: 起動時に読み込まないはずのモジュールが読み込まれています: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"NG: 読み込み時間 {total_ms:.1f}ms が予算 {args.budget_ms:.0f}ms を超えています")
+        failed = True
+    if not failed:
+        print(f"OK: 読み込み時間 {total_ms:.1f}ms (予算 {args.budget_ms:.0f}ms)")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,166 @@
+"""
+OpenAI互換APIのローカルスタブサーバー
+
+リモートのAPIの代わりに使うための最小限のサーバー。
+config.json の audio.api_base_url に http://127.0.0.1:<port>/v1 を設定すると
+文字起こしリクエストがこのサーバーに向く。
+
+    python benchmarks/stub_openai_server.py --port 8765 --latency 0.3
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # 固定の応答遅延(秒)と、音声1秒あたりの追加遅延(秒)
+    latency = 0.3
+    latency_per_second = 0.0
+    # tail_ratioの割合の要求だけtail_latency秒遅らせる（応答時間の裾野の再現）
+    tail_ratio = 0.0
+    tail_latency = 0.0
+    # チャット応答の文数と、1トークン(4文字相当)あたりの生成時間(秒)
+    chat_sentences = 20
+    token_interval = 0.02
+    # 最初のfailures件の文字起こしリクエストには503とRetry-Afterを返す
+    failures = 0
+    retry_after = None
+    request_count = 0
+    _count_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # クライアント側で中断された要求
+            pass
+
+    def do_HEAD(self):
+        # 接続の事前確立(warm)用
+        self.send_response(204)
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        handler = type(self)
+        with handler._count_lock:
+            handler.request_count += 1
+            index = handler.request_count
+
+        if self.path.endswith("/audio/transcriptions") and index <= self.failures:
+            self.send_response(503)
+            if self.retry_after is not None:
+                self.send_header("Retry-After", str(self.retry_after))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.path.endswith("/audio/transcriptions"):
+            # 24kHz/16bit/モノラル相当として音声長を概算
+            audio_seconds = len(body) / (24000 * 2)
+            delay = self.latency + self.latency_per_second * audio_seconds
+            if random.random() < self.tail_ratio:
+                delay += self.tail_latency
+            time.sleep(delay)
+            self._send_json({"text": f"[stub{index}:{len(body)}bytes]"})
+        elif self.path.endswith("/chat/completions"):
+            request = json.loads(body or b"{}")
+            self._chat(request, index)
+        else:
+            self._send_json({"error": {"message": f"unknown path: {self.path}"}}, status=404)
+
+    def _chat(self, request, index):
+        text = "".join(f"スタブの応答の{i + 1}文目です。" for i in range(self.chat_sentences))
+        tokens = [text[i:i + 4] for i in range(0, len(text), 4)]
+        base = {"id": f"stub-{index}", "created": int(time.time()), "model": request.get("model", "stub")}
+        time.sleep(self.latency)
+        schema = (request.get("response_format") or {}).get("json_schema", {}).get("name")
+        content = request.get("messages", [{}])[-1].get("content", "")
+        if schema == "TranslationBatch":
+            # 構造化出力（translator.TranslationBatch）: 各セグメントに印を付けて返す
+            segments = [{"id": s["id"], "translation": f"[tr]{s['text']}"} for s in json.loads(content)]
+            text = json.dumps({"segments": segments}, ensure_ascii=False)
+            tokens = [text[i:i + 4] for i in range(0, len(text), 4)]
+        elif schema:
+            # 構造化出力（post_editor.EditScript）: 対象テキストの先頭5文字を置き換える編集を返す
+            target = content.split("テキスト:\n", 1)[-1][:5]
+            text = json.dumps({"edits": [{"search": target, "replace": f"[edit{index}]"}]}, ensure_ascii=False)
+            tokens = [text[i:i + 4] for i in range(0, len(text), 4)]
+        if not request.get("stream"):
+            time.sleep(self.token_interval * len(tokens))
+            self._send_json(dict(base, object="chat.completion", choices=[{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }]))
+            return
+
+        # Server-Sent Eventsで1トークンずつ送る
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        try:
+            for token in tokens:
+                chunk = dict(base, object="chat.completion.chunk", choices=[{
+                    "index": 0, "delta": {"content": token}, "finish_reason": None,
+                }])
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(self.token_interval)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start_stub_server(port=0, latency=0.3, latency_per_second=0.0, failures=0, retry_after=None,
+                      tail_ratio=0.0, tail_latency=0.0):
+    """スタブサーバーをバックグラウンドで起動し、(server, base_url) を返す
+
+    設定はサーバーごとに独立しているため、遅延の異なる複数のサーバーを同時に起動できる。
+    """
+    handler = type("StubHandler", (StubHandler,), {
+        "latency": latency,
+        "latency_per_second": latency_per_second,
+        "failures": failures,
+        "retry_after": retry_after,
+        "tail_ratio": tail_ratio,
+        "tail_latency": tail_latency,
+        "request_count": 0,
+        "_count_lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    return server, base_url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI互換APIのスタブサーバー")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--latency-per-second", type=float, default=0.0)
+    parser.add_argument("--failures", type=int, default=0)
+    parser.add_argument("--retry-after", type=float, default=None)
+    parser.add_argument("--tail-ratio", type=float, default=0.0)
+    parser.add_argument("--tail-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.latency, args.latency_per_second,
+                                         args.failures, args.retry_after,
+                                         args.tail_ratio, args.tail_latency)
+    print(f"スタブサーバーを起動しました: {base_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,107 @@
+"""
+常駐中のアプリにコマンドを送るためのローカルソケット
+
+アプリは127.0.0.1:47200で待ち受け、1行のコマンド（例: "toggle\\n"）を受け取って
+1行の応答（"ok"、"pong"、"error: ..."）を返す。ポートを確保できたプロセスが
+常駐インスタンスになるため、多重起動の防止も兼ねる。
+
+    python command_server.py toggle
+"""
+import logging
+import socket
+import sys
+import threading
+
+DEFAULT_PORT = 47200
+HOST = "127.0.0.1"
+
+# 受け付けるコマンド（voice_input_app.VoiceInputApp.handle_commandで処理する）
+COMMANDS = (
+    "ping", "status", "show", "toggle", "start", "stop", "cancel",
+    "post-process", "clear", "reload-config", "quit",
+)
+
+
+def send_command(command, port=DEFAULT_PORT, timeout=0.5):
+    """常駐中のアプリにコマンドを送って応答を返す（アプリが起動していなければNone）"""
+    try:
+        with socket.create_connection((HOST, port), timeout=timeout) as sock:
+            sock.sendall(f"{command}\n".encode("utf-8"))
+            with sock.makefile("r", encoding="utf-8") as reader:
+                return reader.readline().strip()
+    except OSError:
+        return None
+
+
+class CommandServer:
+    """ローカルのコマンドを受け付けるサーバー
+
+    bind()でポートを確保し（他のインスタンスが使用中ならOSError）、serve()で
+    受け付けを開始する。bind()からserve()までに届いた接続は待たされるだけで失われない。
+    handlerはコマンド名を受け取り、応答の文字列を返す。
+    """
+
+    def __init__(self, port=DEFAULT_PORT):
+        self.logger = logging.getLogger(__name__)
+        self.port = port
+        self._sock = None
+
+    def bind(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if hasattr(socket, "SO_EXCLUSIVEADDRUSE"):
+            # Windowsでは他のプロセスに同じポートを奪われないようにする
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+        else:
+            # 終了直後の再起動でもTIME_WAITの接続に妨げられずに確保する（待ち受け中のポートは確保できない）
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((HOST, self.port))
+            sock.listen(8)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        self.port = sock.getsockname()[1]
+
+    def serve(self, handler):
+        threading.Thread(target=self._accept_loop, args=(handler,), name="command-server", daemon=True).start()
+        self.logger.info(f"コマンドの受け付けを開始しました: {HOST}:{self.port}")
+
+    def _accept_loop(self, handler):
+        while self._sock is not None:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                # close()でソケットが閉じられた
+                break
+            threading.Thread(target=self._handle, args=(conn, handler), daemon=True).start()
+
+    def _handle(self, conn, handler):
+        with conn:
+            try:
+                conn.settimeout(2.0)
+                with conn.makefile("r", encoding="utf-8") as reader:
+                    command = reader.readline().strip()
+                try:
+                    reply = handler(command)
+                except Exception as e:
+                    self.logger.error(f"コマンド {command} の処理中にエラー: {e}")
+                    reply = f"error: {e}"
+                conn.sendall(f"{reply}\n".encode("utf-8"))
+            except OSError as e:
+                self.logger.debug(f"コマンドの接続が切断されました: {e}")
+
+    def close(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            sock.close()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "ping"
+    reply = send_command(command)
+    if reply is None:
+        print("アプリは起動していません")
+        sys.exit(1)
+    print(reply)
+    sys.exit(0 if not reply.startswith("error") else 1)
@@ -0,0 +1,209 @@
+import copy
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+# config.jsonがない場合に作成する設定
+DEFAULT_CONFIG = {
+    'backup_directory': './backups',
+    'backup_retention_days': 30,
+    'hotkey': 'shift+f1',
+    'cancel_hotkey': 'shift+f2',
+    'post_process_hotkey': 'shift+f3',
+    'clear_hotkey': 'shift+f4',
+    'window_position': {'x': 100, 'y': 100},
+    'audio': {
+        'samplerate': 24000,
+        'channels': 1,
+        'silence_threshold': 0.01,
+        'silence_duration': 10,
+        'device': None
+    }
+}
+
+
+class ConfigStore:
+    """config.jsonを一度だけ読み込んで共有する設定
+
+    読み取りのたびにファイルを開く代わりに、最大check_interval秒に1回だけ更新日時を
+    確認し、変わっていた場合だけ読み直す。set()による変更はsave_delay秒まとめてから
+    一時ファイルに書き込んで置き換えるため、ウィンドウのドラッグ中のように変更が
+    続いても書き込みは1回で済み、書き込み途中のファイルを読まれることもない。
+    dataで返す辞書は読み取り専用として扱う（変更はset()で行う）。
+    pathがない場合は、seed_path（exeに同梱した設定など）があればその内容で、
+    なければDEFAULT_CONFIGで作成する。seed_pathには書き込まない。
+    """
+
+    def __init__(self, path='config.json', seed_path=None, save_delay=1.0, check_interval=1.0):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.seed_path = seed_path
+        self.save_delay = save_delay
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._data = {}
+        self._mtime = None
+        self._checked = time.monotonic()
+        # 保存待ちの変更（保存前に外部で書き換えられた場合は読み直した内容に重ねる）
+        self._pending = {}
+        self._timer = None
+        self._listeners = []
+        with self._lock:
+            self._load()
+
+    def _load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            self._data = dict(self._seed(), **self._pending)
+            try:
+                self._write()
+            except OSError as e:
+                # 書き込めない場所でも、作成した設定で動作は続ける
+                self.logger.error(f"設定ファイルを作成できませんでした: {self.path}: {e}")
+            return True
+        except ValueError as e:
+            # 編集途中の不正なJSONや文字コードの誤り（UnicodeDecodeError）は読み込まず、
+            # ファイルが再び更新されるまで前回の設定を使う
+            self.logger.error(f"設定ファイルの内容が不正なため読み込みません: {self.path}: {e}")
+            self._mtime = mtime
+            return False
+        except OSError as e:
+            # 他のプロセスによるロックなど一時的な失敗は、前回の設定を使って次の確認で読み直す
+            self.logger.error(f"設定ファイルを読み込めませんでした: {self.path}: {e}")
+            return False
+        if not isinstance(data, dict):
+            self.logger.error(f"設定ファイルの内容がJSONのオブジェクトでないため読み込みません: {self.path}")
+            self._mtime = mtime
+            return False
+        data.update(self._pending)
+        self._data = data
+        self._mtime = mtime
+        return True
+
+    def _seed(self):
+        """pathがない場合に作成する設定を返す"""
+        if self.seed_path and os.path.exists(self.seed_path):
+            try:
+                with open(self.seed_path, 'r', encoding='utf-8') as f:
+                    seed = json.load(f)
+                self.logger.info(f"設定ファイルがないため、{self.seed_path}をもとに作成します: {self.path}")
+                return seed
+            except (OSError, json.JSONDecodeError) as e:
+                self.logger.error(f"同梱の設定ファイルを読み込めませんでした: {self.seed_path}: {e}")
+        self.logger.warning(f"設定ファイルが見つからないため、デフォルト値で作成します: {self.path}")
+        return copy.deepcopy(DEFAULT_CONFIG)
+
+    def _write(self):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=4)
+        for attempt in range(3):
+            try:
+                os.replace(temp_path, self.path)
+                break
+            except PermissionError:
+                # Windowsでは他のプロセス（ランチャーなど）が読み込み中だと置き換えられない
+                if attempt == 2:
+                    os.remove(temp_path)
+                    raise
+                time.sleep(0.05)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def add_listener(self, callback):
+        """ファイルを読み直したときに呼び出す関数を登録する（読み直したスレッドで呼ばれる）"""
+        self._listeners.append(callback)
+
+    def reload(self, force=False):
+        """ファイルの更新日時が変わっていれば読み直す（読み直した場合はTrue）"""
+        with self._lock:
+            self._checked = time.monotonic()
+            if not force:
+                try:
+                    if os.stat(self.path).st_mtime_ns == self._mtime:
+                        return False
+                except OSError:
+                    return False
+            changed = self._load()
+        if changed:
+            self.logger.info(f"設定ファイルを読み込みました: {self.path}")
+            for listener in list(self._listeners):
+                try:
+                    listener()
+                except Exception:
+                    # 設定を読み取った側（dataやget）に例外を返さない
+                    self.logger.exception("設定の変更を反映できませんでした")
+        return changed
+
+    @property
+    def data(self):
+        if time.monotonic() - self._checked >= self.check_interval:
+            self.reload()
+        return self._data
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def section(self, name):
+        """"audio"などのセクションを返す（なければ空の辞書）"""
+        return self.data.get(name) or {}
+
+    def set(self, key, value):
+        """設定を変更し、save_delay秒後にまとめて保存する"""
+        with self._lock:
+            # 読み取り中の辞書は書き換えずに置き換える
+            self._data = dict(self._data, **{key: value})
+            self._pending[key] = value
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """保存待ちの変更をすぐに保存する"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            try:
+                # 保存前に外部で書き換えられていれば、その内容に今回の変更を重ねて保存する
+                self.reload()
+                self._write()
+                self._pending = {}
+            except OSError as e:
+                self.logger.error(f"設定ファイルを保存できませんでした: {self.path}: {e}")
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def bundled_config_path():
+    """exeに同梱したconfig.jsonのパス（通常実行時はNone）
+
+    exe実行時の同梱ファイルは終了時に削除される一時フォルダに展開されるため、
+    作業ディレクトリのconfig.jsonがない場合の初期値としてだけ使う。
+    """
+    if getattr(sys, 'frozen', False):
+        return os.path.join(sys._MEIPASS, 'config.json')
+    return None
+
+
+def get_config():
+    """プロセス全体で共有するConfigStoreを返す（初回の呼び出しで読み込む）
+
+    読み込み・保存・更新の確認は作業ディレクトリのconfig.jsonに対して行う。
+    """
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = ConfigStore('config.json', seed_path=bundled_config_path())
+        return _config
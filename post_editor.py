@@ -0,0 +1,116 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from pydantic import BaseModel
+
+from Common_OpenAIAPI import generate_chat_responseStruct, DEFAULT_CHAT_MODEL
+
+
+class EditOperation(BaseModel):
+    """1件の置換（searchに一致する最初の箇所をreplaceに置き換える）"""
+    search: str
+    replace: str
+
+
+class EditScript(BaseModel):
+    edits: List[EditOperation]
+
+
+EDIT_SYSTEM_PROMPT = """あなたはテキスト編集システムです。ユーザーの指示に従ってテキストを編集しますが、
+編集後のテキスト全体ではなく、置換操作のリストだけを返してください。
+- searchには元のテキストからそのまま抜き出した文字列を、一意に特定できる最小限の長さで指定する
+- replaceには置き換え後の文字列を指定する（削除する場合は空文字）
+- 変更が不要な場合はeditsを空にする
+- 指示がテキストの大部分を書き換えるものである場合は、searchにテキスト全体を指定してよい"""
+
+# 分割したテキストを区切る位置の候補（優先度の高い順）
+CHUNK_SEPARATORS = ("\n\n", "\n", "。", "．", ". ", "、")
+
+
+def apply_edits(text, edits):
+    """置換操作を先頭から順に適用し、(編集後のテキスト, 適用できなかった操作の数)を返す"""
+    failed = 0
+    for edit in edits:
+        if not edit.search:
+            failed += 1
+            continue
+        index = text.find(edit.search)
+        if index < 0:
+            failed += 1
+            continue
+        text = text[:index] + edit.replace + text[index + len(edit.search):]
+    return text, failed
+
+
+def split_text(text, max_chars):
+    """テキストをmax_chars文字以下の区間に分割する
+
+    段落・改行・句点などの区切りの直後で切り、区切りがなければmax_chars文字で切る。
+    区間をそのまま連結すると元のテキストに戻る。
+    """
+    chunks = []
+    while len(text) > max_chars:
+        cut = max_chars
+        for separator in CHUNK_SEPARATORS:
+            index = text.rfind(separator, max_chars // 2, max_chars)
+            if index >= 0:
+                cut = index + len(separator)
+                break
+        chunks.append(text[:cut])
+        text = text[cut:]
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+class DiffEditor:
+    """指示に従った編集を、置換操作のリスト（編集スクリプト）で受け取って手元で適用する
+
+    モデルに編集後の全文を出力させる代わりに、変更箇所だけをEditScriptの
+    構造化出力として返させるため、長いテキストの一部を直す場合の出力トークンが少なくて済む。
+    chunk_chars文字を超えるテキストは区間に分割し、最大workers個を並列に編集する。
+    """
+
+    def __init__(self, chunk_chars=2000, workers=4, model=DEFAULT_CHAT_MODEL):
+        self.logger = logging.getLogger(__name__)
+        self.chunk_chars = chunk_chars
+        self.workers = max(1, workers)
+        self.model = model
+
+    def _edit_chunk(self, chunk, instruction, cancel_token):
+        messages = [
+            {"role": "system", "content": EDIT_SYSTEM_PROMPT},
+            {"role": "user", "content": f"指示: {instruction}\n\nテキスト:\n{chunk}"},
+        ]
+        response = generate_chat_responseStruct(messages, EditScript, model=self.model, cancel_token=cancel_token)
+        script = response.choices[0].message.parsed
+        if script is None:
+            raise ValueError("編集スクリプトを取得できませんでした")
+        edited, failed = apply_edits(chunk, script.edits)
+        if failed:
+            self.logger.warning(f"{len(script.edits)}件中{failed}件の置換は該当箇所が見つからなかったため無視しました")
+        return edited, len(script.edits)
+
+    def edit(self, text, instruction, cancel_token=None):
+        """textをinstructionに従って編集したテキストを返す"""
+        start = time.perf_counter()
+        chunks = split_text(text, self.chunk_chars)
+        if len(chunks) == 1:
+            results = [self._edit_chunk(text, instruction, cancel_token)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(chunks)), thread_name_prefix="edit") as executor:
+                futures = [executor.submit(self._edit_chunk, chunk, instruction, cancel_token) for chunk in chunks]
+                try:
+                    results = [future.result() for future in futures]
+                except Exception:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        edited = "".join(chunk for chunk, _ in results)
+        self.logger.info(
+            f"編集スクリプトで編集しました ({len(text)}文字, {len(chunks)}区間, "
+            f"置換{sum(count for _, count in results)}件, {time.perf_counter() - start:.2f}秒)"
+        )
+        return edited
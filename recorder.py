@@ -1,72 +1,501 @@
 import sounddevice as sd
-import wavio
-import tempfile
 import numpy as np
 import logging
 import time
+import os
+import threading
+import wave
+from datetime import datetime
+
+from audio_encoder import encode_wav
+from audio_store import DiskAudioStore
+from vad import VoiceActivityDetector
+
+
+class AudioBuffer:
+    """録音データを書き込むint16のバッファ
+
+    あらかじめ確保した配列に録音ブロックをそのまま書き込み、
+    容量が足りなくなった場合のみ倍の大きさに拡張する。
+    view()はコピーを伴わない配列ビューを返す。
+    """
+
+    def __init__(self, samplerate, channels=1, initial_seconds=60):
+        self.channels = channels
+        self.initial_frames = int(samplerate * initial_seconds)
+        self._data = None
+        self._frames = 0
+
+    def __len__(self):
+        return self._frames
+
+    def reset(self):
+        """書き込み位置を先頭に戻す（確保済みの領域は再利用する）"""
+        if self._data is None:
+            self._data = np.empty((self.initial_frames, self.channels), dtype=np.int16)
+        self._frames = 0
+
+    def write(self, block):
+        """ブロックを末尾に書き込み、書き込んだ範囲のビューを返す"""
+        if self._data is None:
+            self.reset()
+        frames = len(block)
+        end = self._frames + frames
+        if end > len(self._data):
+            capacity = max(end, len(self._data) * 2)
+            grown = np.empty((capacity, self.channels), dtype=np.int16)
+            grown[:self._frames] = self._data[:self._frames]
+            self._data = grown
+        self._data[self._frames:end] = block
+        written = self._data[self._frames:end]
+        self._frames = end
+        return written
+
+    def view(self):
+        """録音済みの範囲をコピーせずに返す"""
+        if self._data is None:
+            return np.empty((0, self.channels), dtype=np.int16)
+        return self._data[:self._frames]
+
+    def release(self):
+        """確保していたメモリを解放する"""
+        self._data = None
+        self._frames = 0
+
+
+class PreRollBuffer:
+    """録音開始前の直近の音声を保持するリングバッファ
+
+    常時開いている入力ストリームから届くブロックを上書きしながら保持し、
+    録音開始時にread()で古い順に取り出す。
+    """
+
+    def __init__(self, frames, channels=1):
+        self._data = np.zeros((frames, channels), dtype=np.int16)
+        self._pos = 0
+        self._filled = 0
+
+    def write(self, block):
+        capacity = len(self._data)
+        frames = len(block)
+        if capacity == 0:
+            return
+        if frames >= capacity:
+            self._data[:] = block[-capacity:]
+            self._pos = 0
+            self._filled = capacity
+            return
+        end = self._pos + frames
+        if end <= capacity:
+            self._data[self._pos:end] = block
+        else:
+            first = capacity - self._pos
+            self._data[self._pos:] = block[:first]
+            self._data[:frames - first] = block[first:]
+        self._pos = end % capacity
+        self._filled = min(capacity, self._filled + frames)
+
+    def read(self):
+        """保持している音声を古い順に並べて返す"""
+        if self._filled < len(self._data):
+            return self._data[:self._filled]
+        return np.concatenate((self._data[self._pos:], self._data[:self._pos]))
+
+    def clear(self):
+        self._pos = 0
+        self._filled = 0
+
+
+class BlockQueue:
+    """録音コールバックから消費スレッドへブロックを渡す固定長のキュー
+
+    生産者(PortAudioのコールバック)と消費者(1つのスレッド)の1対1専用で、
+    ロックは使わない。生産者は事前確保したスロットにブロックを書き込んでから
+    headを進め、消費者は処理が終わったらtailを進める。満杯の場合はブロックを
+    捨てて dropped に数える。
+    """
+
+    def __init__(self, capacity, blocksize, channels=1):
+        self.capacity = capacity
+        self.blocksize = blocksize
+        self._slots = np.zeros((capacity, blocksize, channels), dtype=np.int16)
+        self._lengths = [0] * capacity
+        self.reset()
+
+    def reset(self):
+        self.head = 0
+        self.tail = 0
+        # 満杯で捨てたブロック数 / 処理が追いつかず溜まっていたブロック数
+        self.dropped = 0
+        self.late = 0
+        # PortAudioが入力オーバーフローを報告したブロック数
+        self.overflows = 0
+        self.max_depth = 0
+
+    def depth(self):
+        return self.head - self.tail
+
+    def push(self, indata, overflow=False):
+        """生産者側: ブロックを追加する（コールバックから呼ぶ）"""
+        if overflow:
+            self.overflows += 1
+        for start in range(0, len(indata), self.blocksize):
+            if self.head - self.tail >= self.capacity:
+                self.dropped += 1
+                continue
+            chunk = indata[start:start + self.blocksize]
+            index = self.head % self.capacity
+            self._slots[index, :len(chunk)] = chunk
+            self._lengths[index] = len(chunk)
+            # データを書き込んだ後でheadを進めて消費者に公開する
+            self.head += 1
+
+    def peek(self):
+        """消費者側: 先頭のブロックのビューを返す（空ならNone）"""
+        depth = self.head - self.tail
+        if depth == 0:
+            return None
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if depth > self.capacity // 2:
+            self.late += 1
+        index = self.tail % self.capacity
+        return self._slots[index, :self._lengths[index]]
+
+    def advance(self):
+        """消費者側: peek()したブロックの処理が終わったらスロットを返す"""
+        self.tail += 1
+
+    def stats(self):
+        return {
+            'dropped': self.dropped,
+            'late': self.late,
+            'overflows': self.overflows,
+            'max_depth': self.max_depth,
+        }
+
 
 class Recorder:
-    def __init__(self):
+    def __init__(self, config=None):
+        # config には config.json の "audio" セクションを渡す
+        config = config or {}
         self.logger = logging.getLogger(__name__)
-        self.samplerate = 24000
-        self.channels = 1
+        self.samplerate = config.get('samplerate', 24000)
+        self.channels = config.get('channels', 1)
+        self.device = config.get('device')
         self.filename = None
-        self.recording = []
+        # 録音結果のPCM配列（メモリ上に保持し、エンコードは文字起こし側で行う）
+        self.audio_data = None
+        # デバッグ用: 指定するとWAVファイルもこのフォルダに保存する
+        self.debug_save_dir = config.get('debug_save_audio_dir')
+        # 長時間モード: 録音をチャンクファイルに逐次書き出し、メモリ使用量を一定に保つ
+        self.long_form = config.get('long_form', False)
+        if self.long_form:
+            self.recording = DiskAudioStore(self.samplerate, self.channels, config.get('spill_chunk_seconds', 60))
+        else:
+            self.recording = AudioBuffer(self.samplerate, self.channels)
         self.is_recording = False
-        self.silence_threshold = 500  # Adjust this value based on testing
-        self.silence_duration = 10  # seconds
+        # 発話/無音の判定（silence_thresholdはフルスケール比のRMS）
+        self.vad = VoiceActivityDetector.from_config(config)
+        self.silence_duration = config.get('silence_duration', 10)  # seconds
         self.last_non_silence_time = None
         self.silence_callback = None
+        self.block_callback = None
+        self.pause_callback = None
+        # 発話中の区切りとみなす短い無音の長さ（秒）
+        self.pause_duration = config.get('pause_seconds', 0.5)
+        self.silent_frames = 0
+        self.speech_since_pause = False
+
+        # 常時起動モード: 入力ストリームを開いたままにし、録音開始前の音声も含める
+        self.warm = config.get('warm_stream', False)
+        self.preroll = PreRollBuffer(int(self.samplerate * config.get('preroll_ms', 300) / 1000), self.channels)
+        # 録音していない状態がこの秒数続いたらデバイスを解放する（0またはnullで解放しない）
+        self.idle_release_seconds = config.get('warm_idle_release_seconds', 300)
+        self.stream = None
+        self._idle_timer = None
+        self._lock = threading.Lock()
+        # ストリームの開閉とアイドル解放のタイマーを守るロック。事前起動・録音開始・
+        # アイドル解放が同時に起きてもストリームを二重に開いたり、録音中に閉じたりしない。
+        # 消費スレッドを止めるときに_lockを待つ消費スレッドと競合しないよう、_lockとは分ける
+        self._stream_lock = threading.RLock()
+
+        # コールバックは固定長のブロックをキューに積むだけにし、解析は消費スレッドで行う
+        self.blocksize = int(self.samplerate * config.get('block_ms', 20) / 1000)
+        self.queue = BlockQueue(config.get('queue_blocks', 256), self.blocksize, self.channels)
+        self.poll_interval = self.blocksize / self.samplerate / 2
+        self._consumer = None
+        self._consumer_stop = threading.Event()
 
-    def start_recording(self, silence_callback=None):
+    def start_recording(self, silence_callback=None, block_callback=None, pause_callback=None):
+        """録音を開始する
+
+        block_callbackを指定すると、録音ブロックが届くたびに
+        (ストリーミング文字起こし用に)そのブロックが渡される。
+        pause_callbackは発話後にpause_duration秒の無音が続いたときに呼ばれる。
+        """
         self.logger.info("録音開始")
-        self.recording = []
-        self.is_recording = True
+        # 前回の録音結果は取得した側が discard_audio() で破棄する
+        self.audio_data = None
+        self.filename = None
+        self.recording.reset()
         self.silence_callback = silence_callback
+        self.block_callback = block_callback
+        self.pause_callback = pause_callback
+        self.silent_frames = 0
+        self.speech_since_pause = False
+        self.vad.reset()
         self.last_non_silence_time = time.time()
 
-        def callback(indata, frames, time_info, status):
+        with self._stream_lock:
+            self._cancel_idle_timer()
+            if self.warm and self.stream is not None:
+                # ストリームは開いたままなので、開始位置を記録してプリロールを先頭に含めるだけ
+                with self._lock:
+                    preroll = self.recording.write(self.preroll.read())
+                    self.preroll.clear()
+                    # 消費スレッドのブロックより先にプリロールを渡すため、録音中にする前に渡す
+                    if self.block_callback and len(preroll):
+                        self.block_callback(preroll)
+                    self.is_recording = True
+                self.logger.debug(f"プリロール {len(preroll) / self.samplerate:.2f}秒を録音に含めます")
+                return
+
+            self.is_recording = True
+            try:
+                self._open_stream()
+            except Exception as e:
+                self.logger.error(f"録音ストリーム開始中にエラー: {e}")
+                self.is_recording = False
+                if self.silence_callback:
+                    self.silence_callback()
+
+    def _callback(self, indata, frames, time_info, status):
+        # PortAudioのスレッドではキューに積む以外のことはしない
+        self.queue.push(indata, status.input_overflow)
+
+    def _consume(self):
+        """キューからブロックを取り出して解析する消費スレッド"""
+        while not self._consumer_stop.is_set():
+            block = self.queue.peek()
+            if block is None:
+                time.sleep(self.poll_interval)
+                continue
+            try:
+                self._process_block(block, len(block))
+            except Exception as e:
+                self.logger.error(f"録音ブロックの処理中にエラー: {e}")
+            finally:
+                self.queue.advance()
+
+    def _process_block(self, indata, frames):
+        timed_out = False
+        with self._lock:
             if not self.is_recording:
+                if self.warm:
+                    self.preroll.write(indata)
                 return
-            amplitude = np.abs(indata).max()
-            if amplitude > self.silence_threshold:
+            is_speech = self.vad.process_block(indata, self.samplerate)
+            if is_speech:
                 self.last_non_silence_time = time.time()
-            else:
-                current_time = time.time()
-                if current_time - self.last_non_silence_time > self.silence_duration:
-                    self.logger.info("無音が10秒以上続いたため録音をキャンセルします")
-                    self.stop_recording()
-                    if self.silence_callback:
-                        self.silence_callback()
-                    return
-            self.recording.append(indata.copy())
+            elif time.time() - self.last_non_silence_time > self.silence_duration:
+                timed_out = True
+            if not timed_out:
+                # 確保済みのバッファに直接書き込み、書き込んだ範囲のビューを渡す
+                block = self.recording.write(indata)
 
+        if timed_out:
+            self.logger.info(f"無音が{self.silence_duration}秒以上続いたため録音をキャンセルします")
+            self.stop_recording()
+            if self.silence_callback:
+                self.silence_callback()
+            return
+        if self.block_callback:
+            try:
+                self.block_callback(block)
+            except Exception as e:
+                self.logger.error(f"ブロックコールバック中にエラー: {e}")
+        self._detect_pause(is_speech, frames)
+
+    def _open_stream(self):
+        """入力ストリームと消費スレッドを開始する（_stream_lockを取得して呼ぶ）"""
+        self.queue.reset()
+        self._consumer_stop.clear()
+        self._consumer = threading.Thread(target=self._consume, name="recorder-consumer", daemon=True)
+        self._consumer.start()
         try:
             self.stream = sd.InputStream(
                 samplerate=self.samplerate,
                 channels=self.channels,
-                callback=callback,
+                device=self.device,
+                blocksize=self.blocksize,
+                callback=self._callback,
                 dtype=np.int16
             )
             self.stream.start()
-        except Exception as e:
-            self.logger.error(f"録音ストリーム開始中にエラー: {e}")
-            self.is_recording = False
-            if self.silence_callback:
-                self.silence_callback()
+        except Exception:
+            self.stream = None
+            self._stop_consumer()
+            raise
+
+    def _close_stream(self):
+        with self._stream_lock:
+            stream, self.stream = self.stream, None
+            if stream is not None:
+                stream.stop()
+                stream.close()
+            self._stop_consumer()
+
+    def _stop_consumer(self):
+        self._consumer_stop.set()
+        consumer = self._consumer
+        if consumer is not None and consumer is not threading.current_thread():
+            consumer.join(timeout=1.0)
+        self._consumer = None
+
+    def _wait_for_queue(self, target, timeout=1.0):
+        """targetまでのブロックを消費スレッドが処理し終えるまで待つ"""
+        deadline = time.monotonic() + timeout
+        while self.queue.tail < target and self._consumer is not None and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+
+    def warm_up(self):
+        """常時起動モードで入力ストリームを事前に開いておく"""
+        if not self.warm:
+            return
+        with self._stream_lock:
+            # 録音開始が先に開いていれば何もしない
+            if self.stream is not None:
+                return
+            try:
+                self._open_stream()
+                self.logger.info("入力ストリームを常時起動モードで開きました")
+                self._schedule_idle_release()
+            except Exception as e:
+                self.logger.error(f"入力ストリームの事前起動中にエラー: {e}")
+                self.stream = None
+
+    def release_device(self):
+        """録音中でなければ入力デバイスを解放する"""
+        # 確認から解放までの間に録音が始まらないよう、_stream_lockを持ったまま閉じる
+        with self._stream_lock:
+            with self._lock:
+                if self.is_recording or self.stream is None:
+                    return
+                self.preroll.clear()
+            # 消費スレッドが_lockを待っている可能性があるため、停止は_lockの外で行う
+            self._close_stream()
+        self.logger.info("入力デバイスを解放しました")
+
+    def _schedule_idle_release(self):
+        self._cancel_idle_timer()
+        if self.idle_release_seconds:
+            self._idle_timer = threading.Timer(self.idle_release_seconds, self.release_device)
+            self._idle_timer.daemon = True
+            self._idle_timer.start()
+
+    def _cancel_idle_timer(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _detect_pause(self, is_speech, frames):
+        """発話の後に短い無音が続いたらpause_callbackを呼ぶ"""
+        if is_speech:
+            self.silent_frames = 0
+            self.speech_since_pause = True
+            return
+        self.silent_frames += frames
+        if (self.pause_callback and self.speech_since_pause
+                and self.silent_frames >= self.pause_duration * self.samplerate):
+            self.speech_since_pause = False
+            try:
+                self.pause_callback()
+            except Exception as e:
+                self.logger.error(f"区切りコールバック中にエラー: {e}")
 
     def stop_recording(self):
         self.logger.info("録音停止")
-        if hasattr(self, 'stream'):
-            self.is_recording = False
-            self.stream.stop()
-            self.stream.close()
+        if self.stream is not None:
+            if threading.current_thread() is not self._consumer:
+                # 停止時点までに届いたブロックを録音に含める
+                self._wait_for_queue(self.queue.head)
+            with self._lock:
+                self.is_recording = False
+            stats = self.queue.stats()
+            log = self.logger.warning if stats['dropped'] or stats['overflows'] else self.logger.debug
+            log(f"録音キューの統計: {stats}")
+            if self.warm:
+                # ストリームは閉じずに、一定時間使われなければ解放する
+                with self._stream_lock:
+                    self._schedule_idle_release()
+            else:
+                self._close_stream()
+
+            if self.long_form:
+                # チャンクファイルのまま渡し、次の録音には新しいストアを使う。
+                # ファイルは discard_audio() で削除される
+                store = self.recording
+                store.finalize()
+                self.recording = DiskAudioStore(self.samplerate, self.channels, store.chunk_frames / self.samplerate)
+                if len(store):
+                    self.audio_data = store
+                    if self.debug_save_dir:
+                        self._save_debug_file()
+                else:
+                    store.release()
+                return
+
+            if len(self.recording):
+                # コピーせずにビューを保持する。clear_audio()で解放される
+                self.audio_data = self.recording.view()
+                if self.debug_save_dir:
+                    self._save_debug_file()
+            # バッファは次の録音で新たに確保する
+            self.recording.release()
 
-            if self.recording:
-                self.recording = np.concatenate(self.recording, axis=0)
-                temp_wav = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-                wavio.write(temp_wav.name, self.recording, self.samplerate, sampwidth=2)
-                self.filename = temp_wav.name
+    def _save_debug_file(self):
+        """デバッグ用に録音結果をWAVファイルとして保存する"""
+        try:
+            os.makedirs(self.debug_save_dir, exist_ok=True)
+            filename = os.path.join(self.debug_save_dir, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_recording.wav")
+            if isinstance(self.audio_data, DiskAudioStore):
+                with wave.open(filename, 'wb') as wf:
+                    wf.setnchannels(self.channels)
+                    wf.setsampwidth(2)
+                    wf.setframerate(self.samplerate)
+                    for chunk in self.audio_data.iter_chunks():
+                        wf.writeframes(chunk.tobytes())
+            else:
+                with open(filename, 'wb') as f:
+                    f.write(encode_wav(self.audio_data, self.samplerate, self.channels))
+            self.filename = filename
+            self.logger.debug(f"録音ファイルを保存しました: {filename}")
+        except Exception as e:
+            self.logger.error(f"録音ファイルの保存中にエラー: {e}")
+
+    def get_audio(self):
+        """直近の録音結果を返す（録音がなければNone）
+
+        通常はint16のPCM配列、長時間モードではDiskAudioStoreを返す。
+        """
+        return self.audio_data
 
     def get_audio_file(self):
-        return self.filename
\ No newline at end of file
+        """デバッグ保存が有効な場合のみ、保存したWAVファイルのパスを返す"""
+        return self.filename
+
+    def clear_audio(self):
+        """直近の録音結果を破棄する"""
+        self.discard_audio(self.audio_data)
+
+    def discard_audio(self, audio):
+        """get_audio()で取得した録音結果を破棄する
+
+        長時間モードのチャンクファイルを削除し、直近の録音結果であれば参照も外す。
+        """
+        if isinstance(audio, DiskAudioStore):
+            audio.release()
+        if audio is not None and audio is self.audio_data:
+            self.audio_data = None
+            self.filename = None
\ No newline at end of file
@@ -0,0 +1,18 @@
+"""
+テストで使う合成音声などの共通部品
+"""
+import numpy as np
+
+
+def synthesize(seconds, samplerate, seed=0, speech_seconds=1.0, gap_seconds=1.0):
+    """発話(220Hzの正弦波)と無音(弱い雑音)を交互に並べたint16のモノラル音声を作る
+
+    先頭はspeech_seconds秒の発話で始まり、その後gap_seconds秒の無音が続く。
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * samplerate)
+    t = np.arange(n) / samplerate
+    noise = rng.normal(0, 0.002, n)
+    speaking = (t % (speech_seconds + gap_seconds)) < speech_seconds
+    speech = 0.2 * np.sin(2 * np.pi * 220 * t) * speaking
+    return ((noise + speech) * 32767).astype(np.int16).reshape(-1, 1)
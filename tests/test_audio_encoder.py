@@ -0,0 +1,62 @@
+"""
+audio_encoder.pyのAudioEncoderのテスト
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from audio_encoder import AudioEncoder, opus_compression_level
+from helpers import synthesize
+
+SAMPLERATE = 48000
+
+
+def test_opus_compression_level_maps_bitrate_per_channel():
+    assert opus_compression_level(256000) == 0.0
+    assert opus_compression_level(6000) == 1.0
+    assert opus_compression_level(131000) == pytest.approx(0.5)
+    # 2チャンネルでは1チャンネルあたりのビットレートで換算する
+    assert opus_compression_level(262000, channels=2) == pytest.approx(0.5)
+    assert opus_compression_level(1000) == 1.0
+    assert opus_compression_level(10 ** 6) == 0.0
+
+
+def test_unknown_format_falls_back_to_wav():
+    encoder = AudioEncoder('mp3')
+    pcm = synthesize(0.5, SAMPLERATE)
+
+    encoded = encoder.encode(pcm, SAMPLERATE)
+
+    assert encoded.filename == "audio.wav"
+    assert encoded.data[:4] == b"RIFF"
+
+
+@pytest.mark.parametrize("kbps", [16, 48])
+def test_opus_bitrate_is_close_to_target(kbps):
+    pytest.importorskip("soundfile")
+    seconds = 10
+    rng = np.random.default_rng(0)
+    # 無音や単純な正弦波は目標より小さくなるため、雑音を含む連続した音声で測る
+    pcm = synthesize(seconds, SAMPLERATE, gap_seconds=0.0)
+    pcm = (pcm + rng.normal(0, 3000, pcm.shape)).clip(-32768, 32767).astype(np.int16)
+
+    encoded = AudioEncoder('opus', opus_bitrate=kbps * 1000).encode(pcm, SAMPLERATE)
+
+    assert encoded.filename == "audio.ogg"
+    assert len(encoded.data) * 8 / seconds / 1000 == pytest.approx(kbps, rel=0.25)
+
+
+def test_max_bytes_per_second_follows_format():
+    assert AudioEncoder('wav').max_bytes_per_second(24000, 2) == 96000
+    assert AudioEncoder('flac').max_bytes_per_second(24000, 1) == 48000
+    opus = AudioEncoder('opus', opus_bitrate=24000)
+    assert opus.max_bytes_per_second(48000, 2) == pytest.approx(24000 / 8 * 1.25)
+    # ビットレートの指定がなければ圧縮レベルから換算する
+    assert AudioEncoder('opus', compression_level=1.0).max_bytes_per_second(48000, 2) == pytest.approx(
+        6000 * 2 / 8 * 1.25)
@@ -0,0 +1,92 @@
+"""
+audio_preprocess.pyの無音除去のテスト
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from audio_preprocess import SilenceTrimmer, split_at_silence
+from helpers import synthesize
+from vad import VoiceActivityDetector
+
+SAMPLERATE = 16000
+
+
+def loud_samples(pcm):
+    return int(np.count_nonzero(np.abs(pcm) > 3000))
+
+
+def test_trimmer_removes_edges_and_shortens_long_gaps():
+    # 先頭1秒の無音 + 発話1秒・無音2秒の繰り返し（発話で終わる）
+    pcm = np.concatenate((
+        synthesize(1.0, SAMPLERATE, speech_seconds=0.0),
+        synthesize(7.0, SAMPLERATE, speech_seconds=1.0, gap_seconds=2.0),
+    ))
+
+    trimmed, removed = SilenceTrimmer().process(pcm, SAMPLERATE)
+
+    assert removed == pytest.approx((len(pcm) - len(trimmed)) / SAMPLERATE)
+    assert len(trimmed) / SAMPLERATE < 5.0
+    # 発話部分は削られない
+    assert loud_samples(trimmed) == loud_samples(pcm)
+
+
+def test_trimmer_keeps_short_gaps():
+    pcm = synthesize(2.5, SAMPLERATE, speech_seconds=1.0, gap_seconds=0.5)
+
+    trimmed, removed = SilenceTrimmer().process(pcm, SAMPLERATE)
+
+    assert removed == 0.0
+    np.testing.assert_array_equal(trimmed, pcm)
+
+
+def test_trimmer_returns_input_without_speech():
+    pcm = synthesize(1.0, SAMPLERATE, speech_seconds=0.0)
+
+    trimmed, removed = SilenceTrimmer().process(pcm, SAMPLERATE)
+
+    assert trimmed is pcm
+    assert removed == 0.0
+
+
+def check_bounds(bounds, total_frames, max_frames):
+    assert bounds[0][0] == 0
+    assert bounds[-1][1] == total_frames
+    for (_, end), (start, _) in zip(bounds, bounds[1:]):
+        assert end == start
+    assert all(0 < end - start <= max_frames for start, end in bounds)
+
+
+def test_split_at_silence_cuts_inside_pauses():
+    pcm = synthesize(20.0, SAMPLERATE)
+    reads = []
+
+    def read(start, end):
+        reads.append(end - start)
+        return pcm[start:end]
+
+    bounds = split_at_silence(len(pcm), read, SAMPLERATE, VoiceActivityDetector(), max_seconds=3.5, search_seconds=1.5)
+
+    check_bounds(bounds, len(pcm), int(3.5 * SAMPLERATE))
+    for _, cut in bounds[:-1]:
+        # 区切りは無音（1秒ごとの発話の間）にある
+        assert (cut / SAMPLERATE) % 2 >= 1
+    # 読み出すのは各区間の末尾の探索範囲だけ
+    assert max(reads) <= int(1.5 * SAMPLERATE)
+
+
+def test_split_at_silence_without_pauses_cuts_at_max_seconds():
+    pcm = synthesize(10.0, SAMPLERATE, gap_seconds=0.0)
+    # 一定音量の発話だけだと雑音レベルが発話と同じと推定されるため、倍率を下げて発話と判定させる
+    vad = VoiceActivityDetector(noise_ratio=0.5)
+
+    bounds = split_at_silence(len(pcm), lambda start, end: pcm[start:end], SAMPLERATE, vad, max_seconds=4)
+
+    check_bounds(bounds, len(pcm), 4 * SAMPLERATE)
+    assert [end - start for start, end in bounds] == [4 * SAMPLERATE, 4 * SAMPLERATE, 2 * SAMPLERATE]
@@ -0,0 +1,64 @@
+"""
+audio_store.pyのDiskAudioStoreのテスト
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from audio_store import DiskAudioStore
+
+
+def make_store(tmp_path, channels=1):
+    # 1チャンク10フレームの小さなストア
+    return DiskAudioStore(samplerate=10, channels=channels, chunk_seconds=1, directory=str(tmp_path))
+
+
+def write_frames(store, frames, blocksize=7):
+    data = np.arange(frames * store.channels, dtype=np.int16).reshape(-1, store.channels)
+    for start in range(0, frames, blocksize):
+        store.write(data[start:start + blocksize])
+    return data
+
+
+def test_write_spills_full_chunks_to_disk(tmp_path):
+    store = make_store(tmp_path)
+    data = write_frames(store, 35)
+
+    assert len(store) == 35
+    assert store.nbytes == 70
+    assert len(os.listdir(store._dir)) == 3
+
+    # チャンクの境界と書き込み用バッファをまたぐ範囲
+    np.testing.assert_array_equal(store.read(5, 33), data[5:33])
+    np.testing.assert_array_equal(store.read(-5, 100), data)
+    store.release()
+
+
+def test_finalize_and_iter_chunks_restore_recording(tmp_path):
+    store = make_store(tmp_path, channels=2)
+    data = write_frames(store, 25)
+
+    store.finalize()
+    chunks = list(store.iter_chunks())
+
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    np.testing.assert_array_equal(np.concatenate(chunks), data)
+    np.testing.assert_array_equal(store.read(18, 22), data[18:22])
+    store.release()
+
+
+def test_release_removes_temp_files(tmp_path):
+    store = make_store(tmp_path)
+    write_frames(store, 15)
+    directory = store._dir
+
+    store.release()
+
+    assert not os.path.exists(directory)
+    assert len(store) == 0
+    assert store.read(0, 10).shape == (0, 1)
@@ -0,0 +1,68 @@
+"""
+command_server.pyと、voice_input_app.pyから常駐インスタンスへのコマンドの転送のテスト
+
+    python -m pytest -q tests
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_DIR)
+
+from command_server import DEFAULT_PORT, CommandServer, send_command
+
+# 常駐インスタンスへの転送で読み込まれてはいけないモジュール
+HEAVY_MODULES = ("tkinter", "numpy", "sounddevice", "keyboard", "recorder", "transcriber", "Common_OpenAIAPI")
+
+
+@pytest.fixture
+def running_app():
+    """常駐インスタンスの代わりに、受け取ったコマンドを記録するサーバーを起動する"""
+    server = CommandServer(DEFAULT_PORT)
+    try:
+        server.bind()
+    except OSError:
+        pytest.skip(f"ポート{DEFAULT_PORT}が使用中です")
+    received = []
+
+    def handler(command):
+        received.append(command)
+        return "ok"
+    server.serve(handler)
+    yield received
+    server.close()
+
+
+def test_send_command_returns_reply():
+    server = CommandServer(0)
+    server.bind()
+    server.serve(lambda command: f"got {command}")
+    try:
+        assert send_command("status", port=server.port) == "got status"
+    finally:
+        server.close()
+
+
+def test_send_command_without_app_returns_none():
+    server = CommandServer(0)
+    server.bind()
+    port = server.port
+    server.close()
+
+    assert send_command("ping", port=port) is None
+
+
+def test_second_launch_forwards_before_heavy_imports(running_app):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "voice_input_app.py", "toggle"],
+        cwd=REPO_DIR, capture_output=True, text=True, encoding="utf-8", errors="replace", timeout=30
+    )
+
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert running_app == ["toggle"]
+    loaded = {line.split("|")[-1].strip().split(".")[0]
+              for line in result.stderr.splitlines() if line.startswith("import time:")}
+    assert not loaded & set(HEAVY_MODULES)
@@ -0,0 +1,161 @@
+"""
+config_store.pyのConfigStoreのテスト
+
+    python -m pytest -q tests
+"""
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config_store import DEFAULT_CONFIG, ConfigStore
+
+
+class CountingStore(ConfigStore):
+    """書き込み回数を数えるConfigStore"""
+    writes = 0
+
+    def _write(self):
+        self.writes += 1
+        super()._write()
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({'hotkey': 'shift+f1', 'audio': {'samplerate': 24000}}), encoding='utf-8')
+    return str(path)
+
+
+def read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def rewrite(path, data):
+    """外部のエディタでの書き換えを想定して、内容と更新日時を変える"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_missing_file_is_created_with_defaults(tmp_path):
+    path = str(tmp_path / "config.json")
+
+    store = ConfigStore(path)
+
+    assert store.get('hotkey') == DEFAULT_CONFIG['hotkey']
+    assert read_json(path) == DEFAULT_CONFIG
+
+
+def test_set_is_debounced_into_one_atomic_write(path):
+    store = CountingStore(path, save_delay=0.1)
+    for i in range(50):
+        store.set('window_position', {'x': i, 'y': i})
+
+    # 保存前でも読み取りには変更が反映される
+    assert store.get('window_position') == {'x': 49, 'y': 49}
+    assert store.writes == 0
+
+    time.sleep(0.3)
+    assert store.writes == 1
+    assert read_json(path)['window_position'] == {'x': 49, 'y': 49}
+    # 一時ファイルは残らない
+    assert os.listdir(os.path.dirname(path)) == ['config.json']
+
+
+def test_external_change_is_reloaded_and_notifies_listeners(path):
+    store = ConfigStore(path, check_interval=0)
+    calls = []
+    store.add_listener(lambda: calls.append(store.get('hotkey')))
+
+    rewrite(path, {'hotkey': 'ctrl+f1'})
+
+    assert store.section('audio') == {}
+    assert store.get('hotkey') == 'ctrl+f1'
+    assert calls == ['ctrl+f1']
+    assert store.reload() is False
+
+
+def test_unchanged_file_is_not_reread_within_check_interval(path):
+    store = ConfigStore(path, check_interval=60)
+
+    rewrite(path, {'hotkey': 'ctrl+f1'})
+
+    assert store.get('hotkey') == 'shift+f1'
+    assert store.reload(force=True) is True
+    assert store.get('hotkey') == 'ctrl+f1'
+
+
+def test_invalid_json_keeps_previous_settings(path):
+    store = ConfigStore(path, check_interval=0)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"hotkey": ')
+    assert store.reload(force=True) is False
+    assert store.get('hotkey') == 'shift+f1'
+
+    rewrite(path, {'hotkey': 'ctrl+f1'})
+    assert store.get('hotkey') == 'ctrl+f1'
+
+
+def test_undecodable_file_keeps_previous_settings(path):
+    store = ConfigStore(path, check_interval=0)
+
+    with open(path, 'wb') as f:
+        f.write('{"hotkey": "ctrl+f1"}'.encode('cp932') + b'\x82')
+    assert store.reload(force=True) is False
+    assert store.get('hotkey') == 'shift+f1'
+
+
+def test_unreadable_file_keeps_previous_settings_and_is_retried(path):
+    store = ConfigStore(path, check_interval=0)
+
+    # 読み込めないパス（ここではディレクトリ）に置き換わっても、前回の設定を返す
+    os.remove(path)
+    os.mkdir(path)
+    assert store.get('hotkey') == 'shift+f1'
+    assert store.get('hotkey') == 'shift+f1'
+
+    os.rmdir(path)
+    rewrite(path, {'hotkey': 'ctrl+f1'})
+    assert store.get('hotkey') == 'ctrl+f1'
+
+
+def test_failing_listener_does_not_break_readers(path):
+    store = ConfigStore(path, check_interval=0)
+
+    def listener():
+        raise RuntimeError("listener failed")
+    store.add_listener(listener)
+
+    rewrite(path, {'hotkey': 'ctrl+f1'})
+    assert store.get('hotkey') == 'ctrl+f1'
+
+
+def test_flush_merges_pending_changes_into_external_edits(path):
+    store = ConfigStore(path, save_delay=60, check_interval=60)
+    store.set('window_position', {'x': 1, 'y': 2})
+
+    rewrite(path, {'hotkey': 'ctrl+f1'})
+    store.flush()
+
+    assert read_json(path) == {'hotkey': 'ctrl+f1', 'window_position': {'x': 1, 'y': 2}}
+
+
+def test_missing_file_is_seeded_without_touching_seed(tmp_path):
+    seed_path = tmp_path / "bundled.json"
+    seed_path.write_text(json.dumps({'hotkey': 'ctrl+f1'}), encoding='utf-8')
+    path = str(tmp_path / "config.json")
+
+    store = ConfigStore(path, seed_path=str(seed_path), save_delay=0)
+    store.set('window_position', {'x': 1, 'y': 2})
+    store.flush()
+
+    assert read_json(path) == {'hotkey': 'ctrl+f1', 'window_position': {'x': 1, 'y': 2}}
+    assert read_json(seed_path) == {'hotkey': 'ctrl+f1'}
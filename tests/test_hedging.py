@@ -0,0 +1,130 @@
+"""
+transcriber.pyのCircuitBreakerとHedgedTranscriptionEngineのテスト
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common_OpenAIAPI import CancelToken, RequestCancelled
+from transcriber import CircuitBreaker, HedgedTranscriptionEngine, TranscriptionEngine
+
+
+class DelayedEngine(TranscriptionEngine):
+    """delay秒後にtextを返す（textがNoneなら失敗する）エンジン"""
+
+    def __init__(self, name, delay, text=None):
+        self.model = name
+        self.delay = delay
+        self.text = text
+        self.calls = 0
+        self.cancelled = 0
+
+    def transcribe(self, audio, prompt="", cancel_token=None):
+        self.calls += 1
+        try:
+            cancel_token.wait(self.delay)
+        except RequestCancelled:
+            self.cancelled += 1
+            raise
+        return self.text
+
+
+def test_breaker_opens_on_error_rate_and_closes_after_success():
+    breaker = CircuitBreaker("stub", min_samples=4, error_rate=0.5, cooldown_seconds=0.05)
+    for ok in (True, False, False, False):
+        breaker.record(0.1, ok)
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    # 遮断後の試行が失敗すれば開き直す
+    breaker.record(0.1, False)
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    breaker.record(0.1, True)
+    assert breaker.allow()
+    assert breaker.percentile(95) is None
+
+
+def test_breaker_opens_on_slow_responses():
+    breaker = CircuitBreaker("stub", min_samples=3, latency_seconds=1.0, cooldown_seconds=60)
+    for seconds in (0.2, 0.3):
+        breaker.record(seconds, True)
+    assert breaker.allow()
+
+    breaker.record(5.0, True)
+    assert not breaker.allow()
+
+
+def test_hedge_delay_follows_primary_latency():
+    engine = HedgedTranscriptionEngine(DelayedEngine("a", 0), DelayedEngine("b", 0), min_delay=0.5,
+                                       max_delay=2.0, default_delay=1.5, breaker_options={'min_samples': 3})
+    breaker = engine.backends[0][1]
+    assert engine.hedge_delay(breaker) == 1.5
+
+    for _ in range(3):
+        breaker.record(0.1, True)
+    assert engine.hedge_delay(breaker) == 0.5
+
+    for _ in range(20):
+        breaker.record(10.0, True)
+    assert engine.hedge_delay(breaker) == 2.0
+    engine.close()
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    primary = DelayedEngine("primary", 5.0, "primary")
+    backup = DelayedEngine("backup", 0.05, "backup")
+    engine = HedgedTranscriptionEngine(primary, backup, default_delay=0.1)
+
+    start = time.monotonic()
+    assert engine.transcribe(("audio.wav", b"data")) == "backup"
+    assert time.monotonic() - start < 2
+
+    # 負けた主系の要求は中断される
+    deadline = time.monotonic() + 2
+    while primary.cancelled == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert primary.cancelled == 1
+    engine.close()
+
+
+def test_fast_primary_is_not_hedged():
+    primary = DelayedEngine("primary", 0.01, "primary")
+    backup = DelayedEngine("backup", 0.01, "backup")
+    engine = HedgedTranscriptionEngine(primary, backup, default_delay=1.0)
+
+    assert engine.transcribe(("audio.wav", b"data")) == "primary"
+    assert backup.calls == 0
+    engine.close()
+
+
+def test_failed_primary_switches_to_backup_without_waiting():
+    primary = DelayedEngine("primary", 0.01, None)
+    backup = DelayedEngine("backup", 0.01, "backup")
+    engine = HedgedTranscriptionEngine(primary, backup, default_delay=5.0)
+
+    start = time.monotonic()
+    assert engine.transcribe(("audio.wav", b"data")) == "backup"
+    assert time.monotonic() - start < 1
+    engine.close()
+
+
+def test_cancel_token_aborts_both_requests():
+    primary = DelayedEngine("primary", 5.0, "primary")
+    backup = DelayedEngine("backup", 5.0, "backup")
+    engine = HedgedTranscriptionEngine(primary, backup, default_delay=0.05)
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+
+    with pytest.raises(RequestCancelled):
+        engine.transcribe(("audio.wav", b"data"), cancel_token=token)
+    engine.close()
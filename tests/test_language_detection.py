@@ -0,0 +1,48 @@
+"""
+translator.pyの言語判定(Translator.detect_language)のテスト
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from translator import DETECT_SAMPLE_CHARS, Translator
+
+
+@pytest.fixture
+def translator():
+    return Translator()
+
+
+@pytest.mark.parametrize("text", [
+    "今日はいい天気ですね。",
+    "このPull Requestでは、APIのretry処理を修正しました。",
+    "カタカナだけ",
+])
+def test_japanese_text(translator, text):
+    assert translator.detect_language(text) == 'ja'
+
+
+@pytest.mark.parametrize("text", [
+    "The quick brown fox jumps over the lazy dog.",
+    "def main(): return 0",
+    "12345 !?",
+    "",
+])
+def test_latin_or_letterless_text_is_english(translator, text):
+    assert translator.detect_language(text) == 'en'
+
+
+def test_ambiguous_text_falls_back_to_langdetect(translator):
+    assert translator.detect_language("안녕하세요 오늘 날씨가 정말 좋네요") == 'ko'
+    assert translator.detect_language("Please review the 設計 document before the meeting tomorrow") == 'en'
+
+
+def test_only_the_beginning_is_sampled(translator):
+    text = "word " * (DETECT_SAMPLE_CHARS // 5) + "これは日本語の文章です。" * 100
+
+    assert translator.detect_language(text) == 'en'
@@ -0,0 +1,86 @@
+"""
+transcriber.pyのLocalWhisperEngineの読み込み待ちとAPIへの切り替えのテスト
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Common_OpenAIAPI import CancelToken, RequestCancelled
+from transcriber import LocalWhisperEngine, OpenAITranscriptionEngine, TranscriptionEngine
+
+
+class FallbackEngine(TranscriptionEngine):
+    """呼ばれた回数を数えて固定の結果を返すエンジン"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, audio, prompt="", cancel_token=None):
+        self.calls += 1
+        return "fallback"
+
+
+def loading_engine(**kwargs):
+    """読み込みが終わらないローカルエンジン（大きなモデルの読み込み中を想定）"""
+    engine = LocalWhisperEngine(preload=False, **kwargs)
+    engine.warm = lambda: None
+    return engine
+
+
+def test_load_timeout_falls_back_to_api():
+    fallback = FallbackEngine()
+    engine = loading_engine(load_timeout=0.2, fallback=fallback)
+
+    start = time.monotonic()
+    assert engine.transcribe(("audio.wav", b"data")) == "fallback"
+    assert 0.2 <= time.monotonic() - start < 1
+    assert fallback.calls == 1
+
+
+def test_load_timeout_without_fallback_fails():
+    engine = loading_engine(load_timeout=0.1)
+
+    assert engine.transcribe(("audio.wav", b"data")) is None
+
+
+def test_cancel_stops_waiting_for_load():
+    engine = loading_engine(load_timeout=10, fallback=FallbackEngine())
+    token = CancelToken()
+    threading.Timer(0.1, token.cancel).start()
+
+    start = time.monotonic()
+    with pytest.raises(RequestCancelled):
+        engine.transcribe(("audio.wav", b"data"), cancel_token=token)
+    assert time.monotonic() - start < 1
+
+
+def test_failed_load_falls_back_to_api(monkeypatch):
+    # faster-whisperを読み込めない状態を再現する
+    monkeypatch.setitem(sys.modules, "faster_whisper", None)
+    fallback = FallbackEngine()
+    engine = LocalWhisperEngine(model="failed-load-test", load_timeout=5, fallback=fallback)
+
+    assert engine.transcribe(("audio.wav", b"data")) == "fallback"
+    assert not engine.wait_loaded(0)
+
+
+def test_from_config_applies_fallback_settings():
+    config = {'local_model': 'config-test', 'local_preload': False, 'local_load_timeout_seconds': 3,
+              'api_base_url': 'http://127.0.0.1:1/v1'}
+
+    engine = LocalWhisperEngine.from_config(config)
+    assert engine.load_timeout == 3
+    assert isinstance(engine.fallback, OpenAITranscriptionEngine)
+    assert engine.fallback.base_url == 'http://127.0.0.1:1/v1'
+
+    # 作成済みのエンジンを再利用する場合も最新の設定にする
+    same = LocalWhisperEngine.from_config(dict(config, local_api_fallback=False))
+    assert same is engine
+    assert same.fallback is None
@@ -0,0 +1,55 @@
+"""
+post_editor.pyの編集スクリプトの適用とテキスト分割のテスト
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from post_editor import EditOperation, apply_edits, split_text
+
+
+def edits(*pairs):
+    return [EditOperation(search=search, replace=replace) for search, replace in pairs]
+
+
+def test_apply_edits_replaces_first_match_in_order():
+    text = "今日は晴れです。明日は晴れです。"
+
+    edited, failed = apply_edits(text, edits(("晴れ", "雨"), ("明日は晴れ", "明日は曇り")))
+
+    assert edited == "今日は雨です。明日は曇りです。"
+    assert failed == 0
+
+
+def test_apply_edits_counts_missing_and_empty_searches():
+    text = "hello world"
+
+    edited, failed = apply_edits(text, edits(("xyz", "abc"), ("", "prefix"), ("world", "")))
+
+    assert edited == "hello "
+    assert failed == 2
+
+
+def test_split_text_prefers_paragraphs_then_sentences():
+    text = "一文目です。二文目です。\n\n三文目です。四文目です。"
+
+    chunks = split_text(text, 20)
+
+    assert chunks == ["一文目です。二文目です。\n\n", "三文目です。四文目です。"]
+
+
+def test_split_text_round_trips_and_respects_limit():
+    text = "あいうえお。" * 50 + "区切りのない長い文字列" * 20
+
+    chunks = split_text(text, 64)
+
+    assert "".join(chunks) == text
+    assert all(0 < len(chunk) <= 64 for chunk in chunks)
+
+
+def test_split_text_short_text_is_single_chunk():
+    assert split_text("短いテキスト", 100) == ["短いテキスト"]
+    assert split_text("", 100) == []
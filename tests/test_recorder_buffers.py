@@ -0,0 +1,94 @@
+"""
+recorder.pyの録音バッファのテスト
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# recorderはPortAudio(sounddevice)を読み込むため、使えない環境ではスキップする
+pytest.importorskip("sounddevice")
+
+from recorder import AudioBuffer, BlockQueue, PreRollBuffer
+
+
+def blocks(count, blocksize, channels=1):
+    """0から連番の値を持つブロックを作る"""
+    data = np.arange(count * blocksize * channels, dtype=np.int16).reshape(-1, channels)
+    return [data[i:i + blocksize] for i in range(0, len(data), blocksize)]
+
+
+def test_audio_buffer_grows_and_keeps_order():
+    buffer = AudioBuffer(samplerate=10, channels=1, initial_seconds=1)
+    written = [buffer.write(block) for block in blocks(5, 4)]
+
+    assert len(buffer) == 20
+    np.testing.assert_array_equal(buffer.view(), np.concatenate(written))
+    np.testing.assert_array_equal(buffer.view()[:, 0], np.arange(20))
+
+
+def test_audio_buffer_reset_reuses_memory_and_release_frees_it():
+    buffer = AudioBuffer(samplerate=10, channels=2, initial_seconds=1)
+    buffer.write(np.ones((4, 2), dtype=np.int16))
+    data = buffer._data
+
+    buffer.reset()
+    assert len(buffer) == 0
+    assert buffer._data is data
+
+    buffer.release()
+    assert buffer.view().shape == (0, 2)
+
+
+def test_preroll_buffer_returns_latest_frames_oldest_first():
+    preroll = PreRollBuffer(frames=10)
+    for block in blocks(4, 3):
+        preroll.write(block)
+
+    np.testing.assert_array_equal(preroll.read()[:, 0], np.arange(2, 12))
+
+
+def test_preroll_buffer_partial_fill_and_large_block():
+    preroll = PreRollBuffer(frames=10)
+    preroll.write(blocks(1, 4)[0])
+    np.testing.assert_array_equal(preroll.read()[:, 0], np.arange(4))
+
+    preroll.write(np.arange(100, 125, dtype=np.int16).reshape(-1, 1))
+    np.testing.assert_array_equal(preroll.read()[:, 0], np.arange(115, 125))
+
+    preroll.clear()
+    assert len(preroll.read()) == 0
+
+
+def test_block_queue_splits_blocks_and_keeps_order():
+    queue = BlockQueue(capacity=8, blocksize=4)
+    queue.push(np.arange(10, dtype=np.int16).reshape(-1, 1))
+
+    received = []
+    while (block := queue.peek()) is not None:
+        received.append(block.copy())
+        queue.advance()
+
+    assert [len(block) for block in received] == [4, 4, 2]
+    np.testing.assert_array_equal(np.concatenate(received)[:, 0], np.arange(10))
+    assert queue.depth() == 0
+
+
+def test_block_queue_drops_when_full_and_counts_overflows():
+    queue = BlockQueue(capacity=2, blocksize=4)
+    for block in blocks(3, 4):
+        queue.push(block, overflow=True)
+
+    stats = queue.stats()
+    assert stats['dropped'] == 1
+    assert stats['overflows'] == 3
+    np.testing.assert_array_equal(queue.peek()[:, 0], np.arange(4))
+
+    queue.reset()
+    assert queue.peek() is None
+    assert queue.stats()['dropped'] == 0
@@ -0,0 +1,94 @@
+"""
+recorder.pyの入力ストリームの開閉のテスト
+
+PortAudioのストリームの代わりに、開いた数を数えるだけのストリームを使う。
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# recorderはPortAudio(sounddevice)を読み込むため、使えない環境ではスキップする
+pytest.importorskip("sounddevice")
+
+import recorder
+from recorder import Recorder
+
+
+class CountingStream:
+    """開いているストリームの数を数える入力ストリーム"""
+    opened = 0
+    open_now = 0
+
+    def __init__(self, **kwargs):
+        # 開くのに時間がかかるデバイスを想定して、競合しやすくする
+        time.sleep(0.05)
+        CountingStream.opened += 1
+        CountingStream.open_now += 1
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        CountingStream.open_now -= 1
+
+
+@pytest.fixture
+def warm_recorder(monkeypatch):
+    CountingStream.opened = 0
+    CountingStream.open_now = 0
+    monkeypatch.setattr(recorder.sd, "InputStream", CountingStream, raising=False)
+    rec = Recorder({'warm_stream': True, 'warm_idle_release_seconds': 0})
+    yield rec
+    rec.is_recording = False
+    rec.release_device()
+
+
+def test_concurrent_warm_up_and_start_open_one_stream(warm_recorder):
+    threads = [threading.Thread(target=warm_recorder.warm_up) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    warm_recorder.start_recording()
+    for thread in threads:
+        thread.join()
+
+    assert CountingStream.opened == 1
+    assert warm_recorder.is_recording
+    consumers = [t for t in threading.enumerate() if t.name == "recorder-consumer"]
+    assert len(consumers) == 1
+
+
+def test_release_device_keeps_stream_while_recording(warm_recorder):
+    warm_recorder.warm_up()
+    warm_recorder.start_recording()
+
+    warm_recorder.release_device()
+    assert warm_recorder.stream is not None
+
+    warm_recorder.stop_recording()
+    warm_recorder.release_device()
+    assert warm_recorder.stream is None
+    assert CountingStream.open_now == 0
+
+
+def test_idle_release_waits_for_warm_start(warm_recorder):
+    warm_recorder.warm_up()
+    # 録音開始の処理中にアイドル解放が割り込んでも、録音中のストリームは閉じない
+    with warm_recorder._stream_lock:
+        release = threading.Thread(target=warm_recorder.release_device)
+        release.start()
+        time.sleep(0.05)
+        warm_recorder.start_recording()
+    release.join()
+
+    assert warm_recorder.stream is not None
+    assert CountingStream.open_now == 1
@@ -0,0 +1,105 @@
+"""
+Common_OpenAIAPI.pyのリトライ（call_with_retry）のテスト
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import Common_OpenAIAPI as api
+from Common_OpenAIAPI import CancelToken, DeadlineExceeded, call_with_retry, _retry_after_seconds
+
+
+def status_error(status, headers=None):
+    request = httpx.Request("POST", "http://stub/v1/audio/transcriptions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return httpx.HTTPStatusError(f"{status}", request=request, response=response)
+
+
+class FlakyRequest:
+    """指定したエラーを順に送出し、尽きたら"ok"を返すリクエスト"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.attempts = 0
+
+    def __call__(self):
+        self.attempts += 1
+        error = self.errors.pop(0) if self.errors else None
+
+        async def request():
+            if error is not None:
+                raise error
+            return "ok"
+        return request()
+
+
+@pytest.fixture(autouse=True)
+def retry_settings(monkeypatch):
+    monkeypatch.setitem(api.RETRY_SETTINGS, "max_attempts", 3)
+    monkeypatch.setitem(api.RETRY_SETTINGS, "backoff_base", 0.01)
+    monkeypatch.setitem(api.RETRY_SETTINGS, "backoff_max", 0.02)
+    monkeypatch.setitem(api.RETRY_SETTINGS, "budget_seconds", 10.0)
+    monkeypatch.setitem(api.RETRY_SETTINGS, "min_attempt_seconds", 0.5)
+
+
+def test_retry_after_seconds_reads_headers():
+    assert _retry_after_seconds(status_error(429, {"retry-after-ms": "250"})) == 0.25
+    assert _retry_after_seconds(status_error(429, {"retry-after": "3"})) == 3.0
+    later = _retry_after_seconds(status_error(503, {"retry-after": formatdate(time.time() + 30, usegmt=True)}))
+    assert 25 <= later <= 30
+    assert _retry_after_seconds(status_error(503, {"retry-after": "soon"})) is None
+    assert _retry_after_seconds(status_error(503)) is None
+    assert _retry_after_seconds(ValueError("no response")) is None
+
+
+def test_transient_errors_are_retried():
+    request = FlakyRequest(status_error(503), status_error(429, {"retry-after": "0"}))
+
+    assert call_with_retry(request) == "ok"
+    assert request.attempts == 3
+
+
+def test_client_errors_are_not_retried():
+    request = FlakyRequest(status_error(400))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        call_with_retry(request)
+    assert request.attempts == 1
+
+
+def test_gives_up_after_max_attempts():
+    request = FlakyRequest(*[status_error(500)] * 5)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        call_with_retry(request, max_attempts=2)
+    assert request.attempts == 2
+
+
+def test_retry_after_beyond_deadline_fails_fast():
+    request = FlakyRequest(status_error(429, {"retry-after": "5"}))
+    token = CancelToken(budget_seconds=2)
+
+    start = time.monotonic()
+    with pytest.raises(httpx.HTTPStatusError):
+        call_with_retry(request, cancel_token=token)
+
+    # Retry-Afterの待機が締め切りを超えるため、待たずに諦める
+    assert request.attempts == 1
+    assert time.monotonic() - start < 1
+
+
+def test_expired_deadline_sends_nothing():
+    request = FlakyRequest()
+    token = CancelToken(budget_seconds=0)
+
+    with pytest.raises(DeadlineExceeded):
+        call_with_retry(request, cancel_token=token)
+    assert request.attempts == 0
@@ -0,0 +1,105 @@
+"""
+transcriber.pyのTranscriptionRouterのテスト
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from audio_encoder import AudioEncoder
+from helpers import synthesize
+from transcriber import Route, StreamingSession, TranscriptionEngine, TranscriptionRouter
+
+
+def make_router(rules, engine_name="openai"):
+    default = Route("default", ("default-model", None), "flac")
+    return TranscriptionRouter(
+        rules, default,
+        engine_factory=lambda model, base_url: (model, base_url),
+        encoder_factory=lambda upload_format: upload_format,
+        engine_name=engine_name
+    )
+
+
+RULES = [
+    {'name': 'instruction', 'context': 'instruction', 'model': 'fast-model'},
+    {'name': 'short', 'max_seconds': 10, 'upload_format': 'wav'},
+    {'name': 'long', 'min_seconds': 120, 'model': 'long-model', 'base_url': 'http://proxy', 'upload_format': 'opus'},
+]
+
+
+def test_select_uses_first_matching_rule():
+    router = make_router(RULES)
+
+    assert router.select(5, 'instruction').name == 'instruction'
+    assert router.select(5, 'dictation').name == 'short'
+    assert router.select(300, 'dictation').name == 'long'
+    assert router.select(60, 'dictation').name == 'default'
+
+
+def test_omitted_fields_fall_back_to_default():
+    router = make_router(RULES)
+
+    instruction = router.select(5, 'instruction')
+    assert instruction.engine == ('fast-model', None)
+    assert instruction.encoder == 'flac'
+
+    short = router.select(5, 'dictation')
+    assert short.engine is router.default.engine
+    assert short.encoder == 'wav'
+
+    long = router.select(300, 'dictation')
+    assert long.engine == ('long-model', 'http://proxy')
+    assert long.encoder == 'opus'
+
+
+def test_unknown_duration_skips_duration_rules():
+    router = make_router(RULES)
+
+    assert router.select(None, 'dictation').name == 'default'
+    assert router.select(None, 'instruction').name == 'instruction'
+
+
+def test_rules_for_other_engines_are_ignored():
+    rules = [{'name': 'local-only', 'engine': 'local', 'model': 'small'}] + RULES
+
+    assert make_router(rules, engine_name="openai").select(5, 'dictation').name == 'short'
+    assert make_router(rules, engine_name="local").select(5, 'dictation').name == 'local-only'
+
+
+def test_engines_lists_each_engine_once():
+    router = make_router(RULES)
+
+    assert router.engines() == [("default-model", None), ('fast-model', None), ('long-model', 'http://proxy')]
+
+
+class NamedEngine(TranscriptionEngine):
+    """自分の名前と受け取ったファイル名を返すエンジン"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def transcribe(self, audio, prompt="", cancel_token=None):
+        return f"[{self.model}:{audio[0]}]"
+
+
+def test_streaming_segments_are_routed_by_length():
+    samplerate = 16000
+    router = TranscriptionRouter(
+        [{'name': 'short', 'max_seconds': 1.0, 'model': 'short-model', 'upload_format': 'wav'}],
+        Route("default", NamedEngine("default-model"), AudioEncoder('wav')),
+        engine_factory=lambda model, base_url: NamedEngine(model),
+        encoder_factory=AudioEncoder
+    )
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        session = StreamingSession(router, executor, samplerate, 1, segmentation="pause",
+                                   segment_seconds=10, min_segment_seconds=0.1, chain_prompt=False)
+        session.feed(synthesize(2.0, samplerate))
+        session.mark_pause()
+        session.feed(synthesize(0.5, samplerate))
+        text = session.finish()
+
+    assert text == "[default-model:segment_0.wav][short-model:segment_1.wav]"
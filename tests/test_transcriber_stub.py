@@ -0,0 +1,111 @@
+"""
+ローカルのスタブサーバー(benchmarks/stub_openai_server.py)を使った文字起こしのテスト
+
+    python -m pytest -q tests
+"""
+import os
+import re
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, '..'))
+sys.path.insert(0, os.path.join(TESTS_DIR, '..', 'benchmarks'))
+
+# スタブサーバーはAPIキーを検証しないが、クライアント生成に必要なため設定する
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from helpers import synthesize
+from stub_openai_server import start_stub_server
+from transcriber import Transcriber
+
+SAMPLERATE = 24000
+
+
+@pytest.fixture
+def stub_server():
+    # スタブは音声1秒あたり0.5秒遅れて応答するため、長い区間ほど応答が遅い
+    server, base_url = start_stub_server(0, latency=0.05, latency_per_second=0.5)
+    yield base_url
+    server.shutdown()
+
+
+def uploaded_sizes(text):
+    """スタブの応答 "[stubN:XXXbytes]" からアップロードされたバイト数を取り出す"""
+    return [int(size) for size in re.findall(r"\[stub\d+:(\d+)bytes\]", text)]
+
+
+def test_streaming_session_joins_segments_in_order(stub_server):
+    transcriber = Transcriber({
+        'api_base_url': stub_server,
+        'samplerate': SAMPLERATE,
+        'stream_segmentation': 'pause',
+        'stream_segment_seconds': 10,
+        'stream_min_segment_seconds': 0.1,
+        'stream_chain_prompt': False,
+        'stream_workers': 3,
+    })
+    session = transcriber.start_stream(SAMPLERATE, 1)
+    # 先の区間ほど長くして応答を遅らせ、完了順と録音順を逆にする
+    for seconds in (2.0, 1.5):
+        session.feed(synthesize(seconds, SAMPLERATE))
+        session.mark_pause()
+    session.feed(synthesize(1.0, SAMPLERATE))
+
+    sizes = uploaded_sizes(session.finish())
+    transcriber.close()
+
+    assert len(sizes) == 3
+    assert sizes == sorted(sizes, reverse=True)
+
+
+def test_transcribe_accepts_ndarray(stub_server):
+    transcriber = Transcriber({'api_base_url': stub_server, 'samplerate': SAMPLERATE})
+    pcm = synthesize(1.0, SAMPLERATE)
+
+    text = transcriber.transcribe(pcm, SAMPLERATE, 1)
+    transcriber.close()
+
+    # 1秒・16bitモノラルのWAV(約48KB)がそのまま1回で送信される
+    sizes = uploaded_sizes(text)
+    assert len(sizes) == 1
+    assert sizes[0] > pcm.nbytes
+
+
+def test_long_recording_is_split_by_encoded_size(stub_server):
+    limit_mb = 0.1
+    transcriber = Transcriber({
+        'api_base_url': stub_server,
+        'samplerate': SAMPLERATE,
+        'upload_format': 'wav',
+        'max_upload_mb': limit_mb,
+        'context_tail_seconds': 0,
+    })
+    # 0.1MBは24kHz・16bitモノラルのwavで約2.2秒。秒数の上限(300秒)より先に大きさで分割される
+    pcm = synthesize(6.0, SAMPLERATE)
+
+    sizes = uploaded_sizes(transcriber.transcribe(pcm, SAMPLERATE, 1))
+    transcriber.close()
+
+    assert len(sizes) >= 3
+    assert max(sizes) <= limit_mb * 1024 * 1024
+
+
+def test_oversized_upload_is_split_again(stub_server):
+    limit_mb = 0.05
+    transcriber = Transcriber({
+        'api_base_url': stub_server,
+        'samplerate': SAMPLERATE,
+        'upload_format': 'wav',
+        'max_upload_mb': limit_mb,
+    })
+    # 見積もりより実際のエンコード結果が大きかった場合（wavへのフォールバックなど）を再現する
+    transcriber.encoder.max_bytes_per_second = lambda samplerate, channels=1: 1
+    pcm = synthesize(2.0, SAMPLERATE)
+
+    sizes = uploaded_sizes(transcriber.transcribe(pcm, SAMPLERATE, 1))
+    transcriber.close()
+
+    assert len(sizes) >= 2
+    assert max(sizes) <= limit_mb * 1024 * 1024
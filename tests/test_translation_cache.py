@@ -0,0 +1,83 @@
+"""
+translation_cache.pyのTranslationCacheのテスト
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from translation_cache import TranslationCache
+
+
+def test_memory_lru_evicts_least_recently_used():
+    cache = TranslationCache(max_entries=2)
+    cache.put("a", "ja-en", "model", "A")
+    cache.put("b", "ja-en", "model", "B")
+    assert cache.get("a", "ja-en", "model") == "A"
+
+    cache.put("c", "ja-en", "model", "C")
+
+    assert cache.get("b", "ja-en", "model") is None
+    assert cache.get("a", "ja-en", "model") == "A"
+    assert cache.get("c", "ja-en", "model") == "C"
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["memory_entries"]) == (3, 1, 2)
+
+
+def test_key_is_normalized_and_includes_direction_and_model():
+    cache = TranslationCache()
+    cache.put("ｈｅｌｌｏ  world ", "en-ja", "model", "こんにちは")
+
+    assert cache.get("hello world", "en-ja", "model") == "こんにちは"
+    assert cache.get("hello world", "ja-en", "model") is None
+    assert cache.get("hello world", "en-ja", "other-model") is None
+
+
+def test_disk_cache_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache" / "translations.sqlite3")
+    cache = TranslationCache(path=path)
+    cache.put("a", "ja-en", "model", "A")
+    cache.close()
+
+    reopened = TranslationCache(path=path)
+    assert reopened.get("a", "ja-en", "model") == "A"
+    assert reopened.get("a", "ja-en", "model") == "A"
+    stats = reopened.stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 1)
+    reopened.close()
+
+
+def test_disk_eviction_keeps_recently_used_entries(tmp_path):
+    path = str(tmp_path / "translations.sqlite3")
+    # メモリ側は1件だけにして、読み出しがディスクの最終使用日時を更新するようにする
+    cache = TranslationCache(max_entries=1, path=path, max_disk_entries=2)
+    cache.EVICT_INTERVAL = 1
+    cache.put("a", "ja-en", "model", "A")
+    time.sleep(0.01)
+    cache.put("b", "ja-en", "model", "B")
+    time.sleep(0.01)
+    assert cache.get("a", "ja-en", "model") == "A"
+    time.sleep(0.01)
+    cache.put("c", "ja-en", "model", "C")
+    cache.close()
+
+    reopened = TranslationCache(max_entries=1, path=path)
+    assert reopened.get("b", "ja-en", "model") is None
+    assert reopened.get("a", "ja-en", "model") == "A"
+    assert reopened.get("c", "ja-en", "model") == "C"
+    reopened.close()
+
+
+def test_expired_entries_are_removed(tmp_path):
+    path = str(tmp_path / "translations.sqlite3")
+    cache = TranslationCache(path=path)
+    cache.put("a", "ja-en", "model", "A")
+    cache.close()
+    time.sleep(0.01)
+
+    reopened = TranslationCache(path=path, max_age_days=0)
+    assert reopened.get("a", "ja-en", "model") is None
+    reopened.close()
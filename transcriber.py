@@ -1,41 +1,860 @@
+import io
 import logging
 import sys
 import os
+import threading
+import time
+import weakref
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
 
 # Common_OpenAIAPI のインポート
-from Common_OpenAIAPI import generate_transcribe_from_audio
+from Common_OpenAIAPI import generate_transcribe_from_audio, warm, CancelToken, RequestCancelled
+from audio_encoder import AudioEncoder
+from audio_preprocess import SilenceTrimmer, split_at_silence
+from audio_store import DiskAudioStore
+from vad import VoiceActivityDetector
 
 class TranscriptionError(Exception):
     """音声文字起こし処理中のエラーを表す例外クラス"""
     pass
 
+
+class TranscriptionEngine:
+    """文字起こしエンジンの基底クラス
+
+    audioにはファイルオブジェクト、または (ファイル名, bytes, MIMEタイプ) の
+    タプルを渡す。失敗時はNoneを返し、cancel_tokenでキャンセルされた場合は
+    RequestCancelledを送出する。
+    """
+    name = "base"
+
+    @classmethod
+    def from_config(cls, config, model=None, base_url=None):
+        """config.jsonの"audio"セクションから作成する"""
+        return cls(model=model, base_url=base_url)
+
+    def transcribe(self, audio, prompt="", cancel_token=None):
+        raise NotImplementedError
+
+    def warm(self):
+        """送信前に接続などを準備しておく（必要なエンジンのみ実装する）"""
+        pass
+
+    def close(self):
+        """スレッドなどを解放する（必要なエンジンのみ実装する）"""
+        pass
+
+
+class OpenAITranscriptionEngine(TranscriptionEngine):
+    """OpenAI互換APIを使う文字起こしエンジン
+
+    base_urlを指定するとローカルのスタブサーバー
+    (benchmarks/stub_openai_server.py) などに差し替えられる。
+    """
+    name = "openai"
+
+    def __init__(self, model=None, base_url=None):
+        self.model = model
+        self.base_url = base_url
+
+    def transcribe(self, audio, prompt="", cancel_token=None):
+        return generate_transcribe_from_audio(
+            audio,
+            model=self.model,
+            prompt=prompt,
+            base_url=self.base_url,
+            cancel_token=cancel_token
+        )
+
+    def warm(self):
+        warm(self.base_url)
+
+
+class LocalWhisperEngine(TranscriptionEngine):
+    """CPU上で動かすローカルの文字起こしエンジン（faster-whisper / CTranslate2）
+
+    ネットワークを使わずに文字起こしする。モデルは作成時にバックグラウンドの
+    スレッドで一度だけ読み込み、プロセスが終わるまで保持する。読み込みが
+    終わる前に呼ばれた場合は完了を待つ。compute_typeに"int8"を指定すると
+    量子化したモデルで推論する。promptはWhisperのinitial_promptとして渡すため、
+    Transcriber.system_promptの用語のヒントがそのまま使える。
+    faster-whisperがインストールされていない場合は失敗としてNoneを返す。
+    読み込みがload_timeout秒以内に終わらない場合や読み込みに失敗した場合は、
+    fallback（APIのエンジン）があればそちらで文字起こしする。
+    from_configは同じ設定のエンジンが残っていればそれを返すため、設定を
+    再読み込みしてTranscriberを作り直してもモデルは読み込み直さない。
+    """
+    name = "local"
+    # 設定ごとのエンジン（どのTranscriberからも使われなくなったものは解放される）
+    _instances = weakref.WeakValueDictionary()
+    _instances_lock = threading.Lock()
+
+    def __init__(self, model=None, base_url=None, device="cpu", compute_type="int8", cpu_threads=0,
+                 beam_size=1, language="ja", preload=True, load_timeout=30.0, fallback=None):
+        self.logger = logging.getLogger(__name__)
+        # base_urlは使わない（他のエンジンと同じ引数で作成できるように受け取る）
+        self.model = model or "small"
+        self.base_url = None
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.beam_size = beam_size
+        self.language = language
+        self.load_timeout = load_timeout
+        self.fallback = fallback
+        self._whisper = None
+        self._load_error = None
+        self._loaded = threading.Event()
+        self._load_lock = threading.Lock()
+        if preload:
+            self.warm()
+
+    @classmethod
+    def from_config(cls, config, model=None, base_url=None):
+        options = dict(
+            model=model or config.get('local_model', 'small'),
+            device=config.get('local_device', 'cpu'),
+            compute_type=config.get('local_compute_type', 'int8'),
+            cpu_threads=config.get('local_cpu_threads', 0),
+            beam_size=config.get('local_beam_size', 1),
+            preload=config.get('local_preload', True)
+        )
+        key = tuple(sorted(options.items()))
+        with cls._instances_lock:
+            engine = cls._instances.get(key)
+            if engine is None:
+                engine = cls(**options)
+                cls._instances[key] = engine
+        # 読み込みを待つ時間と代わりに使うAPIは、作成済みのエンジンでも最新の設定にする
+        engine.load_timeout = config.get('local_load_timeout_seconds', 30.0)
+        engine.fallback = None
+        if config.get('local_api_fallback', True):
+            engine.fallback = OpenAITranscriptionEngine(base_url=config.get('api_base_url'))
+        return engine
+
+    def warm(self):
+        """バックグラウンドでモデルを読み込む（読み込み済み・読み込み中なら何もしない）"""
+        if self._loaded.is_set() or self._load_lock.locked():
+            return
+        threading.Thread(target=self._load, name="local-whisper-load", daemon=True).start()
+
+    def wait_loaded(self, timeout=None, cancel_token=None):
+        """モデルの読み込みを最大timeout秒待ち、使える状態ならTrueを返す
+
+        cancel_tokenがキャンセルされた場合は待つのをやめてRequestCancelledを送出する。
+        """
+        self.warm()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._loaded.is_set():
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            self._loaded.wait(0.1 if remaining is None else min(0.1, remaining))
+        return self._whisper is not None
+
+    def _load(self):
+        with self._load_lock:
+            if self._loaded.is_set():
+                return
+            start = time.perf_counter()
+            try:
+                from faster_whisper import WhisperModel
+                self._whisper = WhisperModel(
+                    self.model,
+                    device=self.device,
+                    compute_type=self.compute_type,
+                    cpu_threads=self.cpu_threads
+                )
+                self.logger.info(
+                    f"ローカルモデルを読み込みました: {self.model} "
+                    f"({self.device}, {self.compute_type}, {time.perf_counter() - start:.1f}秒)"
+                )
+            except ImportError as e:
+                self._load_error = e
+                self.logger.error("faster-whisperがインストールされていないため、ローカルの文字起こしは使えません")
+            except Exception as e:
+                self._load_error = e
+                self.logger.error(f"ローカルモデルの読み込みに失敗しました: {e}")
+            finally:
+                self._loaded.set()
+
+    def transcribe(self, audio, prompt="", cancel_token=None):
+        if not self.wait_loaded(self.load_timeout, cancel_token):
+            reason = "読み込みに失敗した" if self._loaded.is_set() else f"読み込みが{self.load_timeout}秒以内に終わらない"
+            if self.fallback is None:
+                self.logger.error(f"ローカルモデルの{reason}ため、文字起こしできません")
+                return None
+            self.logger.warning(f"ローカルモデルの{reason}ため、APIで文字起こしします")
+            return self.fallback.transcribe(audio, prompt=prompt, cancel_token=cancel_token)
+        if isinstance(audio, tuple):
+            audio = io.BytesIO(audio[1])
+        try:
+            segments, _ = self._whisper.transcribe(
+                audio,
+                language=self.language,
+                initial_prompt=prompt or None,
+                beam_size=self.beam_size,
+                vad_filter=False
+            )
+            texts = []
+            # 推論はセグメント単位で進むため、その区切りでキャンセルを確認する
+            for segment in segments:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                texts.append(segment.text)
+            return stitch_texts(texts)
+        except RequestCancelled:
+            raise
+        except Exception as e:
+            self.logger.error(f"ローカルでの文字起こし中にエラー: {e}")
+            return None
+
+
+ENGINES = {
+    OpenAITranscriptionEngine.name: OpenAITranscriptionEngine,
+    LocalWhisperEngine.name: LocalWhisperEngine,
+}
+
+
+class CircuitBreaker:
+    """送信先ごとの直近の応答時間とエラー率を保持し、不調な送信先を一時的に避ける
+
+    直近window件のうちmin_samples件以上が揃った時点で、エラー率がerror_rateを超えるか
+    応答時間のp95がlatency_secondsを超えると開いた状態になり、cooldown_seconds秒の間は
+    allow()がFalseを返す。その後に送られた要求が成功すれば閉じ、失敗すれば開き直す。
+    """
+
+    def __init__(self, name, window=20, min_samples=5, error_rate=0.5, latency_seconds=None,
+                 cooldown_seconds=60):
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        self.min_samples = min_samples
+        self.error_rate_limit = error_rate
+        self.latency_limit = latency_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self._samples = deque(maxlen=window)
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def percentile(self, q):
+        """成功した応答の応答時間のパーセンタイル（件数が足りなければNone）"""
+        with self._lock:
+            latencies = [seconds for seconds, ok in self._samples if ok]
+        if len(latencies) < self.min_samples:
+            return None
+        return float(np.percentile(latencies, q))
+
+    def allow(self):
+        """この送信先に要求を送ってよいか"""
+        opened_at = self._opened_at
+        return opened_at is None or time.monotonic() - opened_at >= self.cooldown_seconds
+
+    def _healthy(self, seconds, ok):
+        return ok and (self.latency_limit is None or seconds <= self.latency_limit)
+
+    def record(self, seconds, ok):
+        """1件の応答時間と成否を記録する"""
+        with self._lock:
+            if self._opened_at is not None:
+                # 遮断後に試しに送った要求の結果で、閉じるか開き直すかを決める
+                if self._healthy(seconds, ok):
+                    self._opened_at = None
+                    self._samples.clear()
+                    self.logger.info(f"送信先 {self.name} の遮断を解除しました")
+                else:
+                    self._opened_at = time.monotonic()
+                return
+            self._samples.append((seconds, ok))
+            if len(self._samples) < self.min_samples:
+                return
+            errors = sum(1 for _, sample_ok in self._samples if not sample_ok) / len(self._samples)
+            latencies = [sample for sample, sample_ok in self._samples if sample_ok]
+            p95 = float(np.percentile(latencies, 95)) if latencies else 0.0
+            if errors > self.error_rate_limit or (self.latency_limit is not None and p95 > self.latency_limit):
+                self._opened_at = time.monotonic()
+                self.logger.warning(
+                    f"送信先 {self.name} を一時的に遮断します "
+                    f"(エラー率 {errors:.0%}, p95 {p95:.1f}秒, {self.cooldown_seconds}秒後に再開)"
+                )
+
+
+class HedgedTranscriptionEngine(TranscriptionEngine):
+    """主系と予備系の2つのエンジンに投機的に要求を送る文字起こしエンジン
+
+    主系に送ってから、主系の応答時間のp(percentile)に相当する時間
+    （min_delay〜max_delay秒、実績が少ないうちはdefault_delay秒）待っても応答がなければ
+    予備系にも同じ音声を送り、先に成功した方の結果を使う。負けた方の要求は中断する。
+    主系が失敗した場合は待たずに予備系へ切り替える。
+    送信先ごとのCircuitBreakerが開いている間は、その送信先を後回しにする。
+    """
+    name = "hedged"
+
+    def __init__(self, primary, backup, percentile=95, min_delay=1.0, max_delay=8.0,
+                 default_delay=3.0, breaker_options=None):
+        self.logger = logging.getLogger(__name__)
+        breaker_options = breaker_options or {}
+        self.backends = [
+            (primary, CircuitBreaker(self._describe(primary), **breaker_options)),
+            (backup, CircuitBreaker(self._describe(backup), **breaker_options)),
+        ]
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.default_delay = default_delay
+        # 主系と予備系が同時に応答待ちになるため、呼び出し側とは別のスレッドで送信する
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+    @staticmethod
+    def _describe(engine):
+        model = getattr(engine, 'model', None) or "default"
+        base_url = getattr(engine, 'base_url', None) or "openai"
+        return f"{model}@{base_url}"
+
+    def warm(self):
+        for engine, _ in self.backends:
+            engine.warm()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        for engine, _ in self.backends:
+            engine.close()
+
+    def hedge_delay(self, breaker):
+        """予備系にも送るまでの待ち時間"""
+        p = breaker.percentile(self.percentile)
+        if p is None:
+            return self.default_delay
+        return min(self.max_delay, max(self.min_delay, p))
+
+    def _run(self, engine, breaker, audio, prompt, token, parent):
+        start = time.perf_counter()
+        try:
+            text = engine.transcribe(audio, prompt=prompt, cancel_token=token)
+        except RequestCancelled:
+            # 負けて中断された要求は、少なくともここまで時間がかかったものとして記録する
+            if not parent.cancelled:
+                breaker.record(time.perf_counter() - start, True)
+            raise
+        except Exception:
+            breaker.record(time.perf_counter() - start, False)
+            raise
+        breaker.record(time.perf_counter() - start, text is not None)
+        return text
+
+    def transcribe(self, audio, prompt="", cancel_token=None):
+        if hasattr(audio, 'read'):
+            # 2つの送信先で共有するため、ファイルはバイト列として読み込んでおく
+            audio = (os.path.basename(getattr(audio, 'name', 'audio')), audio.read())
+        parent = cancel_token or CancelToken()
+
+        # 遮断中の送信先は後回しにする（両方遮断中なら主系を使う）
+        first, second = sorted(self.backends, key=lambda backend: not backend[1].allow())
+        pending = {}
+        tokens = []
+
+        def launch(engine, breaker):
+            token = parent.child()
+            tokens.append(token)
+            future = self.executor.submit(self._run, engine, breaker, audio, prompt, token, parent)
+            pending[future] = breaker.name
+
+        try:
+            launch(*first)
+            delay = self.hedge_delay(first[1])
+            hedged = False
+            while pending:
+                done, _ = wait(pending, timeout=None if hedged else delay, return_when=FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if second[1].allow():
+                        self.logger.info(f"{delay:.1f}秒以内に応答がないため {second[1].name} にも送信します")
+                        launch(*second)
+                    continue
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        text = future.result()
+                    except RequestCancelled:
+                        raise
+                    except Exception as e:
+                        self.logger.warning(f"{name} での文字起こしに失敗しました: {e}")
+                        text = None
+                    if text is not None:
+                        self.logger.info(f"{name} の結果を使用します")
+                        return text
+                if not hedged:
+                    hedged = True
+                    self.logger.info(f"{first[1].name} が失敗したため {second[1].name} に切り替えます")
+                    launch(*second)
+            return None
+        finally:
+            # 負けた方の要求は接続ごと中断する
+            for token in tokens:
+                token.cancel()
+                token.detach()
+
+
+# ルーティングの結果（ログ用の名前、送信に使うエンジンとエンコーダー）
+Route = namedtuple('Route', ['name', 'engine', 'encoder'])
+
+
+class TranscriptionRouter:
+    """録音の長さと用途から送信先のモデル・接続先・音声形式を選ぶ
+
+    rulesにはconfig.jsonの"routes"のリストを渡す。先頭から順に条件
+    （context: "dictation" / "instruction"、min_seconds、max_seconds）を調べ、
+    最初に一致したルールのmodel、base_url、upload_formatを使う。
+    ルールで省略した項目や、一致するルールがない場合はdefaultの送信先を使う。
+    録音の長さが分からない場合（ファイル指定など）は長さの条件を持つルールには一致しない。
+    engineを指定したルールは、使用中のエンジン名(engine_name)が一致する場合だけ使う。
+    """
+
+    def __init__(self, rules, default, engine_factory, encoder_factory, engine_name=None):
+        self.logger = logging.getLogger(__name__)
+        self.default = default
+        self.rules = []
+        for index, rule in enumerate(rules or []):
+            if rule.get('engine') and rule['engine'] != engine_name:
+                continue
+            engine = default.engine
+            if rule.get('model') or rule.get('base_url'):
+                engine = engine_factory(rule.get('model'), rule.get('base_url'))
+            encoder = default.encoder
+            if rule.get('upload_format'):
+                encoder = encoder_factory(rule['upload_format'])
+            name = rule.get('name') or f"routes[{index}]"
+            self.rules.append((rule, Route(name, engine, encoder)))
+
+    @staticmethod
+    def _matches(rule, seconds, context):
+        if rule.get('context') and rule['context'] != context:
+            return False
+        if rule.get('min_seconds') is not None and (seconds is None or seconds < rule['min_seconds']):
+            return False
+        if rule.get('max_seconds') is not None and (seconds is None or seconds > rule['max_seconds']):
+            return False
+        return True
+
+    def select(self, seconds, context):
+        for rule, route in self.rules:
+            if self._matches(rule, seconds, context):
+                return route
+        return self.default
+
+    def engines(self):
+        """ルールで使われるエンジンの一覧（重複なし）"""
+        engines = [self.default.engine]
+        for _, route in self.rules:
+            if all(route.engine is not engine for engine in engines):
+                engines.append(route.engine)
+        return engines
+
+
+# 直前の区間の文字起こし結果をプロンプトに含める際の最大文字数
+PROMPT_CONTEXT_CHARS = 200
+
+
+def stitch_texts(texts):
+    """区間ごとの文字起こし結果を順番通りに連結する
+
+    英単語同士がくっつく場合のみ空白を挟む。
+    """
+    result = ""
+    for text in texts:
+        text = text.strip()
+        if not text:
+            continue
+        if result and result[-1].isascii() and result[-1].isalnum() and text[0].isascii() and text[0].isalnum():
+            result += " "
+        result += text
+    return result
+
+
+class StreamingSession:
+    """録音中に届いたブロックを区切りごとに文字起こしするセッション
+
+    feed()は録音コールバックから呼ばれるため、区切りに達したら
+    スレッドプールに投げるだけで即座に戻る。segmentationが"pause"の場合は
+    発話の区切り(mark_pause)で区間を確定し、"fixed"の場合は一定秒数で区切る。
+    chain_promptが有効なら直前の区間の結果をプロンプトに含めて送信する。
+    finish()では残りの末尾だけを送信し、全区間の結果を順番通りに連結して返す。
+    cancel()またはcancel_tokenのキャンセルで送信中のリクエストも中断される。
+    送信先は区間ごとに、区間の長さとcontextからrouter(TranscriptionRouter)で選ぶ。
+    """
+
+    def __init__(self, router, executor, samplerate, channels, prompt="", segment_seconds=5.0,
+                 segmentation="fixed", min_segment_seconds=1.0, chain_prompt=True, trimmer=None,
+                 context="dictation"):
+        self.logger = logging.getLogger(__name__)
+        self.router = router
+        self.executor = executor
+        self.context = context
+        self.trimmer = trimmer
+        self.samplerate = samplerate
+        self.channels = channels
+        self.prompt = prompt
+        self.segmentation = segmentation
+        self.chain_prompt = chain_prompt
+        # pauseモードではsegment_secondsは1区間の上限として扱う
+        self.segment_frames = max(1, int(segment_seconds * samplerate))
+        self.min_segment_frames = int(min_segment_seconds * samplerate)
+        self._lock = threading.Lock()
+        self._blocks = []
+        self._frames = 0
+        self._futures = []
+        self._cancelled = False
+        self._removed_seconds = 0.0
+        self.cancel_token = CancelToken()
+
+    def feed(self, block):
+        with self._lock:
+            if self._cancelled:
+                return
+            self._blocks.append(block)
+            self._frames += len(block)
+            if self._frames >= self.segment_frames:
+                self._submit_pending()
+
+    def mark_pause(self):
+        """発話の区切りを検出したときに呼ばれ、ここまでを1区間として送信する"""
+        if self.segmentation != "pause":
+            return
+        with self._lock:
+            if self._cancelled or self._frames < self.min_segment_frames:
+                return
+            self._submit_pending()
+
+    def _submit_pending(self):
+        if not self._blocks:
+            return
+        pcm = np.concatenate(self._blocks, axis=0)
+        self._blocks = []
+        self._frames = 0
+        index = len(self._futures)
+        previous = self._futures[-1] if (self.chain_prompt and self._futures) else None
+        self.logger.debug(f"区間{index}を送信します ({len(pcm) / self.samplerate:.2f}秒)")
+        self._futures.append(self.executor.submit(self._transcribe_segment, index, pcm, previous))
+
+    def _transcribe_segment(self, index, pcm, previous=None):
+        # 送信先は通常の文字起こしと同じく、無音除去前の長さで選ぶ
+        route = self.router.select(len(pcm) / self.samplerate, self.context)
+        if self.trimmer is not None:
+            pcm, removed_seconds = self.trimmer.process(pcm, self.samplerate)
+            with self._lock:
+                self._removed_seconds += removed_seconds
+        encoded = route.encoder.encode(pcm, self.samplerate, self.channels, name=f"segment_{index}")
+        prompt = self.prompt
+        if previous is not None:
+            # 直前の区間の結果を待ち、その末尾を文脈としてプロンプトに加える
+            previous_text = previous.result()
+            if previous_text:
+                prompt = f"{self.prompt}\n{previous_text[-PROMPT_CONTEXT_CHARS:]}"
+        self.logger.debug(f"区間{index}の送信先: {route.name}")
+        text = route.engine.transcribe(tuple(encoded), prompt=prompt, cancel_token=self.cancel_token)
+        if text is None:
+            raise TranscriptionError(f"区間{index}の文字起こしに失敗しました")
+        return text
+
+    def finish(self):
+        """末尾の区間を送信し、全区間の結果を連結して返す"""
+        with self._lock:
+            self._submit_pending()
+            futures = list(self._futures)
+        try:
+            texts = [future.result() for future in futures]
+        except (TranscriptionError, RequestCancelled):
+            raise
+        except Exception as e:
+            if self.cancel_token.cancelled:
+                raise RequestCancelled("処理はキャンセルされました")
+            raise TranscriptionError(f"予期せぬエラーが発生しました: {str(e)}")
+        self.logger.info(
+            f"ストリーミング文字起こしが完了しました ({len(texts)}区間, 無音除去 {self._removed_seconds:.2f}秒)"
+        )
+        return stitch_texts(texts)
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            self._blocks = []
+            for future in self._futures:
+                future.cancel()
+        # 送信中の区間のリクエストも中断する
+        self.cancel_token.cancel()
+
+
 class Transcriber:
-    def __init__(self):
+    def __init__(self, config=None):
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         self.system_prompt = """プログラミング用語、技術用語、LLM関連の専門用語が頻出します。
 これらの英語の技術用語は、日本語の文脈でも正確に認識して保持してください。頻発用語例：exe(エグゼ),仕様書"""
 
-    def transcribe(self, audio_file):
+        # config には config.json の "audio" セクションを渡す
+        self.config = config or {}
+        engine_name = self.config.get('transcription_engine', OpenAITranscriptionEngine.name)
+        engine_class = ENGINES.get(engine_name)
+        if engine_class is None:
+            self.logger.warning(f"未知の文字起こしエンジンです: {engine_name}。openaiを使用します")
+            engine_class = OpenAITranscriptionEngine
+        self.engine = engine_class.from_config(self.config, base_url=self.config.get('api_base_url'))
+        # 予備のモデルまたは送信先が設定されていれば、遅い応答に備えて投機的に送信する
+        hedge_model = self.config.get('hedge_model')
+        hedge_base_url = self.config.get('hedge_base_url')
+        if hedge_model or hedge_base_url:
+            backup = engine_class.from_config(
+                self.config, model=hedge_model, base_url=hedge_base_url or self.config.get('api_base_url')
+            )
+            self.engine = HedgedTranscriptionEngine(
+                self.engine,
+                backup,
+                percentile=self.config.get('hedge_percentile', 95),
+                min_delay=self.config.get('hedge_min_delay_seconds', 1.0),
+                max_delay=self.config.get('hedge_max_delay_seconds', 8.0),
+                default_delay=self.config.get('hedge_default_delay_seconds', 3.0),
+                breaker_options={
+                    'window': self.config.get('breaker_window', 20),
+                    'error_rate': self.config.get('breaker_error_rate', 0.5),
+                    'latency_seconds': self.config.get('breaker_latency_seconds'),
+                    'cooldown_seconds': self.config.get('breaker_cooldown_seconds', 60),
+                }
+            )
+        self.samplerate = self.config.get('samplerate', 24000)
+        self.channels = self.config.get('channels', 1)
+        # 録音とアップロードの間に挟むエンコード処理（wav / flac / opus）
+        self.encoder = self._create_encoder(self.config.get('upload_format', 'wav'))
+        # 無音除去や長時間録音の分割には録音側と同じ設定の音声区間検出を使う
+        self.vad = VoiceActivityDetector.from_config(self.config)
+        # エンコード後にmax_upload_mbを超えるか、max_upload_secondsより長い録音は
+        # 無音の位置で分割して送信する（APIのアップロード上限は25MB）
+        self.max_upload_seconds = self.config.get('max_upload_seconds', 300)
+        self.max_upload_bytes = int(self.config.get('max_upload_mb', 24) * 1024 * 1024)
+        # 分割したチャンクを同時に送信する数と、プロンプト用に文字起こしする直前のチャンクの末尾の長さ
+        self.chunk_workers = max(1, self.config.get('chunk_workers', 4))
+        self.context_tail_seconds = self.config.get('context_tail_seconds', 8)
+        self.trimmer = None
+        if self.config.get('trim_silence', False):
+            self.trimmer = SilenceTrimmer(
+                vad=self.vad,
+                max_gap_seconds=self.config.get('max_silence_gap_seconds', 0.8),
+                keep_gap_seconds=self.config.get('compressed_gap_seconds', 0.3)
+            )
+        self.streaming = bool(self.config.get('streaming', False))
+        self.stream_segment_seconds = self.config.get('stream_segment_seconds', 5.0)
+        self.stream_segmentation = self.config.get('stream_segmentation', 'fixed')
+        self.stream_min_segment_seconds = self.config.get('stream_min_segment_seconds', 1.0)
+        self.stream_chain_prompt = self.config.get('stream_chain_prompt', True)
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.config.get('stream_workers', 2),
+            thread_name_prefix="transcribe"
+        )
+        # 録音の長さと用途（音声入力 / 後処理の指示）による送信先の振り分け
+        self.router = TranscriptionRouter(
+            self.config.get('routes', []),
+            Route("default", self.engine, self.encoder),
+            lambda model, base_url: engine_class.from_config(
+                self.config, model=model, base_url=base_url or self.config.get('api_base_url')
+            ),
+            self._create_encoder,
+            engine_name=engine_class.name
+        )
+
+    def _create_encoder(self, upload_format):
+        opus_kbps = self.config.get('upload_opus_bitrate_kbps')
+        return AudioEncoder(
+            upload_format,
+            compression_level=self.config.get('upload_compression_level'),
+            opus_bitrate=opus_kbps * 1000 if opus_kbps else None
+        )
+
+    def warm(self):
+        """録音開始時に呼び出し、録音中に送信先への接続を確立しておく"""
+        def warm_all():
+            for engine in self.router.engines():
+                engine.warm()
+        threading.Thread(target=warm_all, daemon=True).start()
+
+    def close(self):
+        """スレッドプールを終了する（設定の再読み込みで作り直す場合に呼び出す）"""
+        self.executor.shutdown(wait=False)
+        for engine in self.router.engines():
+            engine.close()
+
+    def start_stream(self, samplerate, channels=1, context="dictation"):
+        """録音と並行して文字起こしするためのセッションを作成する
+
+        各区間の送信先はtranscribe()と同じく"routes"の設定で、区間の長さとcontextから選ぶ。
+        """
+        return StreamingSession(
+            self.router,
+            self.executor,
+            samplerate,
+            channels,
+            prompt=self.system_prompt,
+            segment_seconds=self.stream_segment_seconds,
+            segmentation=self.stream_segmentation,
+            min_segment_seconds=self.stream_min_segment_seconds,
+            chain_prompt=self.stream_chain_prompt,
+            trimmer=self.trimmer,
+            context=context
+        )
+
+    def max_chunk_seconds(self, route, samplerate, channels):
+        """1回で送信する音声の最大秒数（エンコード後の大きさがmax_upload_mbに収まる長さ）"""
+        # ファイルのヘッダーなどの分として4KBを残す
+        size_limited = (self.max_upload_bytes - 4096) / route.encoder.max_bytes_per_second(samplerate, channels)
+        return min(self.max_upload_seconds, size_limited)
+
+    def _transcribe_pcm(self, pcm, samplerate, channels, prompt, name="audio", cancel_token=None, route=None):
+        """PCM配列を無音除去・エンコードして送信する"""
+        route = route or self.router.default
+        if self.trimmer is not None:
+            pcm, _ = self.trimmer.process(pcm, samplerate)
+        return self._upload_pcm(pcm, samplerate, channels, prompt, name, cancel_token, route)
+
+    def _upload_pcm(self, pcm, samplerate, channels, prompt, name, cancel_token, route):
+        """エンコードして送信する。上限を超えた場合は無音の位置で半分以下に分けて順に送る
+
+        エンコードに失敗してwavで送る場合など、見積もりより大きくなったときのための処理。
+        """
+        encoded = route.encoder.encode(pcm, samplerate, channels, name=name)
+        if len(encoded.data) <= self.max_upload_bytes or len(pcm) < 2 * samplerate:
+            return route.engine.transcribe(tuple(encoded), prompt=prompt, cancel_token=cancel_token)
+
+        bounds = split_at_silence(len(pcm), lambda start, end: pcm[start:end], samplerate, self.vad,
+                                  len(pcm) / samplerate / 2)
+        self.logger.warning(
+            f"{name}のエンコード後の大きさ({len(encoded.data)}バイト)が上限を超えたため、"
+            f"{len(bounds)}個に分けて送信します"
+        )
+        texts = []
+        for index, (start, end) in enumerate(bounds):
+            text = self._upload_pcm(pcm[start:end], samplerate, channels, prompt, f"{name}_{index}",
+                                    cancel_token, route)
+            if text is None:
+                return None
+            texts.append(text)
+        return stitch_texts(texts)
+
+    def _transcribe_long(self, audio, samplerate, channels, cancel_token=None, route=None):
+        """長い録音を無音の位置で分割し、並列に文字起こしして順番通りに連結する
+
+        各チャンクのプロンプトには直前のチャンクの末尾context_tail_seconds秒を
+        別途文字起こしした結果を使う。末尾の文字起こしは短く全チャンク分を同時に
+        送るため、直前のチャンク全体の完了を待たずに並列で処理できる。
+        """
+        route = route or self.router.default
+        if isinstance(audio, DiskAudioStore):
+            read = audio.read
+        else:
+            read = lambda start, end: audio[start:end]
+        bounds = split_at_silence(len(audio), read, samplerate, self.vad,
+                                  self.max_chunk_seconds(route, samplerate, channels))
+        self.logger.info(
+            f"長時間の録音を{len(bounds)}個に分割して文字起こしします "
+            f"({len(audio) / samplerate:.1f}秒, 同時実行数 {self.chunk_workers})"
+        )
+
+        def transcribe_range(start, end, prompt, name):
+            text = self._transcribe_pcm(read(start, end), samplerate, channels, prompt, name=name,
+                                        cancel_token=cancel_token, route=route)
+            if text is None:
+                raise TranscriptionError(f"{name}の文字起こしに失敗しました")
+            return text
+
+        def transcribe_chunk(index, start, end, context):
+            prompt = self.system_prompt
+            if context is not None:
+                context_text = context.result()
+                if context_text:
+                    prompt = f"{self.system_prompt}\n{context_text[-PROMPT_CONTEXT_CHARS:]}"
+            return transcribe_range(start, end, prompt, f"chunk_{index}")
+
+        tail_frames = int(self.context_tail_seconds * samplerate)
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.chunk_workers, thread_name_prefix="chunk") as executor:
+            # 文脈用の末尾を先に投入し、チャンク側が待つ相手が必ず先に実行されるようにする
+            contexts = [None]
+            for index, (start, end) in enumerate(bounds[:-1]):
+                if tail_frames > 0:
+                    contexts.append(executor.submit(
+                        transcribe_range, max(start, end - tail_frames), end, self.system_prompt, f"tail_{index}"
+                    ))
+                else:
+                    contexts.append(None)
+            futures = [
+                executor.submit(transcribe_chunk, index, start, end, contexts[index])
+                for index, (start, end) in enumerate(bounds)
+            ]
+            try:
+                texts = [future.result() for future in futures]
+            except Exception:
+                for future in futures + contexts:
+                    if future is not None:
+                        future.cancel()
+                raise
+        self.logger.info(f"{len(bounds)}個のチャンクの文字起こしが完了しました ({time.perf_counter() - start_time:.2f}秒)")
+        return stitch_texts(texts)
+
+    def transcribe(self, audio, samplerate=None, channels=None, cancel_token=None, context="dictation"):
+        """音声を文字起こしする
+
+        audioにはRecorder.get_audio()のPCM配列またはDiskAudioStore、
+        あるいはファイルパスを渡す。送信先は録音の長さとcontext
+        （"dictation": 音声入力、"instruction": 後処理の指示）から"routes"の設定で選ぶ。
+        音声はupload_formatの形式にエンコードしてから送信し、
+        エンコード後にmax_upload_mbを超える長さか、max_upload_secondsより長い場合は
+        無音の位置で分割する。
+        cancel_tokenがキャンセルされると送信中のリクエストを中断し、
+        RequestCancelledを送出する。
+        """
+        if audio is None:
+            raise TranscriptionError("文字起こしする音声がありません")
+        audio_file = audio if isinstance(audio, str) else "<memory>"
         try:
-            with open(audio_file, "rb") as file:
-                # modelパラメータを省略して呼び出す（Noneとして渡される）
-                # これにより、Common_OpenAIAPI.pyの変更が有効になる
-                transcript = generate_transcribe_from_audio(
-                    file,
-                    prompt=self.system_prompt
-                )
+            seconds = None
+            if isinstance(audio, (np.ndarray, DiskAudioStore)):
+                samplerate = samplerate or self.samplerate
+                channels = channels or self.channels
+                seconds = len(audio) / samplerate
+            route = self.router.select(seconds, context)
+            duration = "不明" if seconds is None else f"{seconds:.1f}秒"
+            self.logger.info(f"送信先: {route.name} (用途: {context}, 長さ: {duration})")
+            start_time = time.perf_counter()
+
+            if seconds is not None:
+                if len(audio) > self.max_chunk_seconds(route, samplerate, channels) * samplerate:
+                    transcript = self._transcribe_long(audio, samplerate, channels, cancel_token, route)
+                else:
+                    pcm = audio.read(0, len(audio)) if isinstance(audio, DiskAudioStore) else audio
+                    transcript = self._transcribe_pcm(pcm, samplerate, channels, self.system_prompt,
+                                                      cancel_token=cancel_token, route=route)
+            else:
+                with open(audio, "rb") as file:
+                    transcript = route.engine.transcribe(
+                        file,
+                        prompt=self.system_prompt,
+                        cancel_token=cancel_token
+                    )
 
             if transcript is None:
                 raise TranscriptionError("文字起こし処理に失敗しました")
 
-            self.logger.info("音声の文字起こしが完了しました")
+            self.logger.info(f"音声の文字起こしが完了しました ({route.name}, {time.perf_counter() - start_time:.2f}秒)")
             return transcript
 
         except FileNotFoundError:
             self.logger.error(f"ファイルが見つかりません: {audio_file}")
             raise TranscriptionError(f"音声ファイルが見つかりません: {audio_file}")
 
+        except (TranscriptionError, RequestCancelled):
+            raise
+
         except Exception as e:
             self.logger.error(f"予期せぬエラー: {str(e)}")
-            raise TranscriptionError(f"予期せぬエラーが発生しました: {str(e)}")
\ No newline at end of file
+            raise TranscriptionError(f"予期せぬエラーが発生しました: {str(e)}")
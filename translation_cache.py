@@ -0,0 +1,145 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """キャッシュのキー用に、全角/半角と空白の違いを吸収する"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class TranslationCache:
+    """翻訳結果の2段のキャッシュ
+
+    1段目はmax_entries件までのメモリ上のLRU、2段目はpathのSQLiteファイル。
+    キーは正規化したテキスト・翻訳の向き・モデル名の組。ディスク側は
+    max_age_days日より古い結果を削除し、max_disk_entries件を超えた分は
+    最後に使われた日時が古い順に削除する。pathがNoneならメモリのみで動く。
+    ヒット/ミスの回数はstats()で取得できる。
+    """
+
+    # この件数のputごとにディスク側の削除処理を行う
+    EVICT_INTERVAL = 50
+
+    def __init__(self, max_entries=512, path=None, max_disk_entries=10000, max_age_days=30):
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.max_age_seconds = max_age_days * 86400
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                # 書き込みのたびにfsyncしない（キャッシュなので直近の数件が失われても問題ない）
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS translations ("
+                    "key TEXT PRIMARY KEY, result TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS translations_accessed ON translations (accessed)")
+                self._db.commit()
+                self._evict()
+            except sqlite3.Error as e:
+                self.logger.error(f"翻訳キャッシュのファイルを開けないため、メモリのみで動作します: {e}")
+                self._db = None
+
+    @classmethod
+    def from_config(cls, config):
+        """config.jsonの"translation_cache"セクションから作成する"""
+        return cls(
+            max_entries=config.get('max_entries', 512),
+            path=config.get('path', os.path.join('cache', 'translations.sqlite3')),
+            max_disk_entries=config.get('max_disk_entries', 10000),
+            max_age_days=config.get('max_age_days', 30)
+        )
+
+    @staticmethod
+    def _disk_key(key):
+        return hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest()
+
+    def get(self, text, direction, model):
+        """キャッシュされた翻訳結果を返す（なければNone）"""
+        key = (normalize_text(text), direction, model)
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return result
+            if self._db is not None:
+                disk_key = self._disk_key(key)
+                row = self._db.execute("SELECT result, created FROM translations WHERE key = ?", (disk_key,)).fetchone()
+                now = time.time()
+                if row is not None and now - row[1] <= self.max_age_seconds:
+                    self._db.execute("UPDATE translations SET accessed = ? WHERE key = ?", (now, disk_key))
+                    self._db.commit()
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, text, direction, model, result):
+        key = (normalize_text(text), direction, model)
+        with self._lock:
+            self._remember(key, result)
+            if self._db is None:
+                return
+            now = time.time()
+            self._db.execute(
+                "INSERT OR REPLACE INTO translations (key, result, created, accessed) VALUES (?, ?, ?, ?)",
+                (self._disk_key(key), result, now, now)
+            )
+            self._db.commit()
+            self._puts += 1
+            if self._puts % self.EVICT_INTERVAL == 0:
+                self._evict()
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        """ディスク側の古い結果と上限を超えた結果を削除する"""
+        self._db.execute("DELETE FROM translations WHERE created < ?", (time.time() - self.max_age_seconds,))
+        self._db.execute(
+            "DELETE FROM translations WHERE key IN ("
+            "SELECT key FROM translations ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+        self._db.commit()
+
+    def stats(self):
+        """ヒット/ミスの回数と件数を返す"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
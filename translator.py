@@ -1,22 +1,92 @@
+import json
+import logging
 import re
-from langdetect import detect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 
+from pydantic import BaseModel
+
+
+from Common_OpenAIAPI import generate_chat_response, generate_chat_responseStruct, DEFAULT_CHAT_MODEL
+from translation_cache import TranslationCache, normalize_text
+
+BATCH_SYSTEM_PROMPT = """あなたは高性能な翻訳システムです。
+入力はidとtextを持つセグメントのJSON配列です。日本語のセグメントは自然な英語に、
+それ以外のセグメントは自然な日本語に翻訳し、各セグメントのidと訳文を返してください。
+LLMやプログラム用語が多く含まれる可能性があります。"""
+
+
+class TranslatedSegment(BaseModel):
+    id: int
+    translation: str
+
+
+class TranslationBatch(BaseModel):
+    segments: List[TranslatedSegment]
+
+
+# 言語判定で調べる先頭の文字数（長いテキストでも判定時間が一定になるように）
+DETECT_SAMPLE_CHARS = 400
+# 日本語の文字（ひらがな、カタカナ、漢字）とラテン文字
+_JAPANESE_CHARS = re.compile(r'[ぁ-んァ-ン一-龥]')
+_LATIN_CHARS = re.compile(r'[A-Za-z]')
+
+_detect = None
+_detect_lock = threading.Lock()
+
+
+def _statistical_detect(text):
+    """langdetectによる判定（初回呼び出し時に読み込み、結果が毎回同じになるよう乱数を固定する）"""
+    global _detect
+    if _detect is None:
+        with _detect_lock:
+            if _detect is None:
+                from langdetect import DetectorFactory, detect
+                DetectorFactory.seed = 0
+                _detect = detect
+    return _detect(text)
+
+
+def estimate_tokens(text):
+    """トークン数の概算（ASCIIは4文字で1トークン、それ以外は1文字1トークンとみなす）"""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 4
 
-from Common_OpenAIAPI import generate_chat_response
 
 class Translator:
-    def __init__(self):
-        pass
+    def __init__(self, cache=None, model=DEFAULT_CHAT_MODEL):
+        self.logger = logging.getLogger(__name__)
+        # 同じテキストの翻訳を繰り返さないためのキャッシュ（Noneならメモリのみ）
+        self.cache = cache or TranslationCache()
+        self.model = model
+        # 直近のtranslate_batch()の件数・所要時間・スループット
+        self.last_batch_stats = None
 
     def detect_language(self, text: str) -> str:
-        # 日本語文字（ひらがな、カタカナ、漢字）の検出
-        if re.search(r'[ぁ-んァ-ン一-龥]', text):
+        """テキストの言語を判定する
+
+        先頭DETECT_SAMPLE_CHARS文字の中の日本語の文字とラテン文字の割合で判定し、
+        日本語の文字が2割以上なら'ja'、ラテン文字だけなら'en'とする。
+        どちらとも言えない場合（日本語が少しだけ混ざる、他の文字が多いなど）だけ
+        langdetectで判定する。
+        """
+        sample = text[:DETECT_SAMPLE_CHARS]
+        japanese = len(_JAPANESE_CHARS.findall(sample))
+        latin = len(_LATIN_CHARS.findall(sample))
+        letters = sum(1 for c in sample if c.isalpha())
+        if japanese and japanese >= 0.2 * (japanese + latin):
             return 'ja'
-        
+        if latin and not japanese and latin >= 0.8 * letters:
+            return 'en'
+        if not letters:
+            return 'en'
+
         try:
             # langdetectを使用した言語検出
-            return detect(text)
-        except:
+            return _statistical_detect(sample)
+        except Exception:
             # デフォルトは英語として扱う
             return 'en'
 
@@ -25,7 +95,11 @@ class Translator:
             return ""
 
         source_lang = self.detect_language(text)
-        
+        direction = 'ja-en' if source_lang == 'ja' else 'en-ja'
+        cached = self.cache.get(text, direction, self.model)
+        if cached is not None:
+            return cached
+
         if source_lang == 'ja':
             prompt = "以下の日本語を自然な英語に翻訳してください。なお、LLMやプログラム用語が多く含まれる可能性があります:\n" + text
         else:
@@ -34,8 +108,97 @@ class Translator:
         try:
             response = generate_chat_response(
                 system_prompt="あなたは高性能な翻訳システムです。",
-                user_message_content=prompt
+                user_message_content=prompt,
+                model_name=self.model
             )
-            return response.strip() if response else "翻訳エラー: レスポンスが空です"
+            if not response:
+                return "翻訳エラー: レスポンスが空です"
+            result = response.strip()
+            self.cache.put(text, direction, self.model, result)
+            return result
         except Exception as e:
-            return f"翻訳エラー: {str(e)}"
\ No newline at end of file
+            return f"翻訳エラー: {str(e)}"
+
+    def _direction(self, text):
+        return 'ja-en' if self.detect_language(text) == 'ja' else 'en-ja'
+
+    def _translate_segments(self, segments):
+        """(id, text)のリストを1回の構造化リクエストで翻訳し、{id: 訳文}を返す"""
+        payload = json.dumps([{"id": i, "text": text} for i, text in segments], ensure_ascii=False)
+        messages = [
+            {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": payload},
+        ]
+        response = generate_chat_responseStruct(messages, TranslationBatch, model=self.model)
+        batch = response.choices[0].message.parsed
+        if batch is None:
+            return {}
+        ids = {i for i, _ in segments}
+        return {segment.id: segment.translation.strip() for segment in batch.segments if segment.id in ids}
+
+    def translate_batch(self, texts: List[str], max_batch_tokens: int = 1500, workers: int = 4) -> List[str]:
+        """複数のテキストをまとめて翻訳し、入力と同じ順番の訳文のリストを返す
+
+        キャッシュにないテキストだけを、概算トークン数がmax_batch_tokensに収まる単位の
+        バッチに詰めて1回の構造化リクエストで翻訳する。バッチが複数になる場合は
+        最大workers個を並列に送る。応答に含まれなかったセグメントはtranslate()で個別に翻訳する。
+        """
+        start = time.perf_counter()
+        results = [""] * len(texts)
+        # 同じテキスト（正規化後）は1回だけ翻訳する
+        pending = {}
+        for index, text in enumerate(texts):
+            if not text.strip():
+                continue
+            direction = self._direction(text)
+            cached = self.cache.get(text, direction, self.model)
+            if cached is not None:
+                results[index] = cached
+                continue
+            pending.setdefault((normalize_text(text), direction), []).append(index)
+
+        segments = [(i, texts[indexes[0]]) for i, indexes in enumerate(pending.values())]
+        batches = []
+        batch, batch_tokens = [], 0
+        for segment in segments:
+            tokens = estimate_tokens(segment[1])
+            if batch and batch_tokens + tokens > max_batch_tokens:
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(segment)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+
+        translations = {}
+        if batches:
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches))), thread_name_prefix="translate") as executor:
+                for future in [executor.submit(self._translate_segments, batch) for batch in batches]:
+                    try:
+                        translations.update(future.result())
+                    except Exception as e:
+                        self.logger.error(f"バッチ翻訳に失敗しました: {e}")
+
+        for i, ((_, direction), indexes) in enumerate(pending.items()):
+            text = texts[indexes[0]]
+            translation = translations.get(i)
+            if translation:
+                self.cache.put(text, direction, self.model, translation)
+            else:
+                translation = self.translate(text)
+            for index in indexes:
+                results[index] = translation
+
+        elapsed = time.perf_counter() - start
+        self.last_batch_stats = {
+            "segments": len(texts),
+            "requested": len(segments),
+            "batches": len(batches),
+            "seconds": elapsed,
+            "segments_per_second": len(texts) / elapsed if elapsed > 0 else 0.0,
+        }
+        self.logger.info(
+            f"バッチ翻訳: {len(texts)}件 (送信{len(segments)}件, {len(batches)}バッチ), "
+            f"{elapsed:.2f}秒, {self.last_batch_stats['segments_per_second']:.1f}件/秒"
+        )
+        return results
@@ -1,32 +1,39 @@
-import pyperclip
-import pyautogui
 import datetime
 import os
-import json
 import time
-from text_selection_utils import get_selected_text
+
+from config_store import get_config
 
 def is_input_field_active():
     # アクティブなウィンドウやフィールドをチェックするロジックを実装
     # 簡易的にTrueを返す
     return True
 
-def insert_text_to_active_field(text):
+def insert_text_to_active_field(text, strip=True):
     # openAIが間違えていれてくる文章を削除
     text = text.replace("ご視聴ありがとうございました", "")
     text = text.replace("次の動画でお会いしましょう", "")
     text = text.replace("本日はご覧いただきありがとうございます", "")
-    # 末尾の空白を削除
-    text = text.strip()
+    # 末尾の空白を削除（少しずつ貼り付ける場合は文の間の改行を残すためstrip=Falseにする）
+    if strip:
+        text = text.strip()
+    if not text:
+        return
 
+    # 読み込みに時間がかかるため、起動時ではなく最初の貼り付け時（またはpreload()）に読み込む
+    import pyperclip
+    import pyautogui
     pyperclip.copy(text)
     pyautogui.hotkey('ctrl', 'v')  # Windowsの場合。macOSは('command', 'v')
 
+def preload():
+    """貼り付けに使うモジュールを事前に読み込む（起動後にバックグラウンドで呼び出す）"""
+    import pyperclip
+    import pyautogui
+
 def save_backup(text):
-    # 設定ファイルからバックアップ先を取得
-    with open('config.json', 'r', encoding='utf-8') as f:
-        config = json.load(f)
-    backup_dir = config.get('backup_directory', './backups')
+    # 設定からバックアップ先を取得
+    backup_dir = get_config().get('backup_directory', './backups')
     os.makedirs(backup_dir, exist_ok=True)
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"{timestamp}_transcription.txt"
@@ -39,10 +46,8 @@ def cleanup_old_backups():
     1日より古いバックアップファイルを削除します
     """
     try:
-        # 設定ファイルからバックアップディレクトリを取得
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        backup_dir = config.get('backup_directory', './backups')
+        # 設定からバックアップディレクトリを取得
+        backup_dir = get_config().get('backup_directory', './backups')
         days_to_keep = 1  # 保持期間を1日に固定
 
         if not os.path.exists(backup_dir):
@@ -83,6 +88,8 @@ def cleanup_old_backups():
         return 0
 
 def replace_selected_text(text):
+    import pyperclip
+    import pyautogui
     # 新しいテキストをクリップボードにコピー
     pyperclip.copy(text)
     # Ctrl+Vでペースト
@@ -0,0 +1,109 @@
+import numpy as np
+
+# int16のフルスケール
+FULL_SCALE = 32768.0
+
+
+class VoiceActivityDetector:
+    """エネルギーとゼロ交差率によるフレーム単位の音声区間検出
+
+    frame_msごとにRMS(フルスケール比)とゼロ交差率を計算し、
+    RMSが max(silence_threshold, 雑音レベル×noise_ratio) を超え、かつ
+    ハムノイズのような低いゼロ交差率でないフレームを発話とみなす。
+    しきい値の半分以上のエネルギーでゼロ交差率が高いフレーム(摩擦音)も発話に含める。
+    発話の直後はhangover_msの間だけ発話扱いを続ける。
+
+    process_block()は録音中のブロックを逐次判定し、雑音レベルを
+    指数移動平均で追従させる。speech_mask()は録音済みの配列を一括で判定し、
+    雑音レベルはフレームエネルギーの下位パーセンタイルから推定する。
+    """
+
+    def __init__(self, silence_threshold=0.01, noise_ratio=3.0, hangover_ms=150, frame_ms=20,
+                 min_zcr=0.01, fricative_zcr=0.25):
+        self.silence_threshold = silence_threshold
+        self.noise_ratio = noise_ratio
+        self.hangover_ms = hangover_ms
+        self.frame_ms = frame_ms
+        self.min_zcr = min_zcr
+        self.fricative_zcr = fricative_zcr
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config):
+        """config.jsonの"audio"セクションから作成する"""
+        return cls(
+            silence_threshold=config.get('silence_threshold', 0.01),
+            noise_ratio=config.get('vad_noise_ratio', 3.0),
+            hangover_ms=config.get('vad_hangover_ms', 150)
+        )
+
+    def reset(self):
+        """逐次判定の状態（雑音レベルとハングオーバー）を初期化する"""
+        self.noise_floor = None
+        self.hangover_remaining = 0.0
+
+    def frame_length(self, samplerate):
+        return max(1, int(samplerate * self.frame_ms / 1000))
+
+    def frame_features(self, pcm, samplerate):
+        """フレームごとのRMS(フルスケール比)とゼロ交差率を返す
+
+        末尾の端数もフレームとして扱う。多チャンネルの場合は平均して判定する。
+        """
+        frame = self.frame_length(samplerate)
+        samples = pcm.reshape(len(pcm), -1).astype(np.float32).mean(axis=1) / FULL_SCALE
+        n_frames = -(-len(samples) // frame)
+        padded = np.zeros(n_frames * frame, dtype=np.float32)
+        padded[:len(samples)] = samples
+        frames = padded.reshape(n_frames, frame)
+
+        # 端数フレームは実際のサンプル数で割る
+        counts = np.full(n_frames, frame, dtype=np.float32)
+        if len(samples) % frame:
+            counts[-1] = len(samples) % frame
+        rms = np.sqrt(np.einsum('ij,ij->i', frames, frames) / counts)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / counts
+        return rms, zcr
+
+    def _raw_speech(self, rms, zcr, noise_floor):
+        threshold = np.maximum(self.silence_threshold, noise_floor * self.noise_ratio)
+        voiced = (rms > threshold) & (zcr >= self.min_zcr)
+        fricative = (rms > threshold * 0.5) & (zcr > self.fricative_zcr)
+        return voiced | fricative
+
+    def speech_mask(self, pcm, samplerate):
+        """録音済みの配列をフレーム単位で判定し、発話フレームのマスクを返す"""
+        if pcm is None or len(pcm) == 0:
+            return np.zeros(0, dtype=bool)
+        rms, zcr = self.frame_features(pcm, samplerate)
+        noise_floor = max(float(np.percentile(rms, 10)), 1e-5)
+        raw = self._raw_speech(rms, zcr, noise_floor)
+
+        hangover = int(self.hangover_ms / self.frame_ms)
+        if hangover > 0:
+            raw = np.convolve(raw, np.ones(hangover + 1, dtype=np.int32))[:len(raw)] > 0
+        return raw
+
+    def process_block(self, block, samplerate):
+        """録音中のブロックを判定し、ブロック内に発話があればTrueを返す"""
+        rms, zcr = self.frame_features(block, samplerate)
+        if self.noise_floor is None:
+            self.noise_floor = max(float(rms.min()), 1e-5)
+        raw = self._raw_speech(rms, zcr, self.noise_floor)
+
+        # 発話でないフレームで雑音レベルを追従させる（下がるときは速く、上がるときは遅く）
+        quiet = rms[~raw]
+        if quiet.size:
+            level = float(quiet.mean())
+            alpha = 0.2 if level < self.noise_floor else 0.02
+            self.noise_floor = max(self.noise_floor + (level - self.noise_floor) * alpha, 1e-5)
+
+        block_ms = len(block) * 1000 / samplerate
+        if raw.any():
+            self.hangover_remaining = self.hangover_ms
+            return True
+        if self.hangover_remaining > 0:
+            self.hangover_remaining -= block_ms
+            return True
+        return False
@@ -1,106 +1,155 @@
 import sys
+
+# 常駐中のインスタンスがあればコマンドを渡してすぐ終了する。Tk・録音・API関連の
+# モジュールを読み込む前に確認し、2回目以降の起動（ランチャーやホットキーから）を待たせない
+from command_server import CommandServer, send_command
+if __name__ == "__main__":
+    # 引数はcommand_server.COMMANDSのいずれか（省略時はウィンドウを表示するだけ）
+    command = sys.argv[1] if len(sys.argv) > 1 else "show"
+    if send_command(command) is not None:
+        sys.exit(0)
+
 import os
 import tkinter as tk
 from tkinter import messagebox
 from recorder import Recorder
 from transcriber import Transcriber
-from translator import Translator
 import utils
 import threading
-import json
 import keyboard  # 新しくインポート
 import logging
 from datetime import datetime
 import time
-import psutil  # 新しくインポート
-import socket
 from contextlib import contextmanager
 
-from Common_OpenAIAPI import generate_chat_response
-# TrayIcon クラスをインポート
-from tray_icon import TrayIcon
-from text_selection_utils import get_selected_text, clear_text
-
-def prevent_multiple_instances():
-    """Prevent multiple instances of the application from running"""
-    # sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    # try:
-    #     # Try to bind to a local port
-    #     sock.bind(('localhost', 47200))  # You can change this port number
-    # except socket.error:
-    #     # Port is already in use, which means another instance is running
-    #     print("Another instance is already running")
-    #     sys.exit(0)
-    # return sock
-    return None
+# openai・pydanticなどはここでは読み込まれない（Common_OpenAIAPIの中で使うときに読み込む）
+from Common_OpenAIAPI import generate_chat_response, stream_chat_response, configure_client, CancelToken, RequestCancelled
+import Common_OpenAIAPI
+from config_store import get_config
+# 翻訳・差分編集・トレイアイコン・テキスト選択は使うときに読み込む（起動時間の短縮）
+
+# 後処理の結果を文ごとに貼り付ける際の文末の記号
+SENTENCE_ENDINGS = ("。", "！", "？", "!", "?", "\n")
+# config.jsonの更新を確認する間隔(ms)
+CONFIG_WATCH_MS = 2000
+# 後処理の生成中の文字数の表示を更新する間隔（秒・文字数のどちらかに達したら更新する）
+PROGRESS_INTERVAL_SECONDS = 0.1
+PROGRESS_INTERVAL_CHARS = 50
 
 class VoiceInputApp:
-    def __init__(self):
+    def __init__(self, command_server=None):
         # まずログ設定を初期化
         self.setup_logging()
-        
-        # 多重起動チェック
-        # if self.is_already_running():
-        #     self.logger.info("既存のアプリケーションを終了します")
-        #     self.terminate_existing_instance()
-        #     time.sleep(0.3)  # 既存プロセスの終了を待つ時間を短縮
-
-        # config.jsonのパスを取得
-        if getattr(sys, 'frozen', False):
-            # exe実行時のパス
-            config_path = os.path.join(sys._MEIPASS, 'config.json')
-        else:
-            # 通常実行時のパス
-            config_path = 'config.json'
-
-        # 設定ファイルの読み込み
-        try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                self.config = json.load(f)
-        except FileNotFoundError:
-            # 設定ファイルが見つからない場合はデフォルト値を設定
-            self.config = {
-                'backup_directory': './backups',
-                'backup_retention_days': 30,
-                'hotkey': 'shift+f1',
-                'cancel_hotkey': 'shift+f2',
-                'post_process_hotkey': 'shift+f3',
-                'clear_hotkey': 'shift+f4',
-                'window_position': {'x': 100, 'y': 100},
-                'audio': {
-                    'samplerate': 24000,
-                    'channels': 1,
-                    'silence_threshold': 0.01,
-                    'silence_duration': 10,
-                    'device': None
-                }
-            }
-            # 設定ファイルを作成
-            with open('config.json', 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=4)
+        # ランチャーやスクリプトからのコマンドを受け付けるサーバー（ポートは起動前に確保済み）
+        self.command_server = command_server
 
-        self.hotkey = self.config.get('hotkey', 'shift+f1')
-        self.cancel_hotkey = self.config.get('cancel_hotkey', 'shift+f2')
-        # self.translate_hotkey = 'shift+f21'  # 翻訳機能を無効化
-        self.clear_hotkey = self.config.get('clear_hotkey', 'shift+f4')
+        # config.jsonは共有の設定から読む（更新されると自動で読み直し、変更はまとめて保存する）
+        self.config_store = get_config()
         # ウィンドウ位置の設定を読み込み
         self.window_position = self.config.get('window_position', {'x': 100, 'y': 100})
-
-        self.recorder = Recorder()
-        self.transcriber = Transcriber()
+        self.recorder = None
+        self.transcriber = None
+        # 録音・文字起こしを作成したときのaudioセクション（変わった場合だけ作り直す）
+        self._audio_config = None
+        self._translator = None
+        self._diff_editor = None
+        self.apply_config()
+        # ストリーミング文字起こしのセッション（録音ごとに作成）
+        self.stream_session = None
         self.openai_api = generate_chat_response
-        self.translator = Translator()
         self.is_recording = False
-        self.post_process_hotkey = self.config.get('post_process_hotkey', 'shift+f3')
         self.is_post_processing = False
         self.setup_gui()
         self.setup_hotkey()
+        # ウィンドウの表示後に、起動直後は使わないモジュールをバックグラウンドで読み込む
+        self.root.after(100, self.preload_modules)
+        # config.jsonが書き換えられたら、メインスレッドで反映する
+        self.config_store.add_listener(lambda: self.root.after(0, self.on_config_changed))
+        self.root.after(CONFIG_WATCH_MS, self.watch_config)
         # self.root.after(100, self.setup_tray)  # のセットアップをコメントアウト
         self.logger.info("アプリケーションを初期化しました")
 
         # 処理中断フラグを追加
         self.is_processing = False
         self.should_cancel = False
+        # 処理中のAPIリクエストを中断するためのトークン（処理ごとに作成）
+        self.cancel_token = CancelToken()
+        if self.command_server is not None:
+            self.command_server.serve(self.handle_command)
+
+    @property
+    def config(self):
+        """現在の設定（読み取り専用。変更はself.config_store.setで行う）"""
+        return self.config_store.data
+
+    def apply_config(self):
+        """self.configをホットキー・APIクライアント・録音・文字起こし・後処理に反映する"""
+        self.hotkey = self.config.get('hotkey', 'shift+f1')
+        self.cancel_hotkey = self.config.get('cancel_hotkey', 'shift+f2')
+        # self.translate_hotkey = 'shift+f21'  # 翻訳機能を無効化
+        self.clear_hotkey = self.config.get('clear_hotkey', 'shift+f4')
+
+        # 共有APIクライアントのタイムアウト・接続プール設定
+        configure_client(**self.config.get('api', {}))
+        audio_config = self.config.get('audio', {})
+        if audio_config != self._audio_config:
+            if self.recorder is not None and self.recorder.warm:
+                self.recorder.release_device()
+            self.recorder = Recorder(audio_config)
+            if self.recorder.warm:
+                # デバイスを開くのに時間がかかるため、GUIの表示を待たせずに事前に開く
+                threading.Thread(target=self.recorder.warm_up, daemon=True).start()
+            # ローカルモデルは設定が同じなら新しいTranscriberでもそのまま使われる
+            previous = self.transcriber
+            self.transcriber = Transcriber(audio_config)
+            if previous is not None:
+                previous.close()
+            self._audio_config = audio_config
+        # 翻訳機能・差分編集（初回に使うときに作成する）
+        if self._translator is not None:
+            self._translator.cache.close()
+        self._translator = None
+        self._diff_editor = None
+        self.post_process_hotkey = self.config.get('post_process_hotkey', 'shift+f3')
+        # 後処理の結果の貼り付け方（"sentence": 文ごとに貼り付け、"final": 完了時にまとめて貼り付け）
+        self.post_process_paste = self.config.get('post_process_paste', 'sentence')
+        # 後処理の方式（"full": 全文を書き直させる、"diff": 置換操作だけを返させる、
+        # "auto": post_process_diff_min_chars文字以上のテキストだけdiffにする）
+        self.post_process_mode = self.config.get('post_process_mode', 'auto')
+        self.post_process_diff_min_chars = self.config.get('post_process_diff_min_chars', 800)
+
+    @property
+    def translator(self):
+        """翻訳機能（初回アクセス時に読み込む）"""
+        if self._translator is None:
+            from translator import Translator
+            from translation_cache import TranslationCache
+            self._translator = Translator(TranslationCache.from_config(self.config.get('translation_cache', {})))
+        return self._translator
+
+    @property
+    def diff_editor(self):
+        """後処理の差分編集（初回アクセス時に読み込む）"""
+        if self._diff_editor is None:
+            from post_editor import DiffEditor
+            self._diff_editor = DiffEditor(
+                chunk_chars=self.config.get('post_process_chunk_chars', 2000),
+                workers=self.config.get('post_process_workers', 4)
+            )
+        return self._diff_editor
+
+    def preload_modules(self):
+        """起動直後は使わないモジュールをバックグラウンドで読み込み、APIクライアントを作成しておく"""
+        def load():
+            start = time.perf_counter()
+            try:
+                Common_OpenAIAPI.preload()
+                utils.preload()
+                import post_editor
+            except Exception as e:
+                self.logger.warning(f"モジュールの事前読み込み中にエラー: {e}")
+            self.logger.info(f"モジュールの事前読み込みが完了しました ({time.perf_counter() - start:.2f}秒)")
+        threading.Thread(target=load, name="preload", daemon=True).start()
 
     def setup_logging(self):
         # ログディレクトリの作成
@@ -209,37 +258,46 @@ class VoiceInputApp:
             # Shiftキーが押されているかチェック
             if keyboard.is_pressed('shift'):
                 self.logger.debug("Shift+F23 が押されました")
-                if self.is_recording:
-                    self.cancel_recording()
-                elif self.is_processing:
-                    self.cancel_processing()
-                elif self.is_post_processing:
-                    self.cancel_post_processing()
+                self.cancel_current()
         except Exception as e:
             self.logger.error(f"キャンセルホットキー処理中にエラー: {str(e)}")
 
+    def cancel_current(self):
+        """録音中・処理中・後処理中のいずれかの操作をキャンセルする"""
+        if self.is_recording:
+            self.cancel_recording()
+        elif self.is_processing:
+            self.cancel_processing()
+        elif self.is_post_processing:
+            self.cancel_post_processing()
+
     def handle_post_process_hotkey(self, event):
         try:
             if keyboard.is_pressed('shift'):
                 self.logger.info("=== Shift+F22 が押されました ===")
-                self.logger.info(f"現在の状態: is_post_processing={self.is_post_processing}, is_recording={self.is_recording}, is_processing={self.is_processing}")
-                if self.is_post_processing:
-                    # 処理中なら録音を停止してOpenAIに送信
-                    self.logger.info("後処理モードが既にアクティブなため、停止処理を開始します")
-                    self.stop_post_processing()
-                else:
-                    # 処理中でなければ開始
-                    self.logger.info("後処理モードが非アクティブなため、開始処理を開始します")
-                    self.start_post_processing()
+                self.toggle_post_processing()
         except Exception as e:
             self.logger.error(f"後処理ホットキー処理中にエラー: {str(e)}", exc_info=True)
 
+    def toggle_post_processing(self):
+        """後処理の音声指示の録音を開始、または停止してOpenAIに送信する"""
+        self.logger.info(f"現在の状態: is_post_processing={self.is_post_processing}, is_recording={self.is_recording}, is_processing={self.is_processing}")
+        if self.is_post_processing:
+            # 処理中なら録音を停止してOpenAIに送信
+            self.logger.info("後処理モードが既にアクティブなため、停止処理を開始します")
+            self.stop_post_processing()
+        else:
+            # 処理中でなければ開始
+            self.logger.info("後処理モードが非アクティブなため、開始処理を開始します")
+            self.start_post_processing()
+
     def handle_clear_hotkey(self):
         """
         テキスト入力欄の内容を全て消去します。
         """
         try:
             self.logger.info("テキスト消去を開始します")
+            from text_selection_utils import clear_text
             clear_text()
             self.logger.info("テキスト消去が完了しました")
         except Exception as e:
@@ -264,13 +322,27 @@ class VoiceInputApp:
         self.root.configure(bg='#ff9999')
         self.status_label.configure(bg='#ff9999')
         self.start_button.configure(text="文字化")
+        # 録音中にAPIへの接続を確立し、停止後のアップロードで再利用する
+        self.transcriber.warm()
+        block_callback = None
+        pause_callback = None
+        if self.transcriber.streaming:
+            self.stream_session = self.transcriber.start_stream(self.recorder.samplerate, self.recorder.channels)
+            block_callback = self.stream_session.feed
+            pause_callback = self.stream_session.mark_pause
+            self.logger.info("ストリーミング文字起こしを開始します")
         self.logger.info("録音スレッドを開始します")
-        threading.Thread(target=self.recorder.start_recording, args=(self.on_silence_detected,)).start()
+        threading.Thread(
+            target=self.recorder.start_recording,
+            args=(self.on_silence_detected, block_callback, pause_callback)
+        ).start()
 
     def on_silence_detected(self):
         """無音が検出されたときに呼び出されるコールバック"""
         self.logger.info("無音検出による録音キャンセルを処理します")
         self.is_recording = False
+        self.discard_stream_session()
+        self.recorder.clear_audio()
         # Use the after method to safely update the UI from the main thread
         self.root.after(0, self.update_ui_after_silence)
 
@@ -279,7 +351,7 @@ class VoiceInputApp:
         self.root.configure(bg='#e6f3ff')
         self.status_label.configure(bg='#e6f3ff')
         self.start_button.configure(text="録音")
-        messagebox.showinfo("情報", "無音が10秒以上続いたため録音をキャンセルしました。")
+        messagebox.showinfo("情報", f"無音が{self.recorder.silence_duration}秒以上続いたため録音をキャンセルしました。")
 
     def stop_recording(self):
         self.logger.info("録音停止処理を実行します")
@@ -291,13 +363,26 @@ class VoiceInputApp:
         self.logger.info("音声処理スレッドを開始します")
         threading.Thread(target=self.process_audio).start()
 
+    def discard_stream_session(self):
+        """進行中のストリーミング文字起こしを破棄する"""
+        if self.stream_session is not None:
+            self.stream_session.cancel()
+            self.stream_session = None
+
     def process_audio(self):
         self.logger.info("音声処理を開始します")
+        stream_session, self.stream_session = self.stream_session, None
+        audio = None
+        # ストリーミング時は録音中に送信済みの区間もまとめて中断できるようにする
+        cancel_token = stream_session.cancel_token if stream_session is not None else CancelToken()
+        self.cancel_token = cancel_token
+        # ここから処理全体のレイテンシ予算を数える
+        cancel_token.start_budget()
         try:
             self.is_processing = True
             self.should_cancel = False
-            audio_file = self.recorder.get_audio_file()
-            self.logger.debug(f"音声ファイル: {audio_file}")
+            audio = self.recorder.get_audio()
+            self.logger.debug(f"音声データ: {0 if audio is None else audio.nbytes}バイト")
 
             # 中断チェック
             if self.should_cancel:
@@ -308,7 +393,11 @@ class VoiceInputApp:
                 self.start_button.configure(text="録音")
                 return
 
-            text = self.transcriber.transcribe(audio_file)
+            if stream_session is not None:
+                # 録音中に送信済みの区間と末尾の区間を連結
+                text = stream_session.finish()
+            else:
+                text = self.transcriber.transcribe(audio, self.recorder.samplerate, self.recorder.channels, cancel_token=cancel_token)
             self.logger.debug(f"文字起こし結果: {text}")
 
             # 中断チェック
@@ -327,6 +416,12 @@ class VoiceInputApp:
             self.status_label.configure(bg='#e6f3ff')
             self.start_button.configure(text="録音")
             self.logger.info("音声処理が完了しました")
+        except RequestCancelled:
+            self.logger.info("処理がキャンセルされました（送信中のリクエストを中断しました）")
+            self.status_label.config(text="キャンセルされました")
+            self.root.configure(bg='#e6f3ff')
+            self.status_label.configure(bg='#e6f3ff')
+            self.start_button.configure(text="録音")
         except Exception as e:
             self.logger.error(f"処理中にエラーが発生しました: {str(e)}", exc_info=True)
             messagebox.showerror("エラー", f"処理中にエラーが発生しました：\n{e}")
@@ -334,24 +429,23 @@ class VoiceInputApp:
         finally:
             self.is_processing = False
             self.should_cancel = False
-            if audio_file and os.path.exists(audio_file):
-                os.remove(audio_file)
-                self.logger.debug("一時音声ファイルを削除しました")
+            if stream_session is not None:
+                stream_session.cancel()
+            self.recorder.discard_audio(audio)
 
     def cancel_recording(self):
         if self.is_recording:
             self.is_recording = False
             self.recorder.stop_recording()
+            self.discard_stream_session()
             self.status_label.config(text="待機中")
             # 背景を薄い青に戻す
             self.root.configure(bg='#e6f3ff')
             self.status_label.configure(bg='#e6f3ff')
             self.start_button.configure(text="録音")
-            # 録音ファルを削除
-            audio_file = self.recorder.get_audio_file()
-            if audio_file is not None and os.path.exists(audio_file):
-                os.remove(audio_file)
-                self.logger.debug(f"キャンセされた録音ファイルを削除しました: {audio_file}")
+            # 録音データを破棄
+            self.recorder.clear_audio()
+            self.logger.debug("キャンセルされた録音データを破棄しました")
 
     def on_window_move(self, event):
         # ウィンドウの移動が完了しときの処理
@@ -362,10 +456,8 @@ class VoiceInputApp:
             # 位置が変更された場合のみ保存
             if x != self.window_position['x'] or y != self.window_position['y']:
                 self.window_position = {'x': x, 'y': y}
-                # 設定をファイルに保存
-                self.config['window_position'] = self.window_position
-                with open('config.json', 'w', encoding='utf-8') as f:
-                    json.dump(self.config, f, ensure_ascii=False, indent=4)
+                # 設定を保存（ドラッグ中の連続した変更はまとめて1回だけ書き込まれる）
+                self.config_store.set('window_position', self.window_position)
                 self.logger.debug(f"ウィンドウ位置を保存しました: x={x}, y={y}")
 
     def check_hotkey_status(self):
@@ -398,6 +490,7 @@ class VoiceInputApp:
             self.logger.info(f"カレントディレクトリ: {os.getcwd()}")
             self.logger.info(f"アイコンファイルの存在: {os.path.exists(icon_path)}")
             
+            from tray_icon import TrayIcon
             self.tray = TrayIcon(self)
             self.tray.setup_tray()
             self.root.deiconify()
@@ -432,12 +525,22 @@ class VoiceInputApp:
     def on_post_process_silence_detected(self):
         """後処理指示の録音が完了したときの処理"""
         self.logger.info("後処理指示の録音が完了しました")
-        self.root.after(0, self.process_post_process_instruction)
+        # 応答の受信中もメインスレッドが画面を更新できるよう、処理は別スレッドで行う
+        self.root.after(0, self.show_post_process_busy)
+        threading.Thread(target=self.process_post_process_instruction).start()
+
+    def show_post_process_busy(self):
+        self.status_label.config(text="処理中")
+        self.root.configure(bg='#ffb366')
+        self.status_label.configure(bg='#ffb366')
 
     def process_post_process_instruction(self):
         """録音した指示を処理してテキストを更新"""
         self.logger.info("=== 後処理モードの音声処理開始 ===")
-        audio_file = None
+        audio = self.recorder.get_audio()
+        cancel_token = CancelToken()
+        cancel_token.start_budget()
+        self.cancel_token = cancel_token
         try:
             self.is_processing = True
             self.should_cancel = False
@@ -467,17 +570,29 @@ class VoiceInputApp:
                 original_text = f.read()
 
             # 音声指示をテキストに変換
-            audio_file = self.recorder.get_audio_file()
-            self.logger.info(f"音声ファイルのパス: {audio_file}")
-            instruction = self.transcriber.transcribe(audio_file)
+            self.logger.info(f"音声データ: {0 if audio is None else audio.nbytes}バイト")
+            instruction = self.transcriber.transcribe(audio, self.recorder.samplerate, self.recorder.channels,
+                                                      cancel_token=cancel_token, context="instruction")
             self.logger.info(f"音声認識結果: {instruction}")
 
             # OpenAI APIで処理
             sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'kamiya_ai_commonaicomand')))
             from Common_OpenAIAPI import generate_chat_response
 
-            prompt = f"以下のテキストを、次の指示に従って編集してください:\n\n指示: {instruction}\n\nテキスト:\n{original_text}"
-            processed_text = generate_chat_response("", prompt)
+            processed_text = None
+            if self.post_process_mode == 'diff' or (
+                self.post_process_mode == 'auto' and len(original_text) >= self.post_process_diff_min_chars
+            ):
+                try:
+                    processed_text = self.diff_editor.edit(original_text, instruction, cancel_token)
+                    utils.insert_text_to_active_field(processed_text)
+                except RequestCancelled:
+                    raise
+                except Exception as e:
+                    self.logger.warning(f"編集スクリプトでの編集に失敗したため、全文の書き直しに切り替えます: {e}")
+            if processed_text is None:
+                prompt = f"以下のテキストを、次の指示に従って編集してください:\n\n指示: {instruction}\n\nテキスト:\n{original_text}"
+                processed_text = self.stream_post_process(prompt, cancel_token)
 
             # 中断チェック
             if self.should_cancel:
@@ -488,24 +603,71 @@ class VoiceInputApp:
                 return
 
             if processed_text:
-                utils.insert_text_to_active_field(processed_text)
                 utils.save_backup(processed_text)
                 self.logger.info("テキスト後処理が完了しました")
                 self.status_label.config(text="待機中")
                 self.root.configure(bg='#e6f3ff')
                 self.status_label.configure(bg='#e6f3ff')
 
+        except RequestCancelled:
+            self.logger.info("後処理がキャンセルされました（送信中のリクエストを中断しました）")
         except Exception as e:
             self.logger.error(f"後処理中にエラー: {str(e)}", exc_info=True)
             messagebox.showerror("エラー", f"後処理中にエラーが発生しました：\n{e}")
         finally:
             self.is_processing = False
             self.should_cancel = False
-            if audio_file and os.path.exists(audio_file):
-                os.remove(audio_file)
+            self.recorder.discard_audio(audio)
             self.reset_post_process_state()
             self.logger.info(f"処理完了後の状態: is_post_processing={self.is_post_processing}, is_recording={self.is_recording}, is_processing={self.is_processing}")
 
+    def stream_post_process(self, prompt, cancel_token):
+        """後処理の応答をストリーミングで受け取り、進捗を表示しながら貼り付けて全文を返す
+
+        post_process_pasteが"sentence"なら文が完成するたびに貼り付け、
+        "final"なら生成中は受信した文字数を表示し、完了後にまとめて貼り付ける。
+        """
+        start = time.perf_counter()
+        first_token = None
+        text = ""
+        pending = ""
+        pasted = False
+        shown_length = 0
+        shown_at = 0.0
+        for delta in stream_chat_response("", prompt, cancel_token=cancel_token):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+                self.logger.info(f"後処理の最初の応答を受信しました ({first_token:.2f}秒)")
+            text += delta
+            length = len(text)
+            # トークンごとに画面の更新を積まないよう、一定の間隔か文字数ごとに表示する
+            now = time.perf_counter()
+            if now - shown_at >= PROGRESS_INTERVAL_SECONDS or length - shown_length >= PROGRESS_INTERVAL_CHARS:
+                shown_at, shown_length = now, length
+                self.root.after(0, self.show_post_process_progress, length)
+            if self.post_process_paste != 'sentence':
+                continue
+            pending += delta
+            # 最後の文末までを貼り付け、書きかけの文は次に回す
+            end = max(pending.rfind(mark) for mark in SENTENCE_ENDINGS)
+            if end >= 0:
+                chunk, pending = pending[:end + 1], pending[end + 1:]
+                # 先頭の空白は最初の貼り付けでだけ取り除く
+                utils.insert_text_to_active_field(chunk if pasted else chunk.lstrip(), strip=False)
+                pasted = True
+
+        if self.post_process_paste == 'sentence':
+            utils.insert_text_to_active_field(pending.rstrip() if pasted else pending.strip(), strip=False)
+        else:
+            utils.insert_text_to_active_field(text)
+        self.logger.info(f"後処理の応答を受信しました ({len(text)}文字, {time.perf_counter() - start:.2f}秒)")
+        return text
+
+    def show_post_process_progress(self, length):
+        # 表示待ちの間に後処理が終わっていれば、完了後の表示を上書きしない
+        if self.is_processing:
+            self.status_label.config(text=f"生成中 {length}文字")
+
     def reset_post_process_state(self):
         """後処理の状態をリセット"""
         self.logger.info("=== 後処理モードの状態をリセット ===")
@@ -522,9 +684,7 @@ class VoiceInputApp:
         if self.is_post_processing:
             self.is_post_processing = False
             self.recorder.stop_recording()
-            audio_file = self.recorder.get_audio_file()
-            if audio_file and os.path.exists(audio_file):
-                os.remove(audio_file)
+            self.recorder.clear_audio()
             self.status_label.config(text="キャンセルされました")
             self.root.configure(bg='#e6f3ff')
             self.status_label.configure(bg='#e6f3ff')
@@ -535,9 +695,7 @@ class VoiceInputApp:
         self.logger.info("=== 後処理モードの停止処理開始 ===")
         self.logger.info(f"停止処理開始時の状態: is_post_processing={self.is_post_processing}, is_recording={self.is_recording}, is_processing={self.is_processing}")
         self.recorder.stop_recording()
-        self.status_label.config(text="処理中")
-        self.root.configure(bg='#ffb366')
-        self.status_label.configure(bg='#ffb366')
+        self.show_post_process_busy()
         self.logger.info("音声処理スレッドを開始します")
         threading.Thread(target=self.process_post_process_instruction).start()
         self.logger.info(f"停止処理完了後の状態: is_post_processing={self.is_post_processing}, is_recording={self.is_recording}, is_processing={self.is_processing}")
@@ -563,81 +721,77 @@ class VoiceInputApp:
                 pass
             keyboard.unhook_all()
             self.logger.info("全てのホットキーフックを解除しました")
+            if self.recorder.warm:
+                self.recorder.release_device()
+            if self.command_server is not None:
+                self.command_server.close()
+            # 保存待ちの設定（ウィンドウ位置など）を書き込む
+            self.config_store.flush()
+
+    def handle_command(self, command):
+        """ローカルソケットで受け取ったコマンドを処理して応答を返す（command_serverのスレッドから呼ばれる）"""
+        self.logger.info(f"コマンドを受信しました: {command}")
+        if command == "ping":
+            return "pong"
+        if command == "status":
+            if self.is_recording:
+                return "recording"
+            if self.is_processing:
+                return "processing"
+            return "post-processing" if self.is_post_processing else "idle"
+        if (command == "start" and self.is_recording) or (command == "stop" and not self.is_recording):
+            return "ok"
+        actions = {
+            "show": self.show_window,
+            "toggle": self.toggle_recording,
+            "start": self.start_recording,
+            "stop": self.stop_recording,
+            "cancel": self.cancel_current,
+            "post-process": self.toggle_post_processing,
+            "clear": self.handle_clear_hotkey,
+            "reload-config": self.reload_config,
+            "quit": self.root.destroy,
+        }
+        if command not in actions:
+            raise ValueError(f"不明なコマンドです: {command}")
+        # Tkの操作はメインスレッドで行う
+        self.root.after(0, actions[command])
+        return "ok"
+
+    def show_window(self):
+        """ウィンドウを前面に表示する"""
+        self.root.deiconify()
+        self.root.lift()
+
+    def reload_config(self):
+        """config.jsonを読み直す（反映はon_config_changedで行う）"""
+        self.config_store.reload(force=True)
+
+    def watch_config(self):
+        """config.jsonの更新日時を定期的に確認する"""
+        try:
+            self.config_store.reload()
+        except Exception:
+            self.logger.exception("設定ファイルの確認中にエラーが発生しました")
+        finally:
+            # 確認に失敗しても、次の確認は必ず予約する
+            self.root.after(CONFIG_WATCH_MS, self.watch_config)
 
-    def is_already_running(self):
-        """既に同じアプリケーションが起動しているかチェック"""
-        current_process = psutil.Process()
-        current_pid = current_process.pid
-        terminated_pid = None
-        
-        # プロセス名でフィルタリングして、pythonプロセスのみを取得
-        for proc in psutil.process_iter(['pid', 'name']):
-            try:
-                # 自分自身のプロセスはスキップ
-                if proc.pid == current_pid:
-                    continue
-                
-                # pythonプロセスのみをチェック
-                if 'python' not in proc.name().lower():
-                    continue
-                
-                # cmdlineの取得は、pythonプロセスの場合のみ行う
-                cmdline = proc.cmdline()
-                if len(cmdline) >= 2 and 'voice_input_app.py' in cmdline[-1]:
-                    terminated_pid = proc.pid
-                    proc.terminate()
-                    break  # 見つかったら即座にループを抜ける
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                continue
-        
-        if terminated_pid:
-            # 0.3秒待機して、プロセスが確実に終了したか確認
-            time.sleep(0.3)
-            try:
-                # プロセスが存在するかチェック
-                psutil.Process(terminated_pid)
-                # まだ存在する場合は強制終了
-                psutil.Process(terminated_pid).kill()
-                time.sleep(0.1)  # 強制終了後の短い待機
-            except psutil.NoSuchProcess:
-                pass  # プロセスが既に終了している場合は何もしない
-            return True
-        
-        return False
-
-    def terminate_existing_instance(self):
-        """既存のアプリケーションインスタンスを終了"""
-        terminated_pid = None
-        for proc in psutil.process_iter(['pid', 'name']):
-            try:
-                # pythonプロセスのみをチェック
-                if 'python' not in proc.name().lower():
-                    continue
-                    
-                cmdline = proc.cmdline()
-                if len(cmdline) >= 2 and 'voice_input_app.py' in cmdline[-1]:
-                    terminated_pid = proc.pid
-                    proc.terminate()
-                    break  # 見つかったら即座にループを抜ける
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                continue
-
-        if terminated_pid:
-            # 0.3秒待機を0.1秒に短縮
-            time.sleep(0.1)
-            try:
-                # プロセスが存在するかチェック
-                psutil.Process(terminated_pid)
-                # まだ存在する場合は強制終了
-                psutil.Process(terminated_pid).kill()
-                time.sleep(0.1)  # 強制終了後の短い待機
-            except psutil.NoSuchProcess:
-                pass  # プロセスが既に終了している場合は何もしない
+    def on_config_changed(self):
+        """読み直した設定を反映する（ホットキーも設定し直す）。処理中は終わるまで待つ"""
+        if self.is_recording or self.is_processing or self.is_post_processing:
+            self.root.after(1000, self.on_config_changed)
+            return
+        self.apply_config()
+        self.setup_hotkey()
+        self.logger.info("設定を反映しました")
 
     def cancel_processing(self):
         """OpenAI APIへの送信処理をキャンセル"""
         self.logger.info("処理をキャンセルします")
         self.should_cancel = True
+        # 送信中のリクエストを接続ごと中断する（結果を待たずにすぐ戻る）
+        self.cancel_token.cancel()
         self.status_label.config(text="キャンセル中...")
 
     def open_latest_backup(self):
@@ -670,6 +824,14 @@ class VoiceInputApp:
             messagebox.showerror("エラー", f"バックアップファイルを開く際にエラーが発生しました：\n{e}")
 
 if __name__ == "__main__":
-    # socket_instance = prevent_multiple_instances()
-    app = VoiceInputApp()
+    # 常駐中のインスタンスへのコマンドの転送はファイルの先頭で済ませている
+    command_server = CommandServer()
+    try:
+        command_server.bind()
+    except OSError:
+        # 同時に起動した別のインスタンスが先にポートを確保した（初期化を待ってコマンドを渡す）
+        send_command(command, timeout=10)
+        sys.exit(0)
+    app = VoiceInputApp(command_server)
+    app.root.after(0, app.handle_command, command)
     app.run()
\ No newline at end of file